@@ -0,0 +1,4 @@
+from src.model.archivo import main
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Benchmark de la analítica columnar (src/model/analitica.py) frente al mismo
+cálculo con bucles de Python sobre objetos Transaccion del ORM.
+
+Genera los mismos datos sintéticos que bench_modelo.py y, para el usuario con
+más transacciones, mide cada operación en las dos variantes:
+
+  carga                 select(Transaccion) -> objetos  /  HistorialColumnar.cargar
+  por_dia, por_semana   ingresos y egresos por periodo
+  por_categoria         total y número de transacciones por categoría
+  media_movil_30        media del neto diario en ventanas de 30 días
+  balance_acumulado     saldo al final de cada día
+  comparar_meses        diferencia y variación de cada mes frente al anterior
+
+La carga informa también del pico de memoria (tracemalloc). Antes de medir se
+comprueba que las dos variantes dan los mismos totales.
+
+Uso:
+    python benchmarks/bench_analitica.py [--filas 10000 100000] [--repeticiones 5] [--url URL]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from bench_modelo import SEMILLA, categorias_iniciales, generar_transacciones
+from src.model.analitica import HistorialColumnar
+from src.model.base import Base
+from src.model.catalogo_categorias import CatalogoCategorias
+from src.model.categoria import Categoria
+from src.model.dinero import a_decimal
+from src.model.esquema import crear_esquema
+from src.model.importacion import importar_transacciones
+from src.model.transaccion import Transaccion, TipoTransaccionEnum
+from src.model.usuario import Usuario
+
+VENTANA = 30
+
+
+# ---- Variante Python: bucles sobre objetos del ORM ----
+
+def cargar_objetos(db, usuario_id):
+    return db.scalars(select(Transaccion).where(Transaccion.usuario_id == usuario_id)
+                      .order_by(Transaccion.fecha, Transaccion.id)).all()
+
+
+def _inicio_periodo(fecha, periodo):
+    dia = fecha.date()
+    if periodo == "semana":
+        return dia - timedelta(days=dia.weekday())
+    if periodo == "mes":
+        return dia.replace(day=1)
+    return dia
+
+
+def por_periodo(transacciones, periodo):
+    totales = defaultdict(lambda: [Decimal(0), Decimal(0)])
+    for t in transacciones:
+        totales[_inicio_periodo(t.fecha, periodo)][0 if t.tipo == TipoTransaccionEnum.INGRESO else 1] += t.cantidad
+    return [(p, i, e, i - e) for p, (i, e) in sorted(totales.items())]
+
+
+def por_categoria(transacciones):
+    totales = defaultdict(lambda: [Decimal(0), 0])
+    for t in transacciones:
+        fila = totales[t.categoria_id]
+        fila[0] += t.cantidad
+        fila[1] += 1
+    return sorted(((c, total, n) for c, (total, n) in totales.items()), key=lambda fila: -fila[1])
+
+
+def serie_diaria(transacciones):
+    neto = defaultdict(Decimal)
+    for t in transacciones:
+        neto[t.fecha.date()] += t.cantidad if t.tipo == TipoTransaccionEnum.INGRESO else -t.cantidad
+    if not neto:
+        return []
+    dia, fin, serie = min(neto), max(neto), []
+    while dia <= fin:
+        serie.append((dia, neto.get(dia, Decimal(0))))
+        dia += timedelta(days=1)
+    return serie
+
+
+def media_movil(transacciones, ventana):
+    serie = serie_diaria(transacciones)
+    medias, suma = [], Decimal(0)
+    for i, (dia, total) in enumerate(serie):
+        suma += total
+        if i >= ventana:
+            suma -= serie[i - ventana][1]
+        if i >= ventana - 1:
+            medias.append((dia, suma / ventana))
+    return medias
+
+
+def balance_acumulado(transacciones):
+    saldo, resultado = Decimal(0), []
+    for dia, total in serie_diaria(transacciones):
+        saldo += total
+        resultado.append((dia, saldo))
+    return resultado
+
+
+def comparar_meses(transacciones):
+    netos = {}
+    for mes, _, _, neto in por_periodo(transacciones, "mes"):
+        netos[mes] = neto
+    resultado, anterior = [], None
+    if netos:
+        mes, fin = min(netos), max(netos)
+        while mes <= fin:
+            total = netos.get(mes, Decimal(0))
+            variacion = (total - anterior) / abs(anterior) if anterior else None
+            resultado.append((mes, total, total - (anterior or 0), variacion))
+            anterior = total
+            mes = (mes + timedelta(days=32)).replace(day=1)
+    return resultado
+
+
+# ---- Medición ----
+
+def _mediana_ms(funcion, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos) * 1000
+
+
+def _pico_memoria(funcion):
+    tracemalloc.start()
+    try:
+        funcion()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def comprobar(transacciones, historial):
+    """Las dos variantes deben dar los mismos totales (en céntimos exactos)."""
+    _, ingresos, egresos, _ = historial.totales_por_periodo("dia")
+    python = por_periodo(transacciones, "dia")
+    assert [i for _, i, _, _ in python] == [a_decimal(i) for i in ingresos]
+    assert [e for _, _, e, _ in python] == [a_decimal(e) for e in egresos]
+    _, saldo = historial.balance_acumulado()
+    assert [s for _, s in balance_acumulado(transacciones)] == [a_decimal(s) for s in saldo]
+    ids, totales, _ = historial.totales_por_categoria()
+    assert dict((c, t) for c, t, _ in por_categoria(transacciones)) == {c: a_decimal(t) for c, t in zip(ids, totales)}
+
+
+def preparar(url, directorio, filas, semilla):
+    engine = create_engine(url or f"sqlite:///{os.path.join(directorio, f'analitica-{filas}.db')}")
+    if url:
+        Base.metadata.drop_all(engine)
+    crear_esquema(engine)
+    CatalogoCategorias.invalidar()
+    Usuario.COSTE_BCRYPT = 4
+    correos = [f"usuario{i}@bench.example.com" for i in range(10)]
+    with sessionmaker(bind=engine)() as db:
+        db.add_all([Categoria(nombre=nombre, tipo=tipo, descripcion=descripcion)
+                    for nombre, (tipo, descripcion) in categorias_iniciales().items()])
+        db.add_all([Usuario(nombre=f"Usuario {i}", correo=correo, contraseña="segura123")
+                    for i, correo in enumerate(correos)])
+        db.commit()
+        importar_transacciones(db, generar_transacciones(filas, correos, semilla))
+        usuario_id = db.scalar(select(Usuario.id).where(Usuario.correo == correos[0]))
+    return engine, usuario_id
+
+
+def medir(engine, usuario_id, repeticiones):
+    with sessionmaker(bind=engine)() as db:
+        transacciones = cargar_objetos(db, usuario_id)
+        historial = HistorialColumnar.cargar(db, usuario_id)
+        comprobar(transacciones, historial)
+
+        def carga_python():
+            db.expunge_all()
+            cargar_objetos(db, usuario_id)
+
+        operaciones = {
+            "carga": (carga_python, lambda: HistorialColumnar.cargar(db, usuario_id)),
+            "por_dia": (lambda: por_periodo(transacciones, "dia"), lambda: historial.totales_por_periodo("dia")),
+            "por_semana": (lambda: por_periodo(transacciones, "semana"),
+                           lambda: historial.totales_por_periodo("semana")),
+            "por_categoria": (lambda: por_categoria(transacciones), historial.totales_por_categoria),
+            "media_movil_30": (lambda: media_movil(transacciones, VENTANA), lambda: historial.media_movil(VENTANA)),
+            "balance_acumulado": (lambda: balance_acumulado(transacciones), historial.balance_acumulado),
+            "comparar_meses": (lambda: comparar_meses(transacciones), historial.comparar_periodos),
+        }
+        resultados = {nombre: (_mediana_ms(python, repeticiones), _mediana_ms(columnar, repeticiones))
+                      for nombre, (python, columnar) in operaciones.items()}
+        memoria = (_pico_memoria(carga_python), _pico_memoria(operaciones["carga"][1]))
+    return len(transacciones), resultados, memoria
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara la analítica con NumPy frente a bucles de Python.")
+    parser.add_argument("--filas", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--url", help="Base de datos dedicada (se borran sus tablas). Por defecto, SQLite temporal.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        for filas in args.filas:
+            engine, usuario_id = preparar(args.url, directorio, filas, args.semilla)
+            try:
+                n, resultados, (memoria_python, memoria_columnar) = medir(engine, usuario_id, args.repeticiones)
+            finally:
+                engine.dispose()
+            print(f"{filas} filas ({n} del usuario medido)")
+            print(f"  {'operacion':<20} {'python ms':>11} {'numpy ms':>10} {'x':>8}")
+            for nombre, (python, columnar) in resultados.items():
+                print(f"  {nombre:<20} {python:>11.2f} {columnar:>10.2f} {python / columnar:>8.1f}")
+            print(f"  {'memoria carga':<20} {memoria_python / 2**20:>9.1f}MB {memoria_columnar / 2**20:>8.1f}MB "
+                  f"{memoria_python / memoria_columnar:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Benchmark del arranque: tiempo de importación de los puntos de entrada.
+
+Cada medición es un intérprete nuevo con `python -X importtime -c "import <modulo>"`.
+Para cada módulo informa de la mediana del tiempo acumulado de su importación
+(columna cumulative de -X importtime), del tiempo total del proceso, de los
+módulos que más tardan y de si se llegaron a importar las dependencias pesadas
+(SQLAlchemy, bcrypt, NumPy, Kivy), que deben esperar a la primera acción.
+
+  src.model.console   menú de consola (menuconsole.py)
+  src.view.menu       interfaz Kivy (main.py), sin abrir la ventana
+
+Con --presupuesto-ms, termina con código 1 si algún módulo lo supera.
+
+Uso:
+    python benchmarks/bench_arranque.py [--repeticiones 5] [--top 10] [--presupuesto-ms 150]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+MODULOS = ("src.model.console", "src.view.menu")
+PESADOS = ("sqlalchemy", "bcrypt", "numpy", "kivy.uix.textinput", "src.model.servicios", "src.model.db")
+
+
+def importtime(modulo):
+    """
+    Importa `modulo` en un intérprete nuevo con -X importtime.
+    Devuelve (segundos del proceso, {módulo: (propio_us, acumulado_us)}).
+    """
+    entorno = dict(os.environ, KIVY_NO_ARGS="1", KIVY_NO_CONSOLELOG="1", PYTHONDONTWRITEBYTECODE="1")
+    inicio = time.perf_counter()
+    proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+                             cwd=RAIZ, env=entorno, capture_output=True, text=True)
+    segundos = time.perf_counter() - inicio
+    if proceso.returncode != 0:
+        raise RuntimeError(f"No se pudo importar {modulo}:\n{proceso.stderr}")
+    tiempos = {}
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        # Un módulo puede aparecer dos veces; cuenta la primera (la que lo importa de verdad)
+        tiempos.setdefault(nombre.strip(), (int(propio), int(acumulado)))
+    return segundos, tiempos
+
+
+def medir(modulo, repeticiones):
+    procesos, acumulados, ultimo = [], [], {}
+    for _ in range(repeticiones):
+        segundos, tiempos = importtime(modulo)
+        procesos.append(segundos)
+        acumulados.append(tiempos[modulo][1])
+        ultimo = tiempos
+    return statistics.median(acumulados) / 1000, statistics.median(procesos) * 1000, ultimo
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide el tiempo de importación de los puntos de entrada.")
+    parser.add_argument("--modulos", nargs="+", default=list(MODULOS))
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="Módulos más lentos a mostrar.")
+    parser.add_argument("--presupuesto-ms", type=float, help="Máximo para la importación de cada módulo.")
+    args = parser.parse_args(argv)
+
+    excedidos = []
+    for modulo in args.modulos:
+        importacion, proceso, tiempos = medir(modulo, args.repeticiones)
+        print(f"{modulo}: importación {importacion:.1f} ms, proceso {proceso:.1f} ms (medianas)")
+        lentos = sorted(((propio, nombre) for nombre, (propio, _) in tiempos.items()), reverse=True)[:args.top]
+        for propio, nombre in lentos:
+            print(f"  {propio / 1000:>8.1f} ms  {nombre}")
+        cargados = [nombre for nombre in PESADOS if nombre in tiempos]
+        print(f"  pesados importados: {', '.join(cargados) if cargados else 'ninguno'}")
+        if args.presupuesto_ms is not None and importacion > args.presupuesto_ms:
+            excedidos.append(modulo)
+
+    if excedidos:
+        print(f"Superan el presupuesto de {args.presupuesto_ms} ms: {', '.join(excedidos)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""
+Benchmark de bloqueos del hilo de la interfaz Kivy.
+
+Hace girar el bucle del Clock (60 fps) mientras se ejecutan las acciones de
+datos del menú: página del listado, resumen, registrar y eliminar una
+transacción. Compara dos variantes:
+
+  sincrono  la consulta se ejecuta dentro del callback del Clock (como antes)
+  ejecutor  la consulta se envía a EjecutorBD y el resultado vuelve por el Clock
+
+Cada acción se lanza 100 ms después de recibir el resultado de la anterior.
+Para cada variante informa del intervalo máximo, p99 y mediana entre frames,
+del número de frames que superan --umbral-ms (un frame "congelado") y del
+tiempo total que la interfaz pasa congelada.
+
+Uso:
+    python benchmarks/bench_bloqueos_ui.py [--transacciones 50000] [--acciones 20] [--latencia-ms 20]
+
+--latencia-ms añade una espera por sentencia SQL para simular un servidor
+PostgreSQL remoto; la base de datos es un SQLite temporal.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+
+from kivy.clock import Clock
+from sqlalchemy import create_engine, event, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from src.model import reportes
+from src.model.catalogo_categorias import CatalogoCategorias
+from src.model.categoria import Categoria, TipoCategoria
+from src.model.esquema import crear_esquema
+from src.model.listado import pagina_transacciones
+from src.model.resumen_mensual import reconstruir_resumen
+from src.model.transaccion import Transaccion, TipoTransaccionEnum
+from src.model.usuario import Usuario
+from src.view.segundo_plano import EjecutorBD
+
+
+def preparar_base(ruta, transacciones):
+    engine = create_engine(f"sqlite:///{ruta}", connect_args={"check_same_thread": False})
+    crear_esquema(engine)
+    Sesion = sessionmaker(bind=engine)
+    with Sesion() as db:
+        Usuario.COSTE_BCRYPT = 4
+        usuario = Usuario(nombre="Bench", correo="bench@example.com", contraseña="segura123")
+        db.add(usuario)
+        # El nombre de categoría es único: "Otros" y "General" se quedan con el primer tipo
+        categorias = {}
+        for tipo in ("Ingreso", "Egreso"):
+            for nombre, descripcion in Categoria.categorias_por_tipo(tipo):
+                categorias.setdefault(nombre, Categoria(nombre=nombre, tipo=tipo, descripcion=descripcion))
+        db.add_all(categorias.values())
+        db.commit()
+        categorias = db.execute(select(Categoria.id, Categoria.tipo)).all()
+
+        aleatorio = random.Random(42)
+        inicio = datetime(2020, 1, 1)
+        filas = []
+        for i in range(transacciones):
+            categoria_id, tipo = aleatorio.choice(categorias)
+            filas.append({
+                "cantidad": round(aleatorio.uniform(1, 500), 2),
+                "fecha": inicio + timedelta(minutes=30 * i),
+                "tipo": TipoTransaccionEnum.INGRESO if tipo == TipoCategoria.INGRESO else TipoTransaccionEnum.EGRESO,
+                "categoria_id": categoria_id,
+                "usuario_id": usuario.id,
+            })
+        db.execute(insert(Transaccion.__table__), filas)
+        reconstruir_resumen(db.connection())
+        db.commit()
+        usuario_id = usuario.id
+    return engine, usuario_id
+
+
+def simular_latencia(engine, segundos):
+    if segundos <= 0:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def esperar(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(segundos)
+
+
+def acciones(usuario_id):
+    """Las mismas operaciones que hacen los manejadores del menú, como funciones de una sesión."""
+    def listar(db):
+        return pagina_transacciones(db, usuario_id, tamano=200)
+
+    def resumen(db):
+        return (reportes.balance(db, usuario_id), reportes.top_categorias(db, usuario_id, n=5),
+                reportes.totales_por_periodo(db, usuario_id, "mes")[-6:])
+
+    def registrar_y_eliminar(db):
+        usuario = db.get(Usuario, usuario_id)
+        transaccion = Transaccion(cantidad=10.0, fecha=datetime.now(), tipo="Egreso",
+                                  categoria=CatalogoCategorias.nombres(db, "Egreso")[0], usuario=usuario, session=db)
+        db.add(transaccion)
+        db.commit()
+        db.delete(transaccion)
+        db.commit()
+
+    return [listar, resumen, registrar_y_eliminar]
+
+
+def medir(variante, fabrica_sesiones, trabajos, umbral):
+    ejecutor = EjecutorBD(fabrica_sesiones=fabrica_sesiones)
+    pendientes = list(trabajos)
+
+    def terminado(_resultado=None):
+        # Como un usuario: la siguiente acción se pulsa 100 ms después de ver el resultado
+        if pendientes:
+            Clock.schedule_once(lambda dt: lanzar(pendientes.pop(0)), 0.1)
+        else:
+            estado["fin"] = True
+
+    def lanzar(funcion):
+        if variante == "sincrono":
+            db = fabrica_sesiones()
+            try:
+                funcion(db)
+            finally:
+                db.close()
+            terminado()
+        else:
+            ejecutor.enviar(funcion, terminado, lambda error: terminado())
+
+    estado = {"fin": False}
+    Clock.tick()
+    terminado()
+    marcas = [time.perf_counter()]
+    limite = marcas[0] + 300
+    while not estado["fin"] and marcas[-1] < limite:
+        Clock.tick()
+        marcas.append(time.perf_counter())
+    ejecutor.cerrar()
+
+    intervalos = sorted((b - a) * 1000 for a, b in zip(marcas, marcas[1:]))
+    congelados = [t for t in intervalos if t > umbral]
+    return {
+        "variante": variante,
+        "frames": len(intervalos),
+        "max_ms": intervalos[-1],
+        "p99_ms": intervalos[int(len(intervalos) * 0.99)],
+        "mediana_ms": statistics.median(intervalos),
+        "congelados": len(congelados),
+        "segundos_congelado": sum(congelados) / 1000,
+        "segundos": marcas[-1] - marcas[0],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide los bloqueos del hilo de Kivy durante el acceso a datos.")
+    parser.add_argument("--transacciones", type=int, default=50000)
+    parser.add_argument("--acciones", type=int, default=20, help="Número de acciones a ejecutar por variante.")
+    parser.add_argument("--latencia-ms", type=float, default=20.0, help="Espera simulada por sentencia SQL.")
+    parser.add_argument("--umbral-ms", type=float, default=50.0, help="Un frame más largo cuenta como congelado.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        engine, usuario_id = preparar_base(os.path.join(directorio, "bench.db"), args.transacciones)
+        simular_latencia(engine, args.latencia_ms / 1000)
+        fabrica_sesiones = sessionmaker(bind=engine)
+        tipos = acciones(usuario_id)
+        trabajos = [tipos[i % len(tipos)] for i in range(args.acciones)]
+
+        print(f"{args.transacciones} transacciones, {args.acciones} acciones, "
+              f"latencia simulada {args.latencia_ms:g} ms/sentencia")
+        print(f"{'variante':<10} {'frames':>7} {'máx ms':>8} {'p99 ms':>8} {'mediana':>8} "
+              f"{'>' + format(args.umbral_ms, 'g') + ' ms':>8} {'congelado s':>12} {'total s':>8}")
+        for variante in ("sincrono", "ejecutor"):
+            r = medir(variante, fabrica_sesiones, trabajos, args.umbral_ms)
+            print(f"{r['variante']:<10} {r['frames']:>7} {r['max_ms']:>8.1f} {r['p99_ms']:>8.1f} "
+                  f"{r['mediana_ms']:>8.1f} {r['congelados']:>8} {r['segundos_congelado']:>12.2f} {r['segundos']:>8.2f}")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
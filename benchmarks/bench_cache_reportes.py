@@ -0,0 +1,110 @@
+"""
+Benchmark de la cache de reportes (src/model/cache_reportes.py).
+
+Genera los mismos datos sintéticos que bench_modelo.py y pide la pantalla de
+resumen (servicios.resumen: balance, top de categorías y meses) de usuarios al
+azar. Una de cada --lecturas-por-escritura peticiones registra antes una
+transacción del usuario, que invalida sus reportes. Compara dos variantes:
+
+  sin_cache   tamaño máximo 0: cada resumen consulta la base de datos
+  con_cache   LRU con --tamano entradas y --ttl segundos
+
+Informa de la mediana y el p99 por resumen y de los contadores de la cache
+(aciertos, fallos, expulsiones, caducadas), que sirven para ajustar el tamaño.
+
+Uso:
+    python benchmarks/bench_cache_reportes.py [--filas 100000] [--peticiones 2000] [--lecturas-por-escritura 20]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from bench_modelo import SEMILLA, categorias_iniciales, generar_transacciones
+from src.model import servicios
+from src.model.cache_reportes import CacheReportes
+from src.model.catalogo_categorias import CatalogoCategorias
+from src.model.categoria import Categoria
+from src.model.esquema import crear_esquema
+from src.model.importacion import importar_transacciones
+from src.model.usuario import Usuario
+
+USUARIOS = 10
+
+
+def preparar(directorio, filas, semilla):
+    engine = create_engine(f"sqlite:///{os.path.join(directorio, 'cache.db')}")
+    crear_esquema(engine)
+    CatalogoCategorias.invalidar()
+    Usuario.COSTE_BCRYPT = 4
+    correos = [f"usuario{i}@bench.example.com" for i in range(USUARIOS)]
+    with sessionmaker(bind=engine)() as db:
+        db.add_all([Categoria(nombre=nombre, tipo=tipo, descripcion=descripcion)
+                    for nombre, (tipo, descripcion) in categorias_iniciales().items()])
+        db.add_all([Usuario(nombre=f"Usuario {i}", correo=correo, contraseña="segura123")
+                    for i, correo in enumerate(correos)])
+        db.commit()
+        importar_transacciones(db, generar_transacciones(filas, correos, semilla))
+        ids = db.scalars(select(Usuario.id).order_by(Usuario.id)).all()
+    return engine, ids
+
+
+def medir(engine, usuario_ids, peticiones, lecturas_por_escritura, semilla):
+    azar = random.Random(semilla)
+    sesiones = sessionmaker(bind=engine, expire_on_commit=False)
+    tiempos = []
+    for i in range(peticiones):
+        usuario_id = azar.choice(usuario_ids)
+        if i % lecturas_por_escritura == lecturas_por_escritura - 1:
+            with sesiones() as db:
+                servicios.registrar_transaccion(usuario_id, "12.34", "Egreso", "Alimentación",
+                                                fecha=datetime(2024, 6, 1), session=db)
+                db.commit()
+        inicio = time.perf_counter()
+        with sesiones() as db:
+            servicios.resumen(usuario_id, session=db)
+        tiempos.append(time.perf_counter() - inicio)
+    tiempos.sort()
+    return statistics.median(tiempos) * 1000, tiempos[int(len(tiempos) * 0.99)] * 1000
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mide la pantalla de resumen con y sin cache de reportes.")
+    parser.add_argument("--filas", type=int, default=100000)
+    parser.add_argument("--peticiones", type=int, default=2000)
+    parser.add_argument("--lecturas-por-escritura", type=int, default=20)
+    parser.add_argument("--tamano", type=int, default=CacheReportes.TAMANO_MAXIMO)
+    parser.add_argument("--ttl", type=float, default=None)
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    args = parser.parse_args(argv)
+    if args.lecturas_por_escritura < 1:
+        parser.error("--lecturas-por-escritura debe ser mayor que cero")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        engine, usuario_ids = preparar(directorio, args.filas, args.semilla)
+        try:
+            print(f"{args.filas} filas, {args.peticiones} resúmenes, "
+                  f"una escritura cada {args.lecturas_por_escritura} lecturas")
+            print(f"  {'variante':<10} {'mediana ms':>11} {'p99 ms':>9}")
+            for nombre, tamano in (("sin_cache", 0), ("con_cache", args.tamano)):
+                cache = CacheReportes.configurar(engine, tamano, args.ttl)
+                mediana, p99 = medir(engine, usuario_ids, args.peticiones, args.lecturas_por_escritura, args.semilla)
+                print(f"  {nombre:<10} {mediana:>11.2f} {p99:>9.2f}")
+            estadisticas = cache.estadisticas()
+            print("  cache: " + ", ".join(f"{clave}={valor:.2f}" if isinstance(valor, float) else f"{clave}={valor}"
+                                          for clave, valor in estadisticas.items()))
+        finally:
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Benchmark de concurrencia: capa síncrona con un hilo por cliente frente a la
+capa asíncrona (operaciones_async) con una tarea por cliente en un solo hilo.
+
+Cada cliente repite --operaciones veces el ciclo registrar -> listar la
+primera página -> eliminar, con su propio usuario y una sesión por operación
+(como haría un servidor con una sesión por petición). Se informa del
+rendimiento total (operaciones/s) y de la latencia p50/p99 por operación.
+
+Uso:
+    python benchmarks/bench_concurrencia.py [--clientes 1 10 50] [--operaciones 30] [--url URL]
+
+Por defecto usa un SQLite temporal (aiosqlite en la variante asíncrona), que
+serializa las escrituras; con --url postgresql+psycopg2://... la variante
+asíncrona usa asyncpg sobre la misma base, que debe ser una base dedicada:
+sus tablas se borran y se recrean.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.model import operaciones_async
+from src.model.base import Base
+from src.model.catalogo_categorias import CatalogoCategorias
+from src.model.categoria import Categoria
+from src.model.db import crear_sesiones_async, url_async
+from src.model.esquema import crear_esquema
+from src.model.listado import pagina_transacciones
+from src.model.transaccion import Transaccion
+from src.model.usuario import Usuario
+
+
+def preparar_base(url, clientes):
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    crear_esquema(engine)
+    CatalogoCategorias.invalidar()
+    Usuario.COSTE_BCRYPT = 4
+    with sessionmaker(bind=engine)() as db:
+        db.add(Categoria(nombre="Alimentación", tipo="Egreso"))
+        usuarios = [Usuario(nombre=f"Cliente {i}", correo=f"cliente{i}@bench.example.com", contraseña="segura123")
+                    for i in range(clientes)]
+        db.add_all(usuarios)
+        db.commit()
+        ids = [u.id for u in usuarios]
+    engine.dispose()
+    return ids
+
+
+def _resultado(variante, clientes, latencias, segundos):
+    ordenadas = sorted(latencias)
+    return {
+        "variante": variante,
+        "clientes": clientes,
+        "operaciones": len(ordenadas),
+        "por_segundo": len(ordenadas) / segundos,
+        "p50_ms": statistics.median(ordenadas) * 1000,
+        "p99_ms": ordenadas[min(len(ordenadas) - 1, int(len(ordenadas) * 0.99))] * 1000,
+    }
+
+
+def medir_sincrono(url, usuarios, operaciones):
+    engine = create_engine(url, pool_size=len(usuarios), max_overflow=0,
+                           connect_args={"timeout": 60} if url.startswith("sqlite") else {})
+    Sesion = sessionmaker(bind=engine)
+    latencias = []
+
+    def cronometrar(funcion):
+        inicio = time.perf_counter()
+        with Sesion() as db:
+            resultado = funcion(db)
+        latencias.append(time.perf_counter() - inicio)
+        return resultado
+
+    def cliente(usuario_id):
+        for _ in range(operaciones):
+            def registrar(db):
+                transaccion = Transaccion(cantidad=10.0, fecha=datetime.now(), tipo="Egreso", categoria="Alimentación",
+                                          usuario=db.get(Usuario, usuario_id), session=db)
+                db.add(transaccion)
+                db.commit()
+                return transaccion.id
+
+            def eliminar(db):
+                db.delete(db.scalars(select(Transaccion).where(Transaccion.id == transaccion_id,
+                                                               Transaccion.usuario_id == usuario_id)).one())
+                db.commit()
+
+            transaccion_id = cronometrar(registrar)
+            cronometrar(lambda db: pagina_transacciones(db, usuario_id))
+            cronometrar(eliminar)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(usuarios)) as pool:
+        list(pool.map(cliente, usuarios))
+    segundos = time.perf_counter() - inicio
+    engine.dispose()
+    return _resultado("sincrono", len(usuarios), latencias, segundos)
+
+
+async def _medir_async(url, usuarios, operaciones):
+    engine = create_async_engine(url_async(url), pool_size=len(usuarios), max_overflow=0,
+                                 connect_args={"timeout": 60} if url.startswith("sqlite") else {})
+    Sesiones = crear_sesiones_async(engine)
+    latencias = []
+
+    async def cronometrar(funcion):
+        inicio = time.perf_counter()
+        async with Sesiones() as db:
+            resultado = await funcion(db)
+        latencias.append(time.perf_counter() - inicio)
+        return resultado
+
+    async def cliente(usuario_id):
+        for _ in range(operaciones):
+            transaccion = await cronometrar(lambda db: operaciones_async.registrar_transaccion(
+                db, usuario_id, 10.0, "Egreso", "Alimentación"))
+            await cronometrar(lambda db: operaciones_async.listar_transacciones(db, usuario_id))
+            await cronometrar(lambda db: operaciones_async.eliminar_transaccion(db, usuario_id, transaccion.id))
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(u) for u in usuarios))
+    segundos = time.perf_counter() - inicio
+    await engine.dispose()
+    return _resultado("async", len(usuarios), latencias, segundos)
+
+
+def medir_async(url, usuarios, operaciones):
+    return asyncio.run(_medir_async(url, usuarios, operaciones))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara el rendimiento concurrente de las capas síncrona y asíncrona.")
+    parser.add_argument("--clientes", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--operaciones", type=int, default=30, help="Ciclos registrar/listar/eliminar por cliente.")
+    parser.add_argument("--url", help="URL síncrona de una base dedicada (se borran sus tablas).")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        url = args.url or f"sqlite:///{os.path.join(directorio, 'concurrencia.db')}"
+        print(f"{'variante':<10} {'clientes':>8} {'ops':>6} {'ops/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for clientes in args.clientes:
+            for medir in (medir_sincrono, medir_async):
+                usuarios = preparar_base(url, clientes)
+                r = medir(url, usuarios, args.operaciones)
+                print(f"{r['variante']:<10} {r['clientes']:>8} {r['operaciones']:>6} {r['por_segundo']:>9.1f} "
+                      f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
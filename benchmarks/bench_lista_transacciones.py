@@ -0,0 +1,110 @@
+"""
+Benchmark de la lista de transacciones de la interfaz Kivy.
+
+Compara la lista anterior (un Label por transacción dentro de un BoxLayout en
+un ScrollView) con ListaTransacciones (RecycleView). Mide el tiempo hasta que
+el popup queda abierto y maquetado, la memoria Python reservada (tracemalloc)
+y el número de widgets creados.
+
+Uso:
+    python benchmarks/bench_lista_transacciones.py [--filas 10000 100000] [--max-anterior 10000]
+
+La lista anterior crea un widget por fila (unos 45 KiB cada uno), por eso solo
+se mide hasta --max-anterior filas; con 0 no se mide.
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+
+from kivy.base import EventLoop
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.label import Label
+from kivy.uix.popup import Popup
+from kivy.uix.scrollview import ScrollView
+
+from src.view.lista_transacciones import ALTO_FILA, ListaTransacciones, fila_a_dato
+
+Fila = namedtuple("Fila", "id cantidad fecha tipo categoria_nombre")
+
+
+def generar_filas(n):
+    inicio = datetime(2020, 1, 1)
+    return [Fila(i, float(i % 1000), inicio + timedelta(minutes=i), "TipoTransaccionEnum.EGRESO", "Alimentación")
+            for i in range(n, 0, -1)]
+
+
+def lista_anterior(filas):
+    scroll_view = ScrollView(size_hint=(1, 1))
+    layout = BoxLayout(orientation='vertical', size_hint_y=None)
+    layout.bind(minimum_height=layout.setter('height'))
+    for t in filas:
+        layout.add_widget(Label(text=fila_a_dato(t)["text"], size_hint_y=None, height=ALTO_FILA))
+    scroll_view.add_widget(layout)
+    return scroll_view
+
+
+def lista_reciclada(filas):
+    lista = ListaTransacciones(size_hint=(1, 1))
+    lista.data = [fila_a_dato(t) for t in filas]
+    return lista
+
+
+def _abrir(construir, filas):
+    popup = Popup(title="Transacciones", content=construir(filas), size_hint=(0.9, 0.9))
+    popup.open(animation=False)
+    # Varios ciclos del bucle de eventos: maquetado y creación de las vistas visibles
+    for _ in range(3):
+        EventLoop.idle()
+    widgets = sum(1 for _ in popup.content.walk())
+    popup.dismiss(animation=False)
+    EventLoop.idle()
+    return widgets
+
+
+def medir(construir, filas):
+    # El tiempo y la memoria se miden por separado: tracemalloc ralentiza la ejecución
+    gc.collect()
+    inicio = time.perf_counter()
+    widgets = _abrir(construir, filas)
+    segundos = time.perf_counter() - inicio
+
+    gc.collect()
+    tracemalloc.start()
+    _abrir(construir, filas)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return segundos, pico / (1024 * 1024), widgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--max-anterior", type=int, default=10_000,
+                        help="Máximo de filas para medir la lista de un Label por fila.")
+    args = parser.parse_args()
+
+    EventLoop.ensure_window()
+    variantes = [("Label por fila", lista_anterior), ("RecycleView", lista_reciclada)]
+
+    print(f"{'filas':>8} | {'variante':<15} | {'apertura (s)':>12} | {'memoria (MiB)':>13} | {'widgets':>8}")
+    for n in args.filas:
+        filas = generar_filas(n)
+        for nombre, construir in variantes:
+            if construir is lista_anterior and n > args.max_anterior:
+                print(f"{n:>8} | {nombre:<15} | {'omitida (--max-anterior)':>42}")
+                continue
+            segundos, memoria, widgets = medir(construir, filas)
+            print(f"{n:>8} | {nombre:<15} | {segundos:>12.3f} | {memoria:>13.1f} | {widgets:>8}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+"""
+Benchmark de la capa de modelo con volúmenes realistas.
+
+Para cada tamaño (número de transacciones) crea una base vacía, genera datos
+sintéticos deterministas (misma semilla, mismos datos) y mide, siempre a
+través del código de la aplicación:
+
+  crear_usuario            Usuario(...) + commit (incluye el hash bcrypt)
+  insertar_lote            importar_transacciones con todas las filas
+  insertar_individual      Transaccion(...) + commit, una a una
+  listado_primera_pagina   pagina_transacciones del usuario con más datos
+  listado_recorrido        páginas sucesivas con el cursor (fecha, id)
+  listado_completo         consulta_listado de todas sus transacciones
+  eliminar_individual      eliminar_transacciones con un id + commit, una a una
+  eliminar_bloque          eliminar_transacciones con --operaciones ids + commit
+  balance, totales_por_tipo, totales_por_categoria, top_categorias,
+  totales_por_periodo      reportes del usuario con más datos, sin la cache de
+                           reportes (cada repetición consulta la base)
+  reconstruir_resumen      recálculo completo del resumen mensual
+
+Los resultados se escriben en JSON (una entrada por tamaño y operación) junto
+con el commit, las versiones y el motor usados, para comparar ejecuciones:
+
+    python benchmarks/bench_modelo.py --filas 1000 10000 100000 --salida antes.json
+    python benchmarks/bench_modelo.py --filas 1000 10000 100000 --comparar antes.json
+
+Con --comparar se informa de las operaciones cuya mediana empeora más de
+--tolerancia y el proceso termina con código 1 si hay alguna.
+
+Por defecto cada tamaño usa un SQLite temporal. Con --url se usa esa base de
+datos, que debe ser una base dedicada: sus tablas se borran y se recrean.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import sqlalchemy
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from src.model import reportes
+from src.model.base import Base
+from src.model.catalogo_categorias import CatalogoCategorias
+from src.model.categoria import Categoria
+from src.model.eliminacion import eliminar_transacciones
+from src.model.esquema import categorias_por_defecto, crear_esquema
+from src.model.importacion import importar_transacciones
+from src.model.listado import consulta_listado, pagina_transacciones
+from src.model.resumen_mensual import reconstruir_resumen
+from src.model.transaccion import Transaccion
+from src.model.usuario import Usuario
+
+SEMILLA = 20240101
+# Fecha fija: los datos no dependen del día en que se ejecuta el benchmark
+FECHA_FINAL = datetime(2024, 1, 1)
+DIAS_HISTORIA = 3 * 365
+
+
+def categorias_iniciales():
+    """Categorías por defecto, {nombre: (tipo, descripcion)} (esquema.categorias_por_defecto)."""
+    return categorias_por_defecto()
+
+
+def generar_transacciones(n, correos, semilla=SEMILLA):
+    """
+    n filas (número de línea, dict) en el formato de importar_transacciones.
+    El primer usuario concentra la mitad de las filas: es el que se usa para listar y agregar.
+    """
+    aleatorio = random.Random(semilla)
+    por_tipo = {"Ingreso": [], "Egreso": []}
+    for nombre, (tipo, _) in categorias_iniciales().items():
+        por_tipo[tipo].append(nombre)
+    inicio = FECHA_FINAL - timedelta(days=DIAS_HISTORIA)
+    segundos = DIAS_HISTORIA * 86400
+
+    for i in range(n):
+        tipo = "Ingreso" if aleatorio.random() < 0.2 else "Egreso"
+        correo = correos[0] if aleatorio.random() < 0.5 else aleatorio.choice(correos)
+        yield i + 1, {
+            "cantidad": round(aleatorio.lognormvariate(3.5, 1.0), 2),
+            "fecha": inicio + timedelta(seconds=aleatorio.randrange(segundos)),
+            "tipo": tipo,
+            "categoria": aleatorio.choice(por_tipo[tipo]),
+            "usuario": correo,
+        }
+
+
+def _estadisticas(tiempos):
+    ordenados = sorted(tiempos)
+    total = sum(ordenados)
+    return {
+        "n": len(ordenados),
+        "total_s": total,
+        "media_ms": total / len(ordenados) * 1000,
+        "mediana_ms": statistics.median(ordenados) * 1000,
+        "p95_ms": ordenados[min(len(ordenados) - 1, int(len(ordenados) * 0.95))] * 1000,
+        "min_ms": ordenados[0] * 1000,
+        "por_segundo": len(ordenados) / total if total else 0.0,
+    }
+
+
+def cronometrar(funcion, repeticiones):
+    tiempos = []
+    for i in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion(i)
+        tiempos.append(time.perf_counter() - inicio)
+    return _estadisticas(tiempos)
+
+
+def preparar_engine(url, directorio, filas):
+    if url is None:
+        engine = create_engine(f"sqlite:///{os.path.join(directorio, f'modelo-{filas}.db')}")
+    else:
+        engine = create_engine(url)
+        Base.metadata.drop_all(engine)
+    crear_esquema(engine)
+    CatalogoCategorias.invalidar()
+    return engine
+
+
+def medir_tamano(engine, filas, args):
+    resultados = {}
+    Sesion = sessionmaker(bind=engine)
+    correos = [f"usuario{i}@bench.example.com" for i in range(args.usuarios)]
+
+    with Sesion() as db:
+        db.add_all([Categoria(nombre=nombre, tipo=tipo, descripcion=descripcion)
+                    for nombre, (tipo, descripcion) in categorias_iniciales().items()])
+        db.commit()
+
+        def crear_usuario(i):
+            db.add(Usuario(nombre=f"Usuario {i}", correo=correos[i], contraseña="segura123"))
+            db.commit()
+
+        resultados["crear_usuario"] = cronometrar(crear_usuario, args.usuarios)
+
+        resumen = importar_transacciones(db, generar_transacciones(filas, correos, args.semilla))
+        if resumen.rechazadas:
+            raise RuntimeError(f"Datos sintéticos rechazados: {resumen.rechazadas[:5]}")
+        resultados["insertar_lote"] = dict(_estadisticas([resumen.segundos]),
+                                           importadas=resumen.importadas, filas_por_segundo=resumen.filas_por_segundo)
+
+        usuario = db.execute(select(Usuario).where(Usuario.correo == correos[0])).scalar_one()
+        usuario_id = usuario.id
+        aleatorio = random.Random(args.semilla + 1)
+        insertadas = []
+
+        def insertar(i, insertadas=insertadas):
+            transaccion = Transaccion(
+                cantidad=round(aleatorio.uniform(1, 500), 2),
+                fecha=FECHA_FINAL - timedelta(minutes=i),
+                tipo="Egreso",
+                categoria="Alimentación",
+                usuario=usuario,
+                session=db
+            )
+            db.add(transaccion)
+            db.flush()
+            insertadas.append(transaccion.id)
+            db.commit()
+
+        resultados["insertar_individual"] = cronometrar(insertar, args.operaciones)
+
+        resultados["listado_primera_pagina"] = cronometrar(
+            lambda i: pagina_transacciones(db, usuario_id), args.operaciones)
+
+        cursor = {"despues": None}
+
+        def siguiente_pagina(i):
+            pagina = pagina_transacciones(db, usuario_id, despues=cursor["despues"])
+            cursor["despues"] = pagina.siguiente
+
+        resultados["listado_recorrido"] = cronometrar(siguiente_pagina, args.paginas)
+        resultados["listado_completo"] = cronometrar(
+            lambda i: db.execute(consulta_listado(usuario_id)).all(), args.repeticiones)
+
+        def eliminar(i):
+            eliminar_transacciones(db, usuario_id, ids=[insertadas[i]])
+            db.commit()
+
+        resultados["eliminar_individual"] = cronometrar(eliminar, len(insertadas))
+
+        en_bloque = []
+        for i in range(args.operaciones):
+            insertar(i, en_bloque)
+
+        def eliminar_bloque(i):
+            eliminar_transacciones(db, usuario_id, ids=en_bloque)
+            db.commit()
+
+        resultados["eliminar_bloque"] = cronometrar(eliminar_bloque, 1)
+
+        resultados["balance"] = cronometrar(
+            lambda i: reportes.balance.sin_cache(db, usuario_id, FECHA_FINAL), args.repeticiones)
+        resultados["totales_por_tipo"] = cronometrar(
+            lambda i: reportes.totales_por_tipo.sin_cache(db, usuario_id), args.repeticiones)
+        resultados["totales_por_categoria"] = cronometrar(
+            lambda i: reportes.totales_por_categoria.sin_cache(db, usuario_id), args.repeticiones)
+        resultados["top_categorias"] = cronometrar(
+            lambda i: reportes.top_categorias.sin_cache(db, usuario_id), args.repeticiones)
+        resultados["totales_por_periodo"] = cronometrar(
+            lambda i: reportes.totales_por_periodo.sin_cache(db, usuario_id, "mes"), args.repeticiones)
+
+        def reconstruir(i):
+            reconstruir_resumen(db.connection())
+            db.commit()
+
+        resultados["reconstruir_resumen"] = cronometrar(reconstruir, 1)
+    return resultados
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(actual, anterior, tolerancia):
+    """Operaciones cuya mediana empeora más de `tolerancia` (0.25 = 25 %): [(filas, operacion, antes, ahora)]"""
+    previos = {(r["filas"], r["operacion"]): r for r in anterior["resultados"]}
+    regresiones = []
+    for r in actual["resultados"]:
+        previo = previos.get((r["filas"], r["operacion"]))
+        if previo and r["mediana_ms"] > previo["mediana_ms"] * (1 + tolerancia):
+            regresiones.append((r["filas"], r["operacion"], previo["mediana_ms"], r["mediana_ms"]))
+    return regresiones
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la capa de modelo con datos sintéticos.")
+    parser.add_argument("--filas", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Número de transacciones de cada ejecución (por ejemplo 1000 ... 1000000).")
+    parser.add_argument("--usuarios", type=int, default=10)
+    parser.add_argument("--operaciones", type=int, default=200,
+                        help="Altas, bajas y primeras páginas individuales por tamaño.")
+    parser.add_argument("--paginas", type=int, default=50, help="Páginas del recorrido con cursor.")
+    parser.add_argument("--repeticiones", type=int, default=20, help="Repeticiones de listados completos y reportes.")
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--url", help="Base de datos dedicada (se borran sus tablas). Por defecto, SQLite temporal.")
+    parser.add_argument("--salida", help="Archivo JSON de resultados (por defecto, salida estándar).")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior con la que comparar.")
+    parser.add_argument("--tolerancia", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    informe = {
+        "meta": {
+            "commit": _commit_actual(),
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "sqlalchemy": sqlalchemy.__version__,
+            "plataforma": platform.platform(),
+            "motor": "sqlite" if args.url is None else sqlalchemy.engine.make_url(args.url).get_backend_name(),
+            "semilla": args.semilla,
+            "usuarios": args.usuarios,
+            "coste_bcrypt": Usuario.COSTE_BCRYPT,
+        },
+        "resultados": [],
+    }
+
+    with tempfile.TemporaryDirectory() as directorio:
+        for filas in args.filas:
+            engine = preparar_engine(args.url, directorio, filas)
+            try:
+                for operacion, datos in medir_tamano(engine, filas, args).items():
+                    informe["resultados"].append(dict(filas=filas, operacion=operacion, **datos))
+                    print(f"{filas:>9} {operacion:<24} mediana {datos['mediana_ms']:>10.3f} ms "
+                          f"({datos['n']} ops)", file=sys.stderr)
+            finally:
+                engine.dispose()
+
+    texto = json.dumps(informe, indent=2, ensure_ascii=False)
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as archivo:
+            archivo.write(texto + "\n")
+    else:
+        print(texto)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            regresiones = comparar(informe, json.load(archivo), args.tolerancia)
+        for filas, operacion, antes, ahora in regresiones:
+            print(f"REGRESIÓN {filas} {operacion}: {antes:.3f} ms -> {ahora:.3f} ms", file=sys.stderr)
+        if regresiones:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
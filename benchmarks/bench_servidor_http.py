@@ -0,0 +1,211 @@
+"""
+Generador de carga para la API HTTP (src/model/servidor_http.py).
+
+Sin --url, arranca `servidor.py` en un proceso aparte sobre --db-url (por defecto
+un SQLite temporal, con las categorías por defecto y bcrypt de coste 4).
+Después --clientes conexiones persistentes crean cada una su usuario, inician
+sesión, registran --iniciales transacciones y, durante --duracion segundos, hacen
+peticiones con la mezcla:
+
+  listar     GET /transacciones?tamano=20     50 %
+  resumen    GET /resumen?meses=6             20 %
+  registrar  POST /transacciones              25 %
+  eliminar   DELETE /transacciones/<id>        5 %
+
+Informa de peticiones por segundo y, por operación, del número de peticiones,
+errores, p50 y p99 de la latencia.
+
+Uso:
+    python benchmarks/bench_servidor_http.py [--clientes 32] [--duracion 10] [--db-url URL | --url http://host:puerto]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(RAIZ)
+
+from bench_modelo import SEMILLA
+
+MEZCLA = (("listar", 50), ("resumen", 20), ("registrar", 25), ("eliminar", 5))
+CONTRASENA = "segura123"
+
+
+class ConexionHTTP:
+    """Conexión HTTP/1.1 persistente con cuerpos JSON."""
+
+    def __init__(self, host, puerto):
+        self.host, self.puerto = host, puerto
+        self.lector = self.escritor = None
+        self.token = None
+
+    async def abrir(self):
+        self.lector, self.escritor = await asyncio.open_connection(self.host, self.puerto)
+
+    async def cerrar(self):
+        self.escritor.close()
+        await self.escritor.wait_closed()
+
+    async def peticion(self, metodo, ruta, datos=None):
+        cuerpo = b"" if datos is None else json.dumps(datos).encode("utf-8")
+        cabeceras = [f"{metodo} {ruta} HTTP/1.1", f"Host: {self.host}", f"Content-Length: {len(cuerpo)}"]
+        if datos is not None:
+            cabeceras.append("Content-Type: application/json")
+        if self.token:
+            cabeceras.append(f"Authorization: Bearer {self.token}")
+        self.escritor.write(("\r\n".join(cabeceras) + "\r\n\r\n").encode("latin-1") + cuerpo)
+        await self.escritor.drain()
+        cabecera = (await self.lector.readuntil(b"\r\n\r\n")).decode("latin-1").split("\r\n")
+        estado = int(cabecera[0].split(" ")[1])
+        longitud = 0
+        for linea in cabecera[1:]:
+            if linea.lower().startswith("content-length:"):
+                longitud = int(linea.split(":", 1)[1])
+        respuesta = await self.lector.readexactly(longitud) if longitud else b""
+        return estado, json.loads(respuesta) if respuesta else None
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def arrancar_servidor(db_url, puerto):
+    # El servidor inicializa la base (esquema y categorías por defecto) al arrancar
+    entorno = dict(os.environ, GASTOS_BCRYPT_COSTE="4")
+    proceso = subprocess.Popen([sys.executable, os.path.join(RAIZ, "servidor.py"), "--puerto", str(puerto),
+                                "--url", db_url], cwd=RAIZ, env=entorno,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        if proceso.poll() is not None:
+            raise RuntimeError("El servidor terminó al arrancar")
+        with socket.socket() as s:
+            if s.connect_ex(("127.0.0.1", puerto)) == 0:
+                return proceso
+        time.sleep(0.1)
+    proceso.kill()
+    raise RuntimeError("El servidor no empezó a escuchar a tiempo")
+
+
+def percentil(valores, q):
+    return valores[min(len(valores) - 1, int(q * len(valores)))]
+
+
+async def preparar_cliente(host, puerto, indice, iniciales, categoria, prefijo):
+    conexion = ConexionHTTP(host, puerto)
+    await conexion.abrir()
+    correo = f"{prefijo}{indice}@bench.example.com"
+    estado, _ = await conexion.peticion("POST", "/usuarios",
+                                        {"nombre": f"Cliente {indice}", "correo": correo, "contrasena": CONTRASENA})
+    if estado not in (201, 409):
+        raise RuntimeError(f"No se pudo crear el usuario {correo}: {estado}")
+    estado, datos = await conexion.peticion("POST", "/sesiones", {"correo": correo, "contrasena": CONTRASENA})
+    if estado != 201:
+        raise RuntimeError(f"No se pudo iniciar sesión con {correo}: {estado}")
+    conexion.token = datos["token"]
+    ids = []
+    for i in range(iniciales):
+        _, datos = await conexion.peticion("POST", "/transacciones", {
+            "cantidad": f"{i % 90 + 1}.25", "tipo": "Egreso", "categoria": categoria,
+            "fecha": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}"})
+        ids.append(datos["id"])
+    return conexion, ids
+
+
+async def carga(conexion, ids, categoria, fin, azar, latencias, errores):
+    operaciones, pesos = zip(*MEZCLA)
+    while time.perf_counter() < fin:
+        operacion = azar.choices(operaciones, pesos)[0]
+        if operacion == "eliminar" and not ids:
+            operacion = "registrar"
+        inicio = time.perf_counter()
+        if operacion == "listar":
+            estado, _ = await conexion.peticion("GET", "/transacciones?tamano=20")
+        elif operacion == "resumen":
+            estado, _ = await conexion.peticion("GET", "/resumen?meses=6")
+        elif operacion == "registrar":
+            estado, datos = await conexion.peticion("POST", "/transacciones", {
+                "cantidad": f"{azar.randint(1, 500)}.{azar.randint(0, 99):02d}", "tipo": "Egreso",
+                "categoria": categoria})
+            if estado == 201:
+                ids.append(datos["id"])
+        else:
+            estado, _ = await conexion.peticion("DELETE", f"/transacciones/{ids.pop(azar.randrange(len(ids)))}")
+        latencias[operacion].append(time.perf_counter() - inicio)
+        if estado >= 400:
+            errores[operacion] += 1
+
+
+async def medir(host, puerto, clientes, duracion, iniciales, categoria, semilla):
+    prefijo = f"carga{int(time.time())}-"
+    preparados = await asyncio.gather(*[preparar_cliente(host, puerto, i, iniciales, categoria, prefijo)
+                                        for i in range(clientes)])
+    latencias, errores = defaultdict(list), defaultdict(int)
+    inicio = time.perf_counter()
+    fin = inicio + duracion
+    try:
+        await asyncio.gather(*[carga(conexion, ids, categoria, fin, random.Random(semilla + i), latencias, errores)
+                               for i, (conexion, ids) in enumerate(preparados)])
+    finally:
+        for conexion, _ in preparados:
+            await conexion.cerrar()
+    return time.perf_counter() - inicio, latencias, errores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera carga contra la API HTTP y mide latencia y rendimiento.")
+    destino = parser.add_mutually_exclusive_group()
+    destino.add_argument("--url", help="API ya en marcha (http://host:puerto). Por defecto se arranca una.")
+    destino.add_argument("--db-url", help="Base de datos del servidor que se arranca. Por defecto, SQLite temporal.")
+    parser.add_argument("--clientes", type=int, default=32)
+    parser.add_argument("--duracion", type=float, default=10)
+    parser.add_argument("--iniciales", type=int, default=20, help="Transacciones por cliente antes de medir.")
+    parser.add_argument("--categoria", default="Alimentación", help="Categoría de egreso de las transacciones.")
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        proceso = None
+        if args.url:
+            url = urlsplit(args.url)
+            host, puerto = url.hostname, url.port or 80
+        else:
+            host, puerto = "127.0.0.1", _puerto_libre()
+            proceso = arrancar_servidor(args.db_url or f"sqlite:///{os.path.join(directorio, 'api.db')}", puerto)
+        try:
+            segundos, latencias, errores = asyncio.run(
+                medir(host, puerto, args.clientes, args.duracion, args.iniciales, args.categoria, args.semilla))
+        finally:
+            if proceso is not None:
+                proceso.terminate()
+                proceso.wait(timeout=10)
+
+    total = sum(len(valores) for valores in latencias.values())
+    print(f"{args.clientes} clientes, {segundos:.1f} s: {total} peticiones, {total / segundos:.1f} peticiones/s")
+    print(f"  {'operacion':<10} {'n':>7} {'errores':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    todas = []
+    for operacion, _ in MEZCLA:
+        valores = sorted(latencias[operacion])
+        todas.extend(valores)
+        if valores:
+            print(f"  {operacion:<10} {len(valores):>7} {errores[operacion]:>8} "
+                  f"{percentil(valores, 0.5) * 1000:>8.2f} {percentil(valores, 0.99) * 1000:>8.2f}")
+    todas.sort()
+    if todas:
+        print(f"  {'total':<10} {len(todas):>7} {sum(errores.values()):>8} "
+              f"{percentil(todas, 0.5) * 1000:>8.2f} {percentil(todas, 0.99) * 1000:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+"""
+Benchmark de inicios de sesión concurrentes.
+
+Simula --clientes usuarios que, a la vez desde --hilos hilos, inician sesión
+(servicios.iniciar_sesion con bcrypt) y hacen --peticiones peticiones que leen
+el usuario de la sesión y su primera página de transacciones. Compara:
+
+  global     la sesión en un atributo de clase, como el antiguo Sesion
+  contexto   src/model/sesion.py: token en una ContextVar y almacén de sesiones
+
+Informa de inicios de sesión por segundo, mediana y p99 por petición, y de las
+peticiones que vieron a otro usuario ("mezcladas"), que deben ser 0 en contexto.
+
+Uso:
+    python benchmarks/bench_sesiones.py [--clientes 200] [--hilos 16] [--peticiones 5]
+"""
+import argparse
+import contextvars
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from src.model import servicios
+from src.model.categoria import Categoria
+from src.model.esquema import crear_esquema
+from src.model.sesion import Sesion, instantanea
+from src.model.usuario import Usuario
+
+CONTRASENA = "segura123"
+
+
+class SesionGlobal:
+    """La sesión de antes: un único usuario por proceso."""
+    _usuario_actual = None
+
+    @classmethod
+    def iniciar_sesion(cls, usuario):
+        cls._usuario_actual = instantanea(usuario)
+
+    @classmethod
+    def cerrar_sesion(cls):
+        cls._usuario_actual = None
+
+    @classmethod
+    def obtener_usuario_actual(cls):
+        return cls._usuario_actual
+
+
+def preparar(directorio, clientes):
+    engine = create_engine(f"sqlite:///{os.path.join(directorio, 'sesiones.db')}",
+                           connect_args={"check_same_thread": False, "timeout": 30})
+    crear_esquema(engine)
+    Usuario.COSTE_BCRYPT = 4
+    with sessionmaker(bind=engine)() as db:
+        db.add(Categoria(nombre="Alimentación", tipo="Egreso"))
+        db.add_all([Usuario(nombre=f"Usuario {i}", correo=f"usuario{i}@bench.example.com", contraseña=CONTRASENA)
+                    for i in range(clientes)])
+        db.commit()
+    return engine
+
+
+def cliente(sesiones, sesion, correo, peticiones):
+    """Inicia sesión y hace las peticiones; devuelve (segundos por petición, peticiones mezcladas)."""
+    with sesiones() as db:
+        usuario = servicios.iniciar_sesion(correo, CONTRASENA, session=db)
+        db.commit()
+        esperado = usuario.id
+        sesion.iniciar_sesion(usuario)
+    tiempos, mezcladas = [], 0
+    for _ in range(peticiones):
+        inicio = time.perf_counter()
+        # Cede el GIL entre el inicio de sesión y la lectura, como haría una petición real
+        time.sleep(0)
+        actual = sesion.obtener_usuario_actual()
+        if actual is None or actual.id != esperado:
+            mezcladas += 1
+        if actual is not None:
+            with sesiones() as db:
+                servicios.listar_transacciones(actual.id, tamano=20, session=db)
+        tiempos.append(time.perf_counter() - inicio)
+    sesion.cerrar_sesion()
+    return tiempos, mezcladas
+
+
+def medir(engine, sesion, clientes, hilos, peticiones):
+    sesiones = sessionmaker(bind=engine, expire_on_commit=False)
+    correos = [f"usuario{i}@bench.example.com" for i in range(clientes)]
+    barrera = threading.Barrier(min(hilos, clientes))
+
+    def tarea(correo):
+        try:
+            barrera.wait(timeout=0.5)
+        except threading.BrokenBarrierError:
+            pass
+        # Cada cliente en su propio contexto, como una tarea de asyncio o una petición del servidor
+        return contextvars.copy_context().run(cliente, sesiones, sesion, correo, peticiones)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        resultados = list(pool.map(tarea, correos))
+    segundos = time.perf_counter() - inicio
+    tiempos = sorted(t for tiempos_cliente, _ in resultados for t in tiempos_cliente)
+    mezcladas = sum(m for _, m in resultados)
+    return clientes / segundos, statistics.median(tiempos) * 1000, tiempos[int(len(tiempos) * 0.99)] * 1000, mezcladas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inicios de sesión concurrentes con sesión global o por contexto.")
+    parser.add_argument("--clientes", type=int, default=200)
+    parser.add_argument("--hilos", type=int, default=16)
+    parser.add_argument("--peticiones", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directorio:
+        engine = preparar(directorio, args.clientes)
+        try:
+            print(f"{args.clientes} clientes, {args.hilos} hilos, {args.peticiones} peticiones por cliente")
+            print(f"  {'variante':<10} {'logins/s':>9} {'mediana ms':>11} {'p99 ms':>8} {'mezcladas':>10}")
+            for nombre, sesion in (("global", SesionGlobal), ("contexto", Sesion)):
+                por_segundo, mediana, p99, mezcladas = medir(engine, sesion, args.clientes, args.hilos,
+                                                             args.peticiones)
+                print(f"  {nombre:<10} {por_segundo:>9.1f} {mediana:>11.2f} {p99:>8.2f} {mezcladas:>10}")
+        finally:
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import numpy as np
+from sqlalchemy import case, select
+
+from src.model.archivo import ArchivoFrio
+from src.model.dinero import centimos
+from src.model.transaccion import Transaccion, TipoTransaccionEnum
+
+# Análisis del historial de un usuario sobre arrays de NumPy. Los importes son
+# enteros de 64 bits en céntimos (como en la base de datos), así que las sumas son
+# exactas; solo las medias y las variaciones son float.
+
+PERIODOS = ("dia", "semana", "mes", "anio")
+
+_DTYPE = np.dtype([
+    ("fecha", "datetime64[us]"),
+    ("cantidad", np.int64),
+    ("signo", np.int8),
+    ("categoria_id", np.int64),
+])
+
+
+def truncar(fechas, periodo):
+    """Inicio del periodo de cada fecha (datetime64[D], [M] o [Y]). Las semanas empiezan en lunes."""
+    if periodo == "dia":
+        return fechas.astype("datetime64[D]")
+    if periodo == "semana":
+        # El 1970-01-01 (día 0) fue jueves: se desplaza para que los lunes sean múltiplos de 7
+        dias = fechas.astype("datetime64[D]").astype(np.int64)
+        return ((dias + 3) // 7 * 7 - 3).astype("datetime64[D]")
+    if periodo == "mes":
+        return fechas.astype("datetime64[M]")
+    if periodo == "anio":
+        return fechas.astype("datetime64[Y]")
+    raise ValueError("Periodo debe ser 'dia', 'semana', 'mes' o 'anio'")
+
+
+def agrupar(claves, valores):
+    """
+    Suma de `valores` por clave: (claves únicas ordenadas, sumas, número de elementos).
+    Las sumas conservan el dtype de `valores` (int64 exacto para céntimos).
+    """
+    if len(claves) == 0:
+        return claves[:0], valores[:0], np.zeros(0, dtype=np.int64)
+    if np.any(claves[1:] < claves[:-1]):
+        orden = np.argsort(claves, kind="stable")
+        claves, valores = claves[orden], valores[orden]
+    inicios = np.flatnonzero(np.concatenate(([True], claves[1:] != claves[:-1])))
+    cuentas = np.diff(np.append(inicios, len(claves)))
+    return claves[inicios], np.add.reduceat(valores, inicios), cuentas
+
+
+def suma_movil(valores, ventana):
+    """Suma de cada ventana de `ventana` elementos consecutivos (len(valores) - ventana + 1 resultados)."""
+    if ventana < 1:
+        raise ValueError("La ventana debe ser mayor que cero")
+    if len(valores) < ventana:
+        return valores[:0]
+    acumulado = np.concatenate((np.zeros(1, dtype=valores.dtype), np.cumsum(valores)))
+    return acumulado[ventana:] - acumulado[:-ventana]
+
+
+class HistorialColumnar:
+    """
+    Transacciones de un usuario en arrays contiguos, ordenadas por fecha:
+    fecha (datetime64[us]), cantidad (int64, céntimos), signo (int8, 1 ingreso y -1 egreso)
+    y categoria_id (int64).
+    """
+
+    def __init__(self, fecha, cantidad, signo, categoria_id):
+        self.fecha = np.ascontiguousarray(fecha, dtype="datetime64[us]")
+        self.cantidad = np.ascontiguousarray(cantidad, dtype=np.int64)
+        self.signo = np.ascontiguousarray(signo, dtype=np.int8)
+        self.categoria_id = np.ascontiguousarray(categoria_id, dtype=np.int64)
+
+    @classmethod
+    def cargar(cls, session, usuario_id, desde=None, hasta=None):
+        """
+        Una sola consulta Core; las filas se copian a un array sin crear objetos Transaccion.
+        Si el engine tiene archivo frío, se añaden las transacciones archivadas del rango.
+        """
+        if desde is not None and hasta is not None and desde > hasta:
+            raise ValueError("La fecha inicial no puede ser posterior a la final")
+        consulta = select(
+            Transaccion.fecha,
+            centimos(Transaccion.cantidad),
+            case((Transaccion.tipo == TipoTransaccionEnum.INGRESO, 1), else_=-1),
+            Transaccion.categoria_id,
+        ).where(Transaccion.usuario_id == usuario_id)
+        if desde is not None:
+            consulta = consulta.where(Transaccion.fecha >= desde)
+        if hasta is not None:
+            consulta = consulta.where(Transaccion.fecha <= hasta)
+        consulta = consulta.order_by(Transaccion.fecha, Transaccion.id)
+
+        filas = np.fromiter(map(tuple, session.execute(consulta)), dtype=_DTYPE)
+        columnas = [filas["fecha"], filas["cantidad"], filas["signo"], filas["categoria_id"]]
+
+        archivo = ArchivoFrio.de(session)
+        if archivo is not None and archivo.anios(usuario_id):
+            archivadas = archivo.columnas(usuario_id, desde, hasta)
+            columnas = [np.concatenate((archivadas[nombre], actual))
+                        for nombre, actual in zip(("fecha", "cantidad", "signo", "categoria_id"), columnas)]
+            orden = np.argsort(columnas[0], kind="stable")
+            columnas = [valores[orden] for valores in columnas]
+        return cls(*columnas)
+
+    def __len__(self):
+        return len(self.cantidad)
+
+    def _mascara(self, tipo):
+        if tipo is None:
+            return slice(None)
+        if not isinstance(tipo, TipoTransaccionEnum):
+            tipo = TipoTransaccionEnum(str(tipo).capitalize())
+        return self.signo == (1 if tipo == TipoTransaccionEnum.INGRESO else -1)
+
+    def importes(self, tipo=None):
+        """Con `tipo`, las cantidades de ese tipo; sin él, con signo (ingresos positivos, egresos negativos)."""
+        if tipo is None:
+            return self.cantidad * self.signo
+        return self.cantidad[self._mascara(tipo)]
+
+    def totales_por_periodo(self, periodo="mes"):
+        """(periodos, ingresos, egresos, neto) de los periodos con transacciones, en orden cronológico."""
+        claves = truncar(self.fecha, periodo)
+        ingreso = self.signo == 1
+        periodos, ingresos, _ = agrupar(claves, np.where(ingreso, self.cantidad, 0))
+        _, egresos, _ = agrupar(claves, np.where(ingreso, 0, self.cantidad))
+        return periodos, ingresos, egresos, ingresos - egresos
+
+    def totales_por_categoria(self, tipo=None):
+        """(categoria_ids, totales, num_transacciones) ordenado por total descendente."""
+        mascara = self._mascara(tipo)
+        ids, totales, cuentas = agrupar(self.categoria_id[mascara], self.cantidad[mascara])
+        orden = np.argsort(-totales, kind="stable")
+        return ids[orden], totales[orden], cuentas[orden]
+
+    def serie(self, periodo="dia", tipo=None, desde=None, hasta=None):
+        """
+        (periodos, totales) con todos los periodos entre el primero y el último, también
+        los que no tienen transacciones (total 0). Sin `tipo`, el total es el neto. Sin
+        transacciones, la serie solo tiene periodos si se dan `desde` y `hasta`.
+        """
+        claves, totales, _ = agrupar(truncar(self.fecha[self._mascara(tipo)], periodo), self.importes(tipo))
+        if len(claves) == 0 and (desde is None or hasta is None):
+            return claves, totales
+        inicio = truncar(np.datetime64(desde, "us"), periodo) if desde is not None else claves[0]
+        fin = truncar(np.datetime64(hasta, "us"), periodo) if hasta is not None else claves[-1]
+        paso = 7 if periodo == "semana" else 1
+        periodos = np.arange(inicio, fin + paso, paso)
+        densos = np.zeros(len(periodos), dtype=np.int64)
+        dentro = (claves >= inicio) & (claves <= fin)
+        densos[np.searchsorted(periodos, claves[dentro])] = totales[dentro]
+        return periodos, densos
+
+    def suma_movil(self, ventana, periodo="dia", tipo=None):
+        """(periodos, sumas) de cada ventana de `ventana` periodos, asociada al último de la ventana."""
+        periodos, totales = self.serie(periodo, tipo)
+        return periodos[ventana - 1:], suma_movil(totales, ventana)
+
+    def media_movil(self, ventana, periodo="dia", tipo=None):
+        """Como suma_movil, pero la media por periodo (float, en céntimos)."""
+        periodos, sumas = self.suma_movil(ventana, periodo, tipo)
+        return periodos, sumas / ventana
+
+    def balance_acumulado(self, periodo="dia"):
+        """(periodos, saldo) con el neto acumulado al final de cada periodo."""
+        periodos, neto = self.serie(periodo)
+        return periodos, np.cumsum(neto)
+
+    def comparar_periodos(self, periodo="mes", tipo=None):
+        """
+        (periodos, totales, diferencia, variacion) respecto al periodo anterior. La variación
+        es relativa (0.25 = +25 %) y NaN cuando no hay periodo anterior o su total es 0.
+        """
+        periodos, totales = self.serie(periodo, tipo)
+        anteriores = np.concatenate((np.zeros(min(1, len(totales)), dtype=np.int64), totales[:-1]))
+        diferencia = totales - anteriores
+        variacion = np.full(len(totales), np.nan)
+        con_base = anteriores != 0
+        con_base[:1] = False
+        variacion[con_base] = diferencia[con_base] / np.abs(anteriores[con_base])
+        return periodos, totales, diferencia, variacion
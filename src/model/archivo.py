@@ -0,0 +1,346 @@
+import argparse
+import os
+import shutil
+import threading
+import weakref
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import delete, event, insert, select
+
+from src.model.cache_reportes import anotar
+from src.model.dinero import a_centimos, a_decimal
+from src.model.resumen_mensual import acumular
+from src.model.transaccion import Transaccion, TipoTransaccionEnum
+
+# Columnas de cada año archivado, un .npy por columna. El uid se conserva para la
+# sincronización; el signo es 1 (ingreso) o -1 (egreso)
+COLUMNAS = {
+    "id": np.int64,
+    "uid": "S32",
+    "fecha": "datetime64[us]",
+    "cantidad": np.int64,  # céntimos
+    "signo": np.int8,
+    "categoria_id": np.int64,
+}
+_IDS_POR_SENTENCIA = 500
+
+
+def _vacias():
+    return {nombre: np.zeros(0, dtype=dtype) for nombre, dtype in COLUMNAS.items()}
+
+
+def _unir(partes):
+    if not partes:
+        return _vacias()
+    return {nombre: np.concatenate([p[nombre] for p in partes]).astype(dtype) for nombre, dtype in COLUMNAS.items()}
+
+
+def _ordenar(columnas):
+    orden = np.lexsort((columnas["id"], columnas["fecha"]))
+    return {nombre: np.ascontiguousarray(valores[orden]) for nombre, valores in columnas.items()}
+
+
+def _clave_cursor(cursor):
+    fecha, id_ = cursor
+    return np.datetime64(fecha, "us"), id_
+
+
+def _pendientes(session):
+    """Años modificados en la transacción de la sesión: ruta -> si existía antes."""
+    if "archivo_frio" not in session.info:
+        session.info["archivo_frio"] = {}
+        event.listen(session, "after_commit", _confirmar)
+        event.listen(session, "after_rollback", _deshacer)
+    return session.info["archivo_frio"]
+
+
+def _confirmar(session):
+    pendientes = session.info["archivo_frio"]
+    for ruta, existia in pendientes.items():
+        if existia:
+            shutil.rmtree(ruta + ".anterior", ignore_errors=True)
+    pendientes.clear()
+
+
+def _deshacer(session):
+    pendientes = session.info["archivo_frio"]
+    for ruta, existia in pendientes.items():
+        shutil.rmtree(ruta, ignore_errors=True)
+        if existia:
+            os.replace(ruta + ".anterior", ruta)
+    pendientes.clear()
+
+
+class ArchivoFrio:
+    """
+    Transacciones antiguas fuera de la tabla, en <directorio>/<usuario_id>/<año>/ con un .npy
+    por columna, ordenadas por (fecha, id) y leídas con np.load(mmap_mode="r").
+    resumen_mensual solo cuenta las filas de la tabla: reportes, listado y analitica suman
+    las archivadas a partir de aquí. Se asocia a un engine con registrar().
+    """
+    _registro = weakref.WeakKeyDictionary()
+    _lock = threading.Lock()
+
+    def __init__(self, directorio):
+        self.directorio = directorio
+
+    @classmethod
+    def registrar(cls, engine, directorio):
+        archivo = cls(directorio)
+        with cls._lock:
+            cls._registro[engine] = archivo
+        return archivo
+
+    @classmethod
+    def olvidar(cls, engine):
+        with cls._lock:
+            cls._registro.pop(engine, None)
+
+    @classmethod
+    def de(cls, session):
+        """Archivo del engine de la sesión, o None si no tiene."""
+        return cls.del_engine(session.get_bind().engine)
+
+    @classmethod
+    def del_engine(cls, engine):
+        with cls._lock:
+            return cls._registro.get(engine)
+
+    def _ruta(self, usuario_id, anio=None):
+        ruta = os.path.join(self.directorio, str(usuario_id))
+        return ruta if anio is None else os.path.join(ruta, str(anio))
+
+    def anios(self, usuario_id):
+        try:
+            nombres = os.listdir(self._ruta(usuario_id))
+        except FileNotFoundError:
+            return []
+        return sorted(int(nombre) for nombre in nombres if nombre.isdigit())
+
+    def leer(self, usuario_id, anio):
+        """Columnas de un año como memmaps de solo lectura."""
+        ruta = self._ruta(usuario_id, anio)
+        if not os.path.isdir(ruta):
+            raise ValueError(f"No hay transacciones archivadas del usuario {usuario_id} en {anio}")
+        return {nombre: np.load(os.path.join(ruta, f"{nombre}.npy"), mmap_mode="r") for nombre in COLUMNAS}
+
+    def columnas(self, usuario_id, desde=None, hasta=None):
+        """Columnas archivadas del usuario con fecha entre `desde` y `hasta` (incluidas), ordenadas por (fecha, id)."""
+        partes = []
+        for anio in self.anios(usuario_id):
+            if (desde is not None and anio < desde.year) or (hasta is not None and anio > hasta.year):
+                continue
+            columnas = self.leer(usuario_id, anio)
+            fechas = columnas["fecha"]
+            inicio = 0 if desde is None else np.searchsorted(fechas, np.datetime64(desde, "us"), "left")
+            fin = len(fechas) if hasta is None else np.searchsorted(fechas, np.datetime64(hasta, "us"), "right")
+            if fin > inicio:
+                partes.append({nombre: valores[inicio:fin] for nombre, valores in columnas.items()})
+        return _unir(partes)
+
+    def uids(self, usuario_id, desde=None):
+        """uid de las transacciones archivadas del usuario (con fecha desde `desde`)."""
+        return {uid.decode() for uid in self.columnas(usuario_id, desde)["uid"].tolist()}
+
+    def tramo(self, usuario_id, n, despues=None, antes=None):
+        """
+        Hasta n filas archivadas en el orden del listado: sin cursor o con `despues`, las más
+        recientes anteriores al cursor (fecha, id) en orden descendente; con `antes`, las
+        siguientes al cursor en orden ascendente. Solo se leen los años necesarios.
+        """
+        descendente = antes is None
+        cursor = despues if descendente else antes
+        partes, reunidas = [], 0
+        for anio in (reversed(self.anios(usuario_id)) if descendente else self.anios(usuario_id)):
+            if cursor is not None and (anio > cursor[0].year if descendente else anio < cursor[0].year):
+                continue
+            columnas = self.leer(usuario_id, anio)
+            fechas, ids = columnas["fecha"], columnas["id"]
+            if cursor is None:
+                inicio, fin = 0, len(fechas)
+            else:
+                fecha, id_ = _clave_cursor(cursor)
+                # Filas con la misma fecha que el cursor: se decide por el id
+                primera = np.searchsorted(fechas, fecha, "left")
+                ultima = np.searchsorted(fechas, fecha, "right")
+                corte = primera + np.searchsorted(ids[primera:ultima], id_, "left" if descendente else "right")
+                inicio, fin = (0, corte) if descendente else (corte, len(fechas))
+            if descendente:
+                inicio = max(inicio, fin - (n - reunidas))
+            else:
+                fin = min(fin, inicio + (n - reunidas))
+            partes.append({nombre: valores[inicio:fin] for nombre, valores in columnas.items()})
+            reunidas += fin - inicio
+            if reunidas >= n:
+                break
+        columnas = _ordenar(_unir(partes))
+        if descendente:
+            columnas = {nombre: valores[::-1] for nombre, valores in columnas.items()}
+        return columnas
+
+    def _reemplazar(self, session, usuario_id, anio, columnas):
+        """
+        Sustituye un año por `columnas` (None: lo elimina). El año anterior se conserva como
+        <año>.anterior hasta que la sesión confirma; si se deshace, se recupera.
+        """
+        ruta = self._ruta(usuario_id, anio)
+        pendientes = _pendientes(session)
+        if ruta not in pendientes:
+            pendientes[ruta] = os.path.isdir(ruta)
+            if pendientes[ruta]:
+                shutil.rmtree(ruta + ".anterior", ignore_errors=True)
+                os.replace(ruta, ruta + ".anterior")
+        else:
+            shutil.rmtree(ruta, ignore_errors=True)
+        if columnas is not None:
+            nueva = ruta + ".nueva"
+            shutil.rmtree(nueva, ignore_errors=True)
+            os.makedirs(nueva)
+            for nombre, valores in columnas.items():
+                np.save(os.path.join(nueva, f"{nombre}.npy"), valores)
+            os.replace(nueva, ruta)
+
+    def archivar(self, session, antes, usuario_id=None):
+        """
+        Mueve al archivo las transacciones con fecha anterior a `antes` (de un usuario o de todos),
+        dentro de la transacción de la sesión: los archivos quedan definitivos al confirmarla.
+        Devuelve {(usuario_id, año): filas archivadas}.
+        """
+        tabla = Transaccion.__table__
+        consulta = select(tabla.c.id, tabla.c.uid, tabla.c.fecha, tabla.c.cantidad, tabla.c.tipo, tabla.c.categoria_id,
+                          tabla.c.usuario_id).where(tabla.c.fecha < antes)
+        if usuario_id is not None:
+            consulta = consulta.where(tabla.c.usuario_id == usuario_id)
+        filas = session.execute(consulta).all()
+        if not filas:
+            return {}
+
+        ids = [fila.id for fila in filas]
+        for i in range(0, len(ids), _IDS_POR_SENTENCIA):
+            session.execute(delete(tabla).where(tabla.c.id.in_(ids[i:i + _IDS_POR_SENTENCIA])))
+        acumular(session.connection(), filas, signo=-1)
+        anotar(session, session.get_bind(), {fila.usuario_id for fila in filas})
+
+        grupos = defaultdict(list)
+        for fila in filas:
+            grupos[(fila.usuario_id, fila.fecha.year)].append(fila)
+        for (usuario, anio), filas_anio in grupos.items():
+            nuevas = {
+                "id": [fila.id for fila in filas_anio],
+                "uid": [fila.uid for fila in filas_anio],
+                "fecha": [fila.fecha for fila in filas_anio],
+                "cantidad": [a_centimos(fila.cantidad) for fila in filas_anio],
+                "signo": [1 if fila.tipo == TipoTransaccionEnum.INGRESO else -1 for fila in filas_anio],
+                "categoria_id": [fila.categoria_id for fila in filas_anio],
+            }
+            nuevas = {nombre: np.array(valores, dtype=COLUMNAS[nombre]) for nombre, valores in nuevas.items()}
+            partes = [nuevas]
+            if anio in self.anios(usuario):
+                partes.insert(0, self.leer(usuario, anio))
+            self._reemplazar(session, usuario, anio, _ordenar(_unir(partes)))
+        return {clave: len(filas_anio) for clave, filas_anio in grupos.items()}
+
+    def restaurar(self, session, usuario_id, anio=None):
+        """
+        Devuelve a la tabla las transacciones archivadas del usuario (todas o las de un año)
+        con su id original si está libre. Devuelve cuántas se restauraron.
+        """
+        tabla = Transaccion.__table__
+        restauradas = 0
+        for anio in (self.anios(usuario_id) if anio is None else [anio]):
+            columnas = self.leer(usuario_id, anio)
+            ids = columnas["id"].tolist()
+            ocupados = set()
+            for i in range(0, len(ids), _IDS_POR_SENTENCIA):
+                ocupados.update(session.scalars(select(tabla.c.id).where(tabla.c.id.in_(ids[i:i + _IDS_POR_SENTENCIA]))))
+
+            filas = [
+                {"id": id_, "uid": uid.decode(), "cantidad": a_decimal(cantidad), "fecha": fecha,
+                 "categoria_id": categoria_id, "usuario_id": usuario_id,
+                 "tipo": TipoTransaccionEnum.INGRESO if signo == 1 else TipoTransaccionEnum.EGRESO}
+                for id_, uid, fecha, cantidad, signo, categoria_id in zip(
+                    ids, columnas["uid"].tolist(), columnas["fecha"].astype(datetime).tolist(),
+                    columnas["cantidad"].tolist(), columnas["signo"].tolist(), columnas["categoria_id"].tolist())
+            ]
+            con_id = [fila for fila in filas if fila["id"] not in ocupados]
+            # Un id ya reutilizado por otra transacción: se inserta con uno nuevo
+            sin_id = [{k: v for k, v in fila.items() if k != "id"} for fila in filas if fila["id"] in ocupados]
+            for lote in (con_id, sin_id):
+                if lote:
+                    session.execute(insert(tabla), lote)
+            acumular(session.connection(), filas)
+            anotar(session, session.get_bind(), {usuario_id})
+            self._reemplazar(session, usuario_id, anio, None)
+            restauradas += len(filas)
+        return restauradas
+
+    def eliminar(self, session, usuario_id, ids=None, desde=None, hasta=None, categoria_id=None):
+        """
+        Quita del archivo las transacciones del usuario que cumplen todos los filtros dados
+        (ids, fechas entre `desde` y `hasta` incluidas, categoría), dentro de la transacción
+        de la sesión. Devuelve los uid de las eliminadas.
+        """
+        eliminadas = []
+        for anio in self.anios(usuario_id):
+            if (desde is not None and anio < desde.year) or (hasta is not None and anio > hasta.year):
+                continue
+            columnas = self.leer(usuario_id, anio)
+            quitar = np.ones(len(columnas["id"]), dtype=bool)
+            if ids is not None:
+                quitar &= np.isin(columnas["id"], np.array(list(ids), dtype=np.int64))
+            if desde is not None:
+                quitar &= columnas["fecha"] >= np.datetime64(desde, "us")
+            if hasta is not None:
+                quitar &= columnas["fecha"] <= np.datetime64(hasta, "us")
+            if categoria_id is not None:
+                quitar &= columnas["categoria_id"] == categoria_id
+            if not quitar.any():
+                continue
+            eliminadas.extend(uid.decode() for uid in columnas["uid"][quitar].tolist())
+            quedan = {nombre: valores[~quitar] for nombre, valores in columnas.items()}
+            self._reemplazar(session, usuario_id, anio, quedan if len(quedan["id"]) else None)
+        if eliminadas:
+            anotar(session, session.get_bind(), {usuario_id})
+        return eliminadas
+
+
+def main(argv=None):
+    from src.model.db import SessionLocal, engine
+
+    parser = argparse.ArgumentParser(description="Archiva transacciones antiguas o las restaura a la base de datos.")
+    parser.add_argument("--directorio", help="Directorio del archivo (por defecto, la opción 'archivo' de la configuración).")
+    acciones = parser.add_subparsers(dest="accion", required=True)
+    archivar = acciones.add_parser("archivar", help="Mueve al archivo las transacciones anteriores a una fecha.")
+    archivar.add_argument("--antes", required=True, type=datetime.fromisoformat, help="Fecha de corte (AAAA-MM-DD).")
+    archivar.add_argument("--usuario", type=int, help="Solo el usuario con este id.")
+    restaurar = acciones.add_parser("restaurar", help="Devuelve a la base de datos las transacciones archivadas.")
+    restaurar.add_argument("--usuario", type=int, required=True)
+    restaurar.add_argument("--anio", type=int, help="Solo este año.")
+    args = parser.parse_args(argv)
+
+    db = SessionLocal()
+    try:
+        archivo = ArchivoFrio.registrar(engine, args.directorio) if args.directorio else ArchivoFrio.de(db)
+        if archivo is None:
+            parser.error("Indica --directorio o configura la opción 'archivo' de la base de datos.")
+        if args.accion == "archivar":
+            movidas = archivo.archivar(db, args.antes, args.usuario)
+            db.commit()
+            for (usuario, anio), n in sorted(movidas.items()):
+                print(f"Usuario {usuario}, {anio}: {n} transacciones archivadas")
+            print(f"Total archivadas: {sum(movidas.values())}")
+        else:
+            n = archivo.restaurar(db, args.usuario, args.anio)
+            db.commit()
+            print(f"Transacciones restauradas: {n}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import functools
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+
+from src.model.categoria import Categoria
+from src.model.transaccion import Transaccion
+
+# Clave en session.info con {engine: {usuario_id o _TODOS}} de lo que la sesión ha escrito
+_ESCRITOS = "cache_reportes"
+# Un cambio de categoría afecta a los reportes de todos los usuarios
+_TODOS = object()
+
+
+class CacheReportes:
+    """
+    Resultados de reportes por engine, con clave (usuario_id, consulta, parámetros).
+    LRU con un máximo de entradas y caducidad opcional (ttl, en segundos).
+
+    Se invalida con los eventos del ORM sobre Transaccion y Categoria (solo el usuario
+    afectado, o todos si cambia una categoría) y otra vez cuando termina la transacción
+    de la sesión que escribió. Cada usuario tiene una generación que se incrementa al
+    invalidar: un resultado calculado mientras otra sesión escribía no se guarda.
+    """
+    TAMANO_MAXIMO = 256
+    TTL = None
+
+    _caches = weakref.WeakKeyDictionary()
+    _lock_registro = threading.Lock()
+
+    def __init__(self, tamano_maximo=TAMANO_MAXIMO, ttl=TTL):
+        if tamano_maximo < 0:
+            raise ValueError("El tamaño máximo no puede ser negativo")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("El ttl debe ser mayor que cero")
+        self.tamano_maximo = tamano_maximo
+        self.ttl = ttl
+        self._entradas = OrderedDict()  # clave -> (caduca, resultado)
+        self._generaciones = {}
+        self._generacion_global = 0
+        self._lock = threading.Lock()
+        self.aciertos = self.fallos = self.expulsiones = self.caducadas = self.invalidaciones = 0
+
+    # ---- Registro por engine ----
+
+    @classmethod
+    def configurar(cls, engine, tamano_maximo=TAMANO_MAXIMO, ttl=TTL):
+        cache = cls(tamano_maximo, ttl)
+        with cls._lock_registro:
+            cls._caches[engine] = cache
+        return cache
+
+    @classmethod
+    def de(cls, bind):
+        """La cache del engine (o de la conexión o sesión); se crea con los valores por defecto."""
+        if isinstance(bind, Session):
+            bind = bind.get_bind()
+        engine = getattr(bind, "engine", bind)
+        with cls._lock_registro:
+            cache = cls._caches.get(engine)
+            if cache is None:
+                cache = cls._caches[engine] = cls()
+            return cache
+
+    @classmethod
+    def invalidar(cls, bind=None, usuario_id=None):
+        """Sin bind, todas las caches; sin usuario_id, todos los usuarios."""
+        with cls._lock_registro:
+            if bind is None:
+                caches = list(cls._caches.values())
+            else:
+                cache = cls._caches.get(getattr(bind, "engine", bind))
+                caches = [cache] if cache is not None else []
+        for cache in caches:
+            cache.descartar(_TODOS if usuario_id is None else usuario_id)
+
+    # ---- Entradas ----
+
+    def generacion(self, usuario_id):
+        with self._lock:
+            return self._generacion_global, self._generaciones.get(usuario_id, 0)
+
+    def obtener(self, clave):
+        """(True, valor) si la clave está y no ha caducado; (False, (None, None)) si no."""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                caduca, resultado = entrada
+                if caduca is None or caduca > time.monotonic():
+                    self._entradas.move_to_end(clave)
+                    self.aciertos += 1
+                    return True, resultado
+                del self._entradas[clave]
+                self.caducadas += 1
+            self.fallos += 1
+            return False, (None, None)
+
+    def guardar(self, clave, resultado, generacion):
+        """Guarda el resultado si el usuario (clave[0]) no ha cambiado desde `generacion`."""
+        if self.tamano_maximo == 0:
+            return
+        caduca = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if (self._generacion_global, self._generaciones.get(clave[0], 0)) != generacion:
+                return
+            self._entradas[clave] = (caduca, resultado)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self.tamano_maximo:
+                self._entradas.popitem(last=False)
+                self.expulsiones += 1
+
+    def descartar(self, usuario_id):
+        """Elimina las entradas del usuario (o todas con _TODOS) y cambia su generación."""
+        with self._lock:
+            self.invalidaciones += 1
+            if usuario_id is _TODOS:
+                self._generacion_global += 1
+                self._entradas.clear()
+                return
+            self._generaciones[usuario_id] = self._generaciones.get(usuario_id, 0) + 1
+            for clave in [clave for clave in self._entradas if clave[0] == usuario_id]:
+                del self._entradas[clave]
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self.aciertos = self.fallos = self.expulsiones = self.caducadas = self.invalidaciones = 0
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                "entradas": len(self._entradas),
+                "tamano_maximo": self.tamano_maximo,
+                "ttl": self.ttl,
+                "aciertos": self.aciertos,
+                "fallos": self.fallos,
+                "expulsiones": self.expulsiones,
+                "caducadas": self.caducadas,
+                "invalidaciones": self.invalidaciones,
+                "tasa_aciertos": self.aciertos / consultas if consultas else 0.0,
+            }
+
+    def __len__(self):
+        return len(self._entradas)
+
+
+def anotar(session, engine, usuario_ids):
+    """
+    Invalida ya los usuarios (o _TODOS) y los apunta en la sesión para invalidarlos otra
+    vez al terminar su transacción. Lo usan los eventos del ORM y las escrituras con Core
+    hechas dentro de una sesión (importacion, archivo).
+    """
+    cache = CacheReportes.de(engine)
+    usuario_ids = set(usuario_ids)
+    for usuario_id in usuario_ids:
+        cache.descartar(usuario_id)
+    if session is not None:
+        session.info.setdefault(_ESCRITOS, {}).setdefault(engine, set()).update(usuario_ids)
+
+
+def _usuarios_de(target):
+    usuarios = {target.usuario_id}
+    # Si la transacción cambia de usuario, el anterior también se ve afectado
+    historial = inspect(target).attrs["usuario_id"].history
+    usuarios.update(historial.deleted)
+    return usuarios - {None}
+
+
+def _al_cambiar_transaccion(mapper, conexion, target):
+    anotar(object_session(target), conexion.engine, _usuarios_de(target))
+
+
+def _al_cambiar_categoria(mapper, conexion, target):
+    anotar(object_session(target), conexion.engine, {_TODOS})
+
+
+def _al_terminar(session, transaccion):
+    if transaccion.parent is not None:
+        return
+    for engine, usuario_ids in session.info.pop(_ESCRITOS, {}).items():
+        cache = CacheReportes.de(engine)
+        for usuario_id in usuario_ids:
+            cache.descartar(usuario_id)
+
+
+for _evento in ("after_insert", "after_update", "after_delete"):
+    event.listen(Transaccion, _evento, _al_cambiar_transaccion)
+    event.listen(Categoria, _evento, _al_cambiar_categoria)
+event.listen(Session, "after_transaction_end", _al_terminar)
+
+
+def cacheado(reporte):
+    """
+    Decorador para reportes con firma (session, usuario_id, ...). Los resultados se comparten
+    entre sesiones del mismo engine; no se usa la cache si la sesión tiene cambios sin confirmar.
+    """
+    @functools.wraps(reporte)
+    def envoltorio(session, usuario_id, *args, **kwargs):
+        cache = CacheReportes.de(session)
+        if (cache.tamano_maximo == 0 or session.info.get(_ESCRITOS)
+                or session.new or session.dirty or session.deleted):
+            return reporte(session, usuario_id, *args, **kwargs)
+        try:
+            clave = (usuario_id, reporte.__name__, args, tuple(sorted(kwargs.items())))
+            hash(clave)
+        except TypeError:
+            return reporte(session, usuario_id, *args, **kwargs)
+        encontrado, (es_lista, resultado) = cache.obtener(clave)
+        if not encontrado:
+            generacion = cache.generacion(usuario_id)
+            resultado = reporte(session, usuario_id, *args, **kwargs)
+            es_lista = isinstance(resultado, list)
+            cache.guardar(clave, (es_lista, tuple(resultado) if es_lista else resultado), generacion)
+            return resultado
+        # Las listas se guardan como tuplas y se devuelven como copia: quien llama no altera la cache
+        return list(resultado) if es_lista else resultado
+
+    envoltorio.sin_cache = reporte
+    return envoltorio
@@ -0,0 +1,88 @@
+import threading
+import weakref
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from src.model.categoria import Categoria, TipoCategoria
+
+# Clave de session.info con los engines cuyas categorías ha cambiado la transacción de la sesión
+_ESCRITAS = "catalogo_categorias_escritas"
+
+
+class CatalogoCategorias:
+    """
+    Registro en memoria de las categorías por tipo (nombre -> id).
+    Se carga una sola vez por engine y se invalida cuando se insertan,
+    actualizan o eliminan categorías a través del ORM, y otra vez al terminar la
+    transacción que las cambió: lo que otra sesión cargue entretanto no queda guardado.
+    """
+    _cache = weakref.WeakKeyDictionary()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _normalizar_tipo(tipo):
+        if isinstance(tipo, TipoCategoria):
+            return tipo
+        if hasattr(tipo, "value"):
+            tipo = tipo.value
+        try:
+            return TipoCategoria(str(tipo).capitalize())
+        except ValueError:
+            raise ValueError("Tipo debe ser 'Ingreso' o 'Egreso'")
+
+    @classmethod
+    def categorias(cls, session, tipo) -> dict:
+        tipo = cls._normalizar_tipo(tipo)
+        bind = session.get_bind()
+        # Una sesión con categorías sin confirmar ve su propio catálogo, que no se comparte
+        propio = bool(session.info.get(_ESCRITAS))
+        if not propio:
+            with cls._lock:
+                cargadas = cls._cache.get(bind, {}).get(tipo)
+            if cargadas is not None:
+                return cargadas
+
+        # La consulta se hace sin el lock: con AsyncSession otra tarea del mismo hilo
+        # puede pedir el catálogo mientras esta espera a la base de datos
+        filas = session.query(Categoria.id, Categoria.nombre).filter(Categoria.tipo == tipo).all()
+        if propio:
+            return {fila.nombre: fila.id for fila in filas}
+        with cls._lock:
+            return cls._cache.setdefault(bind, {}).setdefault(tipo, {fila.nombre: fila.id for fila in filas})
+
+    @classmethod
+    def nombres(cls, session, tipo) -> list:
+        return list(cls.categorias(session, tipo))
+
+    @classmethod
+    def obtener_id(cls, session, tipo, nombre):
+        return cls.categorias(session, tipo).get(nombre)
+
+    @classmethod
+    def invalidar(cls, bind=None):
+        with cls._lock:
+            if bind is None:
+                cls._cache.clear()
+            else:
+                cls._cache.pop(bind, None)
+
+
+def _invalidar_por_evento(mapper, connection, target):
+    CatalogoCategorias.invalidar(connection.engine)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_ESCRITAS, set()).add(connection.engine)
+
+
+def _al_terminar(session, transaccion):
+    # Confirmada o deshecha: se descarta lo que otras sesiones cargaran durante la transacción
+    if transaccion.parent is not None:
+        return
+    for engine in session.info.pop(_ESCRITAS, ()):
+        CatalogoCategorias.invalidar(engine)
+
+
+for _evento in ("after_insert", "after_update", "after_delete"):
+    event.listen(Categoria, _evento, _invalidar_por_evento)
+event.listen(Session, "after_transaction_end", _al_terminar)
@@ -13,7 +13,7 @@ class Categoria(Base):
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     nombre = Column(String(100), nullable=False, unique=True)
-    tipo = Column(Enum(TipoCategoria), nullable=False)
+    tipo = Column(Enum(TipoCategoria), nullable=False, index=True)
     descripcion = Column(Text, nullable=True)
 
     def __repr__(self):
@@ -1,10 +1,14 @@
-from datetime import datetime
-from src.model.usuario import Usuario
-from src.model.categoria import Categoria
-from src.model.transaccion import Transaccion
-from src.model.errors import ContrasenaIncorrectaError, CorreoInvalidoError
+from src.model.errors import ContrasenaIncorrectaError, CorreoYaRegistradoError, FechaInvalidaError
+from src.model.estadisticas_sql import ESTADISTICAS_SQL, volcar_configurado
 from src.model.sesion import Sesion
-from src.model.db import SessionLocal
+
+# SQLAlchemy, bcrypt, NumPy y los modelos se importan con la primera opción que los
+# necesita (_servicios()), no al arrancar: el menú aparece sin esperar por ellos.
+# Esa primera opción también deja la base lista (esquema y categorías por defecto)
+def _servicios():
+    from src.model import servicios
+    servicios.preparar_base()
+    return servicios
 
 def crear_usuario():
     print("\n=== Crear Usuario ===")
@@ -12,41 +16,31 @@ def crear_usuario():
     correo = input("Correo: ").strip()
     contrasena = input("Contraseña: ").strip()
 
-    db = SessionLocal()
     try:
-        existe = db.query(Usuario).filter(Usuario.correo == correo).first()
-        if existe:
-            print("Error: El correo ya está registrado.")
-            return
-        nuevo_usuario = Usuario(nombre=nombre, correo=correo, contraseña=contrasena)
-        db.add(nuevo_usuario)
-        db.commit()
-        db.refresh(nuevo_usuario)
+        with ESTADISTICAS_SQL.medir("crear_usuario"):
+            nuevo_usuario = _servicios().crear_usuario(nombre, correo, contrasena)
         Sesion.iniciar_sesion(nuevo_usuario)
         print(f"Usuario '{nombre}' creado y sesión iniciada.")
+    except CorreoYaRegistradoError:
+        print("Error: El correo ya está registrado.")
     except Exception as e:
         print(f"Error al crear usuario: {e}")
-    finally:
-        db.close()
 
 def iniciar_sesion():
     print("\n=== Iniciar Sesión ===")
     correo = input("Correo: ").strip()
     contrasena = input("Contraseña: ").strip()
 
-    db = SessionLocal()
     try:
-        usuario = db.query(Usuario).filter(Usuario.correo == correo).first()
-        if not usuario or usuario.contraseña != contrasena:
-            raise ContrasenaIncorrectaError()
+        # Verifica con bcrypt y, si cambió el coste configurado, guarda el nuevo hash
+        with ESTADISTICAS_SQL.medir("iniciar_sesion"):
+            usuario = _servicios().iniciar_sesion(correo, contrasena)
         Sesion.iniciar_sesion(usuario)
         print(f"Sesión iniciada. Bienvenido {usuario.nombre}.")
     except ContrasenaIncorrectaError:
         print("Error: Correo o contraseña incorrectos.")
     except Exception as e:
         print(f"Error al iniciar sesión: {e}")
-    finally:
-        db.close()
 
 def registrar_transaccion():
     usuario = Sesion.obtener_usuario_actual()
@@ -61,15 +55,15 @@ def registrar_transaccion():
         print("Tipo inválido. Debe ser 'Ingreso' o 'Egreso'.")
         return
 
-    db = SessionLocal()
     try:
-        categorias_validas = db.query(Categoria).filter(Categoria.tipo == tipo).all()
+        with ESTADISTICAS_SQL.medir("categorias"):
+            categorias_validas = _servicios().categorias(tipo)
         if not categorias_validas:
             print(f"No hay categorías disponibles para tipo '{tipo}'.")
             return
         print("Categorías disponibles:")
-        for idx, cat in enumerate(categorias_validas, 1):
-            print(f"{idx}. {cat.nombre}")
+        for idx, nombre in enumerate(categorias_validas, 1):
+            print(f"{idx}. {nombre}")
         cat_idx_str = input("Selecciona número de categoría: ").strip()
         try:
             cat_idx = int(cat_idx_str)
@@ -81,23 +75,17 @@ def registrar_transaccion():
             return
         categoria = categorias_validas[cat_idx - 1]
 
-        cantidad = float(cantidad_str)
-        nueva_transaccion = Transaccion(
-            cantidad=cantidad,
-            fecha=datetime.now(),
-            tipo=tipo,
-            categoria_id=categoria.id,
-            usuario_id=usuario.id
-        )
-        db.add(nueva_transaccion)
-        db.commit()
+        try:
+            from src.model.dinero import redondear
+            cantidad = redondear(cantidad_str)
+        except ValueError:
+            print("Cantidad inválida.")
+            return
+        with ESTADISTICAS_SQL.medir("registrar_transaccion"):
+            _servicios().registrar_transaccion(usuario, cantidad, tipo, categoria)
         print("Transacción registrada exitosamente.")
-    except ValueError:
-        print("Cantidad inválida.")
     except Exception as e:
         print(f"Error al registrar transacción: {e}")
-    finally:
-        db.close()
 
 def visualizar_transacciones():
     usuario = Sesion.obtener_usuario_actual()
@@ -105,48 +93,137 @@ def visualizar_transacciones():
         print("Debes iniciar sesión para visualizar transacciones.")
         return
 
-    db = SessionLocal()
     try:
-        transacciones = db.query(Transaccion).filter(Transaccion.usuario_id == usuario.id).order_by(Transaccion.fecha.desc()).all()
+        with ESTADISTICAS_SQL.medir("visualizar_transacciones"):
+            pagina = _servicios().listar_transacciones(usuario.id)
         print("\n=== Transacciones ===")
-        if not transacciones:
+        if not pagina.filas:
             print("No hay transacciones para mostrar.")
             return
-        for t in transacciones:
-            categoria_nombre = t.categoria.nombre if t.categoria else "Sin categoría"
-            detalle = (f"ID: {t.id} | {t.tipo} | {t.cantidad} | "
-                       f"{t.fecha.strftime('%Y-%m-%d %H:%M')} | Categoría: {categoria_nombre}")
-            print(detalle)
+        while True:
+            for t in pagina.filas:
+                categoria_nombre = t.categoria_nombre or "Sin categoría"
+                detalle = (f"ID: {t.id} | {t.tipo} | {t.cantidad} | "
+                           f"{t.fecha.strftime('%Y-%m-%d %H:%M')} | Categoría: {categoria_nombre}")
+                print(detalle)
+
+            opciones = []
+            if pagina.anterior:
+                opciones.append("A. Anterior")
+            if pagina.siguiente:
+                opciones.append("S. Siguiente")
+            if not opciones:
+                return
+            opcion = input(" | ".join(opciones + ["Enter. Volver"]) + ": ").strip().upper()
+            if opcion == "S" and pagina.siguiente:
+                with ESTADISTICAS_SQL.medir("visualizar_transacciones"):
+                    pagina = _servicios().listar_transacciones(usuario.id, despues=pagina.siguiente)
+            elif opcion == "A" and pagina.anterior:
+                with ESTADISTICAS_SQL.medir("visualizar_transacciones"):
+                    pagina = _servicios().listar_transacciones(usuario.id, antes=pagina.anterior)
+            else:
+                return
+            print()
     except Exception as e:
         print(f"Error al visualizar transacciones: {e}")
-    finally:
-        db.close()
 
 def eliminar_transaccion():
     usuario = Sesion.obtener_usuario_actual()
     if not usuario:
-        print("Debes iniciar sesión para eliminar una transacción.")
+        print("Debes iniciar sesión para eliminar transacciones.")
         return
 
-    print("\n=== Eliminar Transacción ===")
-    id_str = input("ID de la transacción a eliminar: ").strip()
+    print("\n=== Eliminar Transacciones ===")
+    print("1. Por ID (uno o varios, separados por comas)")
+    print("2. Por rango de fechas")
+    print("3. Por categoría")
+    modo = input("Selecciona una opción: ").strip()
 
-    db = SessionLocal()
     try:
-        id_eliminar = int(id_str)
-        transaccion = db.query(Transaccion).filter(Transaccion.id == id_eliminar, Transaccion.usuario_id == usuario.id).first()
-        if not transaccion:
-            print("Transacción no encontrada o no pertenece al usuario.")
+        from src.model.eliminacion import fecha_de_texto, ids_de_texto
+        filtros = {}
+        if modo == "1":
+            filtros["ids"] = ids_de_texto(input("IDs a eliminar: "))
+        elif modo == "2":
+            filtros["desde"] = fecha_de_texto(input("Desde (AAAA-MM-DD): "))
+            filtros["hasta"] = fecha_de_texto(input("Hasta (AAAA-MM-DD, incluida): "), fin_del_dia=True)
+        elif modo == "3":
+            with ESTADISTICAS_SQL.medir("categorias"):
+                nombres = _servicios().categorias("Egreso") + _servicios().categorias("Ingreso")
+            for idx, nombre in enumerate(nombres, 1):
+                print(f"{idx}. {nombre}")
+            cat_idx = int(input("Selecciona número de categoría: ").strip())
+            if not (1 <= cat_idx <= len(nombres)):
+                print("Número de categoría inválido.")
+                return
+            filtros["categoria"] = nombres[cat_idx - 1]
+        else:
+            print("Opción inválida.")
             return
-        db.delete(transaccion)
-        db.commit()
-        print("Transacción eliminada exitosamente.")
-    except ValueError:
-        print("ID inválido.")
+    except (ValueError, FechaInvalidaError) as e:
+        print(f"Entrada inválida: {e}")
+        return
     except Exception as e:
-        print(f"Error al eliminar transacción: {e}")
-    finally:
-        db.close()
+        print(f"Error al eliminar transacciones: {e}")
+        return
+
+    if modo != "1" and input("Se eliminarán todas las transacciones que coincidan. ¿Continuar? (s/N): "
+                             ).strip().lower() != "s":
+        print("Eliminación cancelada.")
+        return
+    try:
+        with ESTADISTICAS_SQL.medir("eliminar_transacciones"):
+            eliminadas = _servicios().eliminar_transacciones(usuario.id, **filtros)
+        if not eliminadas:
+            print("No se encontró ninguna transacción del usuario con esos criterios.")
+            return
+        print(f"{eliminadas} transacción(es) eliminada(s) exitosamente.")
+    except Exception as e:
+        print(f"Error al eliminar transacciones: {e}")
+
+def ver_resumen():
+    usuario = Sesion.obtener_usuario_actual()
+    if not usuario:
+        print("Debes iniciar sesión para ver el resumen.")
+        return
+
+    try:
+        with ESTADISTICAS_SQL.medir("ver_resumen"):
+            datos = _servicios().resumen(usuario.id, meses=12)
+        ingresos, egresos, neto = datos["balance"]
+        print("\n=== Resumen ===")
+        print(f"Ingresos: {ingresos:.2f} | Egresos: {egresos:.2f} | Balance: {neto:.2f}")
+
+        print("\nCategorías con más gasto:")
+        if not datos["top_categorias"]:
+            print("No hay gastos registrados.")
+        for nombre, total in datos["top_categorias"]:
+            print(f"  {nombre}: {total:.2f}")
+
+        print("\nPor mes (ingresos / egresos / neto):")
+        for periodo, ing, egr, net in datos["meses"]:
+            print(f"  {periodo}: {ing:.2f} / {egr:.2f} / {net:.2f}")
+    except Exception as e:
+        print(f"Error al generar el resumen: {e}")
+
+def ver_estadisticas():
+    estadisticas = ESTADISTICAS_SQL.estadisticas()
+    print("\n=== Estadísticas SQL ===")
+    if not estadisticas:
+        print("Todavía no se ha ejecutado ninguna consulta.")
+        return
+    print(f"{'Acción':<26} {'Veces':>6} {'Sentencias':>10} {'ms BD':>9} {'Máx. ms':>8} {'Filas':>7} {'Lentas':>6}")
+    for accion, total in estadisticas.items():
+        print(f"{accion:<26} {total['veces']:>6} {total['sentencias']:>10} {total['segundos_bd'] * 1000:>9.1f} "
+              f"{total['maximo_bd'] * 1000:>8.1f} {total['filas']:>7} {total['lentas']:>6}")
+
+    ruta = input("Guardar en JSON (ruta, Enter para omitir): ").strip()
+    if ruta:
+        try:
+            ESTADISTICAS_SQL.volcar(ruta)
+            print(f"Estadísticas guardadas en {ruta}.")
+        except OSError as e:
+            print(f"Error al guardar las estadísticas: {e}")
 
 def cerrar_sesion():
     Sesion.cerrar_sesion()
@@ -161,9 +238,11 @@ def mostrar_menu():
         print("2. Iniciar Sesión")
         print("3. Registrar Transacción")
         print("4. Visualizar Transacciones")
-        print("5. Eliminar Transacción")
-        print("6. Cerrar Sesión")
-        print("7. Salir")
+        print("5. Eliminar Transacciones")
+        print("6. Ver Resumen")
+        print("7. Cerrar Sesión")
+        print("8. Estadísticas SQL")
+        print("9. Salir")
 
         opcion = input("Selecciona una opción: ").strip()
 
@@ -178,8 +257,18 @@ def mostrar_menu():
         elif opcion == "5":
             eliminar_transaccion()
         elif opcion == "6":
-            cerrar_sesion()
+            ver_resumen()
         elif opcion == "7":
+            cerrar_sesion()
+        elif opcion == "8":
+            ver_estadisticas()
+        elif opcion == "9":
+            try:
+                ruta = volcar_configurado()
+                if ruta:
+                    print(f"Estadísticas SQL guardadas en {ruta}.")
+            except OSError as e:
+                print(f"Error al guardar las estadísticas: {e}")
             print("Saliendo del programa...")
             break
         else:
@@ -0,0 +1,60 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from sqlalchemy import BigInteger, type_coerce
+from sqlalchemy.types import TypeDecorator
+
+CENTIMO = Decimal("0.01")
+# El mayor importe cuyos céntimos caben en la columna (BIGINT, entero de 64 bits con signo)
+CANTIDAD_MAXIMA = Decimal(2 ** 63 - 1).scaleb(-2)
+
+
+def redondear(valor) -> Decimal:
+    """
+    Importe como Decimal con dos decimales. Acepta Decimal, int, float o texto; ValueError
+    si no es un número finito o si en valor absoluto supera CANTIDAD_MAXIMA.
+    """
+    if isinstance(valor, float):
+        # Desde el texto del float: 19.99 es 19.99 y no 19.989999...
+        valor = repr(valor)
+    try:
+        importe = Decimal(valor.strip() if isinstance(valor, str) else valor)
+    except (InvalidOperation, TypeError):
+        raise ValueError(f"Cantidad inválida: '{valor}'")
+    if not importe.is_finite():
+        raise ValueError(f"Cantidad inválida: '{valor}'")
+    try:
+        # quantize falla si el importe con dos decimales no cabe en la precisión del contexto
+        importe = importe.quantize(CENTIMO, rounding=ROUND_HALF_UP)
+    except InvalidOperation:
+        raise ValueError(f"Cantidad fuera de rango: '{valor}'")
+    if abs(importe) > CANTIDAD_MAXIMA:
+        raise ValueError(f"Cantidad fuera de rango: '{valor}'")
+    return importe
+
+
+def a_centimos(valor) -> int:
+    return int(redondear(valor).scaleb(2))
+
+
+def a_decimal(centimos) -> Decimal:
+    return Decimal(int(centimos)).scaleb(-2).quantize(CENTIMO)
+
+
+class Centimos(TypeDecorator):
+    """
+    Importe guardado como entero de 64 bits en céntimos. En Python se lee y se
+    escribe como Decimal con dos decimales; en SQL las sumas son enteras y exactas.
+    """
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else a_centimos(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else a_decimal(value)
+
+
+def centimos(columna):
+    """La columna sin conversión a Decimal: enteros en céntimos (p. ej. para arrays int64)."""
+    return type_coerce(columna, BigInteger)
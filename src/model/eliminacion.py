@@ -0,0 +1,114 @@
+from datetime import datetime, time
+
+from sqlalchemy import delete, select
+
+from src.model.archivo import ArchivoFrio
+from src.model.cache_reportes import anotar
+from src.model.catalogo_categorias import CatalogoCategorias
+from src.model.errors import CategoriaInvalidaError, FechaInvalidaError, RangoFechasInvalidoError
+from src.model.resumen_mensual import acumular
+from src.model.transaccion import Transaccion, ahora_utc
+from src.model.transaccion_eliminada import registrar_bajas
+
+# Eliminación en bloque de transacciones de un usuario con una sola sentencia
+# DELETE ... WHERE ... RETURNING, sin cargar los objetos del ORM. Las filas devueltas
+# sirven para mantener lo que los eventos del ORM mantienen en las bajas de una en una:
+# el resumen mensual, el registro de bajas de la sincronización y la cache de reportes.
+# Las transacciones del archivo de transacciones antiguas (archivo.py), que el listado
+# muestra con las de la tabla, se eliminan con los mismos filtros reescribiendo su año.
+
+_COLUMNAS = ("uid", "usuario_id", "cantidad", "fecha", "tipo", "categoria_id")
+# Bajas por sentencia al registrarlas: registrar_bajas usa un IN con un parámetro por uid
+_BAJAS_POR_SENTENCIA = 500
+
+
+def ids_de_texto(texto):
+    """Ids escritos por el usuario ("3, 7 12"); ValueError si alguno no es un número."""
+    partes = texto.replace(",", " ").split()
+    if not partes:
+        raise ValueError("Indica al menos un ID")
+    try:
+        return [int(parte) for parte in partes]
+    except ValueError:
+        raise ValueError("Los IDs deben ser números enteros")
+
+
+def fecha_de_texto(texto, fin_del_dia=False):
+    """Fecha AAAA-MM-DD escrita por el usuario; con fin_del_dia, su último instante (para `hasta`)."""
+    try:
+        dia = datetime.strptime(texto.strip(), "%Y-%m-%d").date()
+    except ValueError:
+        raise FechaInvalidaError(f"Fecha inválida: '{texto}' (formato AAAA-MM-DD)")
+    return datetime.combine(dia, time.max if fin_del_dia else time.min)
+
+
+def _id_categoria(session, categoria):
+    if isinstance(categoria, int):
+        return categoria
+    for tipo in ("Ingreso", "Egreso"):
+        categoria_id = CatalogoCategorias.obtener_id(session, tipo, categoria)
+        if categoria_id is not None:
+            return categoria_id
+    raise CategoriaInvalidaError(f"No existe la categoría '{categoria}'")
+
+
+def _condiciones(session, usuario_id, ids=None, desde=None, hasta=None, categoria=None):
+    """
+    Condiciones WHERE de una eliminación en bloque: las transacciones del usuario que
+    cumplen todos los filtros dados (ids, fechas entre `desde` y `hasta` incluidas,
+    categoría por nombre o id). Sin ningún filtro es un error: no se borra todo por omisión.
+    """
+    if ids is None and desde is None and hasta is None and categoria is None:
+        raise ValueError("Indica los ids, un rango de fechas o una categoría")
+    if desde is not None and hasta is not None and desde > hasta:
+        raise RangoFechasInvalidoError("La fecha inicial no puede ser posterior a la final")
+    filtro = [Transaccion.usuario_id == usuario_id]
+    if ids is not None:
+        filtro.append(Transaccion.id.in_([int(id_) for id_ in ids]))
+    if desde is not None:
+        filtro.append(Transaccion.fecha >= desde)
+    if hasta is not None:
+        filtro.append(Transaccion.fecha <= hasta)
+    if categoria is not None:
+        filtro.append(Transaccion.categoria_id == _id_categoria(session, categoria))
+    return filtro
+
+
+def eliminar_transacciones(session, usuario_id, ids=None, desde=None, hasta=None, categoria=None):
+    """
+    Elimina las transacciones del usuario que cumplen los filtros (ver _condiciones) dentro
+    de la transacción de la sesión, también las archivadas. Devuelve cuántas se han eliminado.
+    """
+    filtro = _condiciones(session, usuario_id, ids, desde, hasta, categoria)
+    if ids is not None and not ids:
+        return 0
+    categoria_id = None if categoria is None else _id_categoria(session, categoria)
+    # Las altas y cambios pendientes de la sesión tienen que estar en la base para que el DELETE los vea
+    session.flush()
+    columnas = [getattr(Transaccion, nombre) for nombre in _COLUMNAS]
+    # synchronize_session="fetch": los objetos eliminados que la sesión tuviera cargados se descartan
+    opciones = {"synchronize_session": "fetch"}
+    if session.get_bind().dialect.delete_returning:
+        filas = session.execute(delete(Transaccion).where(*filtro).returning(*columnas),
+                                execution_options=opciones).all()
+    else:
+        filas = session.execute(select(Transaccion.id, *columnas).where(*filtro)).all()
+        if filas:
+            session.execute(delete(Transaccion).where(Transaccion.id.in_([fila.id for fila in filas])),
+                            execution_options=opciones)
+    archivo = ArchivoFrio.de(session)
+    archivadas = [] if archivo is None else archivo.eliminar(session, usuario_id, ids, desde, hasta, categoria_id)
+    if not filas and not archivadas:
+        return 0
+
+    conexion = session.connection()
+    if filas:
+        # El resumen mensual solo cuenta las filas de la tabla
+        acumular(conexion, filas, signo=-1)
+        anotar(session, session.get_bind(), {usuario_id})
+    eliminada = ahora_utc()
+    bajas = [(fila.uid, fila.usuario_id, eliminada) for fila in filas]
+    bajas += [(uid, usuario_id, eliminada) for uid in archivadas]
+    for i in range(0, len(bajas), _BAJAS_POR_SENTENCIA):
+        registrar_bajas(conexion, bajas[i:i + _BAJAS_POR_SENTENCIA])
+    return len(filas) + len(archivadas)
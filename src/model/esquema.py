@@ -0,0 +1,231 @@
+import argparse
+
+from sqlalchemy import Column, DateTime, Table, inspect, select, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.types import Integer
+
+from src.model.base import Base
+from src.model.catalogo_categorias import CatalogoCategorias
+# Se importan los modelos para registrar sus tablas e índices en Base.metadata
+from src.model.usuario import Usuario  # noqa: F401
+from src.model.categoria import Categoria, TipoCategoria
+from src.model.registros import Registro  # noqa: F401
+from src.model.transaccion import Transaccion, ahora_utc
+from src.model.resumen_mensual import ResumenMensual, reconstruir_resumen
+
+# Versión del esquema que espera la aplicación. inicializar_base no hace nada más que
+# leerla si la base ya está en esta versión; se incrementa al cambiar las tablas o
+# añadir una migración para que el siguiente arranque la aplique.
+# 2: NOT NULL e índice único de transacciones.uid en las bases migradas
+VERSION_ESQUEMA = 2
+
+# Una sola fila (id = 1) con la versión del esquema de la base
+tabla_version = Table(
+    "version_esquema", Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("actualizada", DateTime, nullable=False),
+)
+
+# INSERT con ON CONFLICT, por dialecto
+_INSERT_CON_CONFLICTO = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def crear_esquema(engine):
+    """
+    Crea las tablas e índices de los modelos que todavía no existan.
+    Es idempotente: se puede ejecutar en cada arranque en PostgreSQL o SQLite,
+    añade los índices nuevos también a tablas ya creadas y migra las bases de datos
+    antiguas (columnas de sincronización y cantidades en céntimos).
+    """
+    with engine.begin() as conexion:
+        _crear_esquema(conexion)
+
+
+def _crear_esquema(conexion):
+    Base.metadata.create_all(conexion, checkfirst=True)
+    migrar_sincronizacion(conexion)
+    migrar_a_centimos(conexion)
+    for tabla in Base.metadata.sorted_tables:
+        for indice in tabla.indexes:
+            indice.create(conexion, checkfirst=True)
+
+
+def categorias_por_defecto():
+    """{nombre: (tipo, descripcion)}; el nombre es único, así que "Otros" y "General" se quedan con el primer tipo."""
+    categorias = {}
+    for tipo in ("Ingreso", "Egreso"):
+        for nombre, descripcion in Categoria.categorias_por_tipo(tipo):
+            categorias.setdefault(nombre, (tipo, descripcion))
+    return categorias
+
+
+def sembrar_categorias(conexion):
+    """
+    Inserta las categorías por defecto que falten, en una sola sentencia
+    INSERT ... ON CONFLICT (nombre) DO NOTHING. Devuelve cuántas se han insertado.
+    """
+    tabla = Categoria.__table__
+    filas = [{"nombre": nombre, "tipo": TipoCategoria(tipo), "descripcion": descripcion}
+             for nombre, (tipo, descripcion) in categorias_por_defecto().items()]
+    insertar = _INSERT_CON_CONFLICTO.get(conexion.dialect.name)
+    if insertar is not None:
+        sentencia = insertar(tabla).values(filas).on_conflict_do_nothing(index_elements=["nombre"])
+        insertadas = conexion.execute(sentencia).rowcount
+    else:
+        existentes = set(conexion.scalars(select(tabla.c.nombre)))
+        faltan = [fila for fila in filas if fila["nombre"] not in existentes]
+        if faltan:
+            conexion.execute(tabla.insert(), faltan)
+        insertadas = len(faltan)
+    if insertadas:
+        CatalogoCategorias.invalidar(conexion.engine)
+    return insertadas
+
+
+def version_esquema(conexion):
+    """La versión del esquema guardada en la base, o None si todavía no se ha inicializado."""
+    if not inspect(conexion).has_table(tabla_version.name):
+        return None
+    return conexion.scalar(select(tabla_version.c.version).where(tabla_version.c.id == 1))
+
+
+def _guardar_version(conexion, version):
+    valores = {"version": version, "actualizada": ahora_utc()}
+    insertar = _INSERT_CON_CONFLICTO.get(conexion.dialect.name)
+    if insertar is not None:
+        conexion.execute(insertar(tabla_version).values(id=1, **valores)
+                         .on_conflict_do_update(index_elements=["id"], set_=valores))
+    elif not conexion.execute(tabla_version.update().where(tabla_version.c.id == 1).values(**valores)).rowcount:
+        conexion.execute(tabla_version.insert().values(id=1, **valores))
+
+
+def inicializar_base(engine, forzar=False):
+    """
+    Deja la base lista para la aplicación en una transacción: esquema (crear_esquema),
+    categorías por defecto y versión. Si la versión guardada ya es VERSION_ESQUEMA solo
+    se lee la versión, salvo con `forzar`. Devuelve True si ha hecho algo.
+    """
+    with engine.begin() as conexion:
+        version = version_esquema(conexion)
+        if version is not None and version > VERSION_ESQUEMA:
+            raise ValueError(f"La base de datos tiene la versión de esquema {version}, "
+                             f"posterior a la de la aplicación ({VERSION_ESQUEMA})")
+        if version == VERSION_ESQUEMA and not forzar:
+            return False
+        _crear_esquema(conexion)
+        sembrar_categorias(conexion)
+        _guardar_version(conexion, VERSION_ESQUEMA)
+    # sembrar_categorias invalida antes del commit: otra sesión pudo leer el catálogo sin las nuevas
+    CatalogoCategorias.invalidar(engine)
+    return True
+
+
+def _es_entera(inspector, tabla, columna):
+    tipo = next(c["type"] for c in inspector.get_columns(tabla) if c["name"] == columna)
+    return isinstance(tipo, Integer)
+
+
+# Valores iniciales de uid y modificada para las filas existentes, por dialecto
+_UID_ALEATORIO = {
+    "postgresql": "md5(random()::text || clock_timestamp()::text || id::text)",
+    "sqlite": "lower(hex(randomblob(16)))",
+}
+_AHORA_UTC = {"postgresql": "timezone('UTC', now())", "sqlite": "CURRENT_TIMESTAMP"}
+
+
+def _uid_unico(inspector):
+    unicos = [restriccion["column_names"] for restriccion in inspector.get_unique_constraints("transacciones")]
+    unicos += [indice["column_names"] for indice in inspector.get_indexes("transacciones") if indice["unique"]]
+    return ["uid"] in unicos
+
+
+def migrar_sincronizacion(conexion):
+    """
+    Añade transacciones.uid y transacciones.modificada a bases creadas antes de la
+    sincronización, con un uid aleatorio y la hora actual para las filas existentes.
+    Si las columnas admiten NULL (bases ya migradas), completa las filas sin valor y les
+    pone NOT NULL (solo PostgreSQL: SQLite no lo cambia sin reconstruir la tabla), y crea
+    el índice único de uid si falta.
+    """
+    columnas = {c["name"]: c for c in inspect(conexion).get_columns("transacciones")}
+    dialecto = conexion.dialect.name
+    if "uid" not in columnas or columnas["uid"]["nullable"] or columnas["modificada"]["nullable"]:
+        if dialecto not in _UID_ALEATORIO:
+            raise ValueError(f"Migración de sincronización no soportada para '{dialecto}'")
+        if "uid" not in columnas:
+            tabla = Transaccion.__table__
+            for nombre in ("uid", "modificada"):
+                tipo = tabla.c[nombre].type.compile(dialect=conexion.dialect)
+                conexion.execute(text(f"ALTER TABLE transacciones ADD COLUMN {nombre} {tipo}"))
+        # Filas sin uid: las anteriores a la sincronización y las de importaciones que no lo escribían
+        conexion.execute(text(f"UPDATE transacciones SET uid = {_UID_ALEATORIO[dialecto]} WHERE uid IS NULL"))
+        conexion.execute(text(f"UPDATE transacciones SET modificada = {_AHORA_UTC[dialecto]} WHERE modificada IS NULL"))
+        if dialecto == "postgresql":
+            conexion.execute(text(
+                "ALTER TABLE transacciones ALTER COLUMN uid SET NOT NULL, ALTER COLUMN modificada SET NOT NULL"
+            ))
+    if not _uid_unico(inspect(conexion)):
+        conexion.execute(text("CREATE UNIQUE INDEX ix_transacciones_uid ON transacciones (uid)"))
+
+
+def migrar_a_centimos(conexion):
+    """
+    Convierte transacciones.cantidad de decimal/float a céntimos enteros (BIGINT) en bases
+    creadas antes del tipo Centimos, y recalcula resumen_mensual. No hace nada si ya está migrada.
+    """
+    inspector = inspect(conexion)
+    if _es_entera(inspector, "transacciones", "cantidad"):
+        return
+
+    dialecto = conexion.dialect.name
+    if dialecto == "postgresql":
+        conexion.execute(text(
+            "ALTER TABLE transacciones ALTER COLUMN cantidad TYPE BIGINT "
+            "USING ROUND((cantidad * 100)::numeric)::bigint"
+        ))
+    elif dialecto == "sqlite":
+        # SQLite no cambia el tipo de una columna: se reconstruye la tabla con los mismos ids
+        tabla = Transaccion.__table__
+        for indice in inspector.get_indexes("transacciones"):
+            conexion.execute(text(f'DROP INDEX "{indice["name"]}"'))
+        conexion.execute(text("ALTER TABLE transacciones RENAME TO transacciones_sin_migrar"))
+        tabla.create(conexion)
+        columnas = ", ".join(c.name for c in tabla.columns)
+        origen = ", ".join("CAST(ROUND(cantidad * 100) AS INTEGER)" if c.name == "cantidad" else c.name
+                           for c in tabla.columns)
+        conexion.execute(text(f"INSERT INTO transacciones ({columnas}) SELECT {origen} FROM transacciones_sin_migrar"))
+        conexion.execute(text("DROP TABLE transacciones_sin_migrar"))
+    else:
+        raise ValueError(f"Migración a céntimos no soportada para '{dialecto}'")
+
+    # El resumen es derivado: se vuelve a crear con total en céntimos y se recalcula
+    ResumenMensual.__table__.drop(conexion, checkfirst=True)
+    ResumenMensual.__table__.create(conexion)
+    reconstruir_resumen(conexion)
+
+
+def main(argv=None):
+    from src.model.db import crear_engine, obtener_engine
+
+    parser = argparse.ArgumentParser(description="Crea o actualiza el esquema de la base de datos y las categorías por defecto.")
+    parser.add_argument("--perfil", help="Perfil de base de datos (por defecto, el configurado).")
+    parser.add_argument("--url", help="URL de la base de datos (por defecto, la configurada).")
+    parser.add_argument("--forzar", action="store_true", help="Revisa el esquema aunque la versión guardada sea la actual.")
+    args = parser.parse_args(argv)
+
+    if args.perfil or args.url:
+        engine = crear_engine(args.perfil, **({"url": args.url} if args.url else {}))
+    else:
+        engine = obtener_engine()
+    try:
+        if inicializar_base(engine, args.forzar):
+            print(f"Base de datos inicializada (versión de esquema {VERSION_ESQUEMA}).")
+        else:
+            print(f"La base de datos ya está en la versión de esquema {VERSION_ESQUEMA}.")
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
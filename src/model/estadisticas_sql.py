@@ -0,0 +1,227 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+# Instrumentación de SQL por acción del usuario. Los eventos before/after_cursor_execute
+# del engine miden cada sentencia y la anotan en la medición del contexto actual (cada
+# hilo y cada tarea de asyncio tiene la suya, como la sesión); medir(accion) abre una
+# medición alrededor de una acción de la consola, de la interfaz Kivy o del servidor.
+# Las sentencias ejecutadas fuera de cualquier acción se acumulan en SIN_ACCION.
+# SQLAlchemy se importa al instrumentar un engine: la consola importa este módulo al arrancar.
+
+registro = logging.getLogger(__name__)
+
+SIN_ACCION = "(sin acción)"
+
+_medicion_actual = contextvars.ContextVar("medicion_sql", default=None)
+
+
+class _Medicion:
+    """Lo que ha hecho la base de datos durante una ejecución de una acción."""
+    __slots__ = ("accion", "sentencias", "segundos_bd", "maximo_bd", "filas", "lentas")
+
+    def __init__(self, accion):
+        self.accion = accion
+        self.sentencias = self.filas = self.lentas = 0
+        self.segundos_bd = self.maximo_bd = 0.0
+
+    def anotar(self, segundos, lenta):
+        self.sentencias += 1
+        self.segundos_bd += segundos
+        if segundos > self.maximo_bd:
+            self.maximo_bd = segundos
+        if lenta:
+            self.lentas += 1
+
+    def sumar_filas(self, filas):
+        self.filas += filas
+
+
+class _MedicionCompartida(_Medicion):
+    """La medición de SIN_ACCION: la actualizan a la vez varios hilos."""
+    __slots__ = ("_lock",)
+
+    def __init__(self, accion):
+        super().__init__(accion)
+        self._lock = threading.Lock()
+
+    def anotar(self, segundos, lenta):
+        with self._lock:
+            super().anotar(segundos, lenta)
+
+    def sumar_filas(self, filas):
+        with self._lock:
+            super().sumar_filas(filas)
+
+
+class _CursorContado:
+    """Cursor DBAPI que cuenta en la medición las filas que se leen de él."""
+    __slots__ = ("_cursor", "_medicion")
+
+    def __init__(self, cursor, medicion):
+        self._cursor = cursor
+        self._medicion = medicion
+
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        if fila is not None:
+            self._medicion.sumar_filas(1)
+        return fila
+
+    def fetchmany(self, *args, **kwargs):
+        filas = self._cursor.fetchmany(*args, **kwargs)
+        self._medicion.sumar_filas(len(filas))
+        return filas
+
+    def fetchall(self):
+        filas = self._cursor.fetchall()
+        self._medicion.sumar_filas(len(filas))
+        return filas
+
+    def __iter__(self):
+        for fila in self._cursor:
+            self._medicion.sumar_filas(1)
+            yield fila
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+
+class EstadisticasSQL:
+    """
+    Totales por acción: veces que se ha ejecutado, segundos de la acción, sentencias,
+    segundos en la base de datos, sentencia más lenta, filas leídas y consultas lentas
+    (las que superan el umbral con el que se instrumentó el engine).
+    """
+
+    def __init__(self):
+        self._acciones = {}
+        self._sin_accion = _MedicionCompartida(SIN_ACCION)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def medir(self, accion):
+        """Mide las sentencias del bloque (en este contexto) como una ejecución de `accion`."""
+        medicion = _Medicion(accion)
+        marca = _medicion_actual.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            yield medicion
+        finally:
+            segundos = time.perf_counter() - inicio
+            _medicion_actual.reset(marca)
+            self._acumular(medicion, segundos)
+
+    def medicion_actual(self):
+        """La medición del contexto actual, o la de SIN_ACCION."""
+        return _medicion_actual.get() or self._sin_accion
+
+    def _acumular(self, medicion, segundos):
+        with self._lock:
+            total = self._acciones.get(medicion.accion)
+            if total is None:
+                total = self._acciones[medicion.accion] = {
+                    "veces": 0, "segundos": 0.0, "sentencias": 0, "segundos_bd": 0.0, "maximo_bd": 0.0,
+                    "filas": 0, "lentas": 0,
+                }
+            total["veces"] += 1
+            total["segundos"] += segundos
+            total["sentencias"] += medicion.sentencias
+            total["segundos_bd"] += medicion.segundos_bd
+            total["maximo_bd"] = max(total["maximo_bd"], medicion.maximo_bd)
+            total["filas"] += medicion.filas
+            total["lentas"] += medicion.lentas
+
+    def estadisticas(self):
+        """{accion: totales}, ordenado de más a menos tiempo en la base de datos."""
+        with self._lock:
+            acciones = {accion: dict(total) for accion, total in self._acciones.items()}
+        sin_accion = self._sin_accion
+        if sin_accion.sentencias:
+            acciones[SIN_ACCION] = {
+                "veces": 0, "segundos": 0.0, "sentencias": sin_accion.sentencias,
+                "segundos_bd": sin_accion.segundos_bd, "maximo_bd": sin_accion.maximo_bd,
+                "filas": sin_accion.filas, "lentas": sin_accion.lentas,
+            }
+        return dict(sorted(acciones.items(), key=lambda par: par[1]["segundos_bd"], reverse=True))
+
+    def volcar(self, destino):
+        """Escribe las estadísticas en JSON en `destino` (ruta o archivo abierto)."""
+        datos = {"acciones": self.estadisticas()}
+        if hasattr(destino, "write"):
+            json.dump(datos, destino, ensure_ascii=False, indent=2)
+        else:
+            with open(destino, "w", encoding="utf-8") as archivo:
+                json.dump(datos, archivo, ensure_ascii=False, indent=2)
+
+    def reiniciar(self):
+        with self._lock:
+            self._acciones.clear()
+            self._sin_accion = _MedicionCompartida(SIN_ACCION)
+
+
+# Estadísticas del proceso; las usan la consola, la interfaz Kivy y el servidor
+ESTADISTICAS_SQL = EstadisticasSQL()
+
+# engine -> umbral de consulta lenta en segundos (None: sin registro de consultas lentas)
+_umbrales = weakref.WeakKeyDictionary()
+
+
+def instrumentar(engine, consulta_lenta_ms=None, estadisticas=ESTADISTICAS_SQL):
+    """
+    Registra los eventos que miden las sentencias de `engine` (o del sync_engine de un
+    AsyncEngine). Con consulta_lenta_ms, las sentencias que tardan al menos ese tiempo
+    se registran con logging (WARNING). Llamarla otra vez solo cambia el umbral.
+    """
+    if consulta_lenta_ms is not None and consulta_lenta_ms < 0:
+        raise ValueError("El umbral de consulta lenta no puede ser negativo")
+    from sqlalchemy import event
+
+    engine = getattr(engine, "sync_engine", engine)
+    ya_instrumentado = engine in _umbrales
+    _umbrales[engine] = None if consulta_lenta_ms is None else consulta_lenta_ms / 1000
+    if ya_instrumentado:
+        return engine
+
+    # El inicio se guarda en el contexto de ejecución; connection.info es bastante más lento
+    # y solo se usa en las sentencias internas del dialecto, que no tienen contexto
+    def antes(conexion, cursor, sentencia, parametros, contexto, executemany):
+        if contexto is not None:
+            contexto._inicio_sentencia = time.perf_counter()
+        else:
+            conexion.info["inicio_sentencia"] = time.perf_counter()
+
+    def despues(conexion, cursor, sentencia, parametros, contexto, executemany):
+        inicio = contexto._inicio_sentencia if contexto is not None else conexion.info["inicio_sentencia"]
+        segundos = time.perf_counter() - inicio
+        medicion = estadisticas.medicion_actual()
+        umbral = _umbrales.get(engine)
+        lenta = umbral is not None and segundos >= umbral
+        medicion.anotar(segundos, lenta)
+        if lenta:
+            registro.warning("Consulta lenta (%.1f ms) en '%s': %s", segundos * 1000, medicion.accion, sentencia)
+        # Las filas se cuentan al leerlas: el resultado lee del cursor que deja el contexto
+        if contexto is not None and cursor.description is not None and contexto.cursor is cursor:
+            contexto.cursor = _CursorContado(cursor, medicion)
+
+    event.listen(engine, "before_cursor_execute", antes)
+    event.listen(engine, "after_cursor_execute", despues)
+    return engine
+
+
+def volcar_configurado(estadisticas=ESTADISTICAS_SQL):
+    """
+    Al salir de la aplicación: vuelca las estadísticas en el archivo de la opción
+    estadisticas_json (db.py), si está configurado y se ha medido algo. Devuelve la ruta o None.
+    """
+    if not estadisticas.estadisticas():
+        return None
+    from src.model.db import leer_configuracion
+    ruta = leer_configuracion()["estadisticas_json"]
+    if ruta:
+        estadisticas.volcar(ruta)
+    return ruta
@@ -0,0 +1,195 @@
+import argparse
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from itertools import islice
+
+from sqlalchemy import insert
+
+from src.model.cache_reportes import anotar
+from src.model.usuario import Usuario
+from src.model.transaccion import Transaccion, TipoTransaccionEnum, ahora_utc, nuevo_uid
+from src.model.catalogo_categorias import CatalogoCategorias
+from src.model.resumen_mensual import acumular
+from src.model.dinero import a_centimos, redondear
+
+TAMANO_LOTE = 5000
+COLUMNAS = ("cantidad", "fecha", "tipo", "categoria_id", "usuario_id", "uid", "modificada")
+
+
+class ResumenImportacion:
+    def __init__(self):
+        self.importadas = 0
+        self.rechazadas = []  # (número de línea, motivo)
+        self.segundos = 0.0
+
+    @property
+    def filas_por_segundo(self):
+        return self.importadas / self.segundos if self.segundos else 0.0
+
+    def __repr__(self):
+        return (f"<ResumenImportacion(importadas={self.importadas}, rechazadas={len(self.rechazadas)}, "
+                f"filas_por_segundo={self.filas_por_segundo:.0f})>")
+
+
+def leer_filas(archivo, formato):
+    """
+    Genera (número de línea, dict) sin cargar el archivo completo en memoria.
+    Formatos soportados: 'csv' (con cabecera) y 'jsonl' (un objeto JSON por línea).
+    Una línea JSON mal formada se entrega con su error en lugar del dict, para que la
+    importación la rechace sin interrumpir el resto.
+    """
+    if formato == "csv":
+        lector = csv.DictReader(archivo)
+        for fila in lector:
+            yield lector.line_num, fila
+    elif formato == "jsonl":
+        for numero, linea in enumerate(archivo, 1):
+            if linea.strip():
+                try:
+                    yield numero, json.loads(linea)
+                except json.JSONDecodeError as e:
+                    yield numero, e
+    else:
+        raise ValueError("Formato debe ser 'csv' o 'jsonl'")
+
+
+def _resolver_usuarios(session, correos, cache):
+    pendientes = {c for c in correos if c and c not in cache}
+    if pendientes:
+        filas = session.query(Usuario.id, Usuario.correo).filter(Usuario.correo.in_(pendientes)).all()
+        encontrados = {fila.correo: fila.id for fila in filas}
+        for correo in pendientes:
+            cache[correo] = encontrados.get(correo)
+
+
+def _validar_lote(session, lote, correo_por_defecto, usuarios, resumen):
+    """Aplica las reglas de Transaccion a un lote y devuelve los valores listos para insertar."""
+    _resolver_usuarios(session, {fila.get("usuario") or correo_por_defecto
+                                 for _, fila in lote if isinstance(fila, dict)}, usuarios)
+
+    valores = []
+    for numero, fila in lote:
+        if not isinstance(fila, dict):
+            motivo = str(fila) if isinstance(fila, ValueError) else "La fila debe ser un objeto JSON"
+            resumen.rechazadas.append((numero, motivo))
+            continue
+        try:
+            cantidad = redondear(fila["cantidad"])
+            tipo = str(fila["tipo"]).strip().capitalize()
+            fecha = fila["fecha"]
+            if not isinstance(fecha, datetime):
+                fecha = datetime.fromisoformat(str(fecha).strip())
+            nombre_categoria = str(fila["categoria"]).strip()
+            usuario_id = usuarios.get(fila.get("usuario") or correo_por_defecto)
+
+            Transaccion.validar_datos(cantidad, tipo, nombre_categoria, fecha, usuario_id, session)
+        except (KeyError, TypeError, ValueError) as e:
+            resumen.rechazadas.append((numero, str(e)))
+            continue
+
+        valores.append({
+            "cantidad": cantidad,
+            "fecha": fecha,
+            "tipo": TipoTransaccionEnum(tipo),
+            "categoria_id": CatalogoCategorias.obtener_id(session, tipo, nombre_categoria),
+            "usuario_id": usuario_id,
+            # COPY no aplica los valores por defecto de Python del modelo
+            "uid": nuevo_uid(),
+            "modificada": ahora_utc(),
+        })
+    return valores
+
+
+def _copiar_postgresql(session, valores):
+    # COPY ... FROM STDIN dentro de la misma transacción de la sesión; COPY no pasa por
+    # el tipo Centimos, así que la cantidad se escribe ya en céntimos
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    for v in valores:
+        escritor.writerow((a_centimos(v["cantidad"]), v["fecha"].isoformat(sep=" "), v["tipo"].name,
+                           v["categoria_id"], v["usuario_id"], v["uid"], v["modificada"].isoformat(sep=" ")))
+    buffer.seek(0)
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {Transaccion.__tablename__} ({', '.join(COLUMNAS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def escribir_lote(session, valores):
+    """
+    Inserta un lote con COPY en PostgreSQL (psycopg2) o con executemany en el resto de motores,
+    y lo suma al resumen mensual en la misma transacción.
+    """
+    if not valores:
+        return
+    bind = session.get_bind()
+    if bind.dialect.name == "postgresql" and bind.dialect.driver == "psycopg2":
+        _copiar_postgresql(session, valores)
+    else:
+        session.execute(insert(Transaccion.__table__), valores)
+    acumular(session.connection(), valores)
+    anotar(session, bind, {fila["usuario_id"] for fila in valores})
+
+
+def importar_transacciones(session, filas, correo_por_defecto=None, tamano_lote=TAMANO_LOTE):
+    """
+    Importa un iterable de (número de línea, dict) en lotes, en una única transacción.
+    Las filas inválidas se omiten y se informan en el resumen.
+    """
+    resumen = ResumenImportacion()
+    usuarios = {}
+    inicio = time.perf_counter()
+    filas = iter(filas)
+    try:
+        while True:
+            lote = list(islice(filas, tamano_lote))
+            if not lote:
+                break
+            valores = _validar_lote(session, lote, correo_por_defecto, usuarios, resumen)
+            escribir_lote(session, valores)
+            resumen.importadas += len(valores)
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    resumen.segundos = time.perf_counter() - inicio
+    return resumen
+
+
+def main(argv=None):
+    from src.model.db import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Importación masiva de transacciones (CSV o JSON Lines).")
+    parser.add_argument("archivo")
+    parser.add_argument("--formato", choices=["csv", "jsonl"],
+                        help="Por defecto se deduce de la extensión del archivo.")
+    parser.add_argument("--correo", help="Usuario para las filas sin columna 'usuario'.")
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE)
+    args = parser.parse_args(argv)
+
+    formato = args.formato or ("jsonl" if args.archivo.endswith((".jsonl", ".ndjson")) else "csv")
+
+    db = SessionLocal()
+    try:
+        with open(args.archivo, newline="", encoding="utf-8") as archivo:
+            resumen = importar_transacciones(db, leer_filas(archivo, formato), args.correo, args.lote)
+    finally:
+        db.close()
+
+    print(f"Filas importadas: {resumen.importadas}")
+    print(f"Filas rechazadas: {len(resumen.rechazadas)}")
+    for numero, motivo in resumen.rechazadas[:20]:
+        print(f"  línea {numero}: {motivo}")
+    print(f"Tiempo: {resumen.segundos:.2f} s ({resumen.filas_por_segundo:.0f} filas/s)")
+    return resumen
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+from collections import namedtuple
+from datetime import datetime
+
+from sqlalchemy import select, tuple_
+
+from src.model.archivo import ArchivoFrio
+from src.model.categoria import Categoria
+from src.model.dinero import a_decimal
+from src.model.transaccion import Transaccion, TipoTransaccionEnum
+
+TAMANO_PAGINA = 20
+
+# Fila de una transacción archivada, con los mismos campos que las de consulta_listado
+FilaArchivada = namedtuple("FilaArchivada", "id cantidad fecha tipo categoria_nombre")
+
+
+class Pagina:
+    """
+    Página de transacciones ordenadas por (fecha, id) descendente.
+    Cada fila trae id, cantidad, fecha, tipo y categoria_nombre.
+    Los cursores son tuplas (fecha, id) que se pasan a pagina_transacciones
+    como `despues` (página siguiente) o `antes` (página anterior). Si el engine
+    tiene archivo frío, las transacciones archivadas aparecen como FilaArchivada.
+    """
+    def __init__(self, filas, siguiente=None, anterior=None):
+        self.filas = filas
+        self.siguiente = siguiente
+        self.anterior = anterior
+
+    def __repr__(self):
+        return f"<Pagina(filas={len(self.filas)}, siguiente={self.siguiente}, anterior={self.anterior})>"
+
+
+def _cursor(fila):
+    return (fila.fecha, fila.id)
+
+
+def _con_archivadas(session, usuario_id, filas, n, despues=None, antes=None):
+    """
+    Mezcla las filas de la tabla con las n siguientes del archivo (si hay) y devuelve
+    las n primeras en el mismo orden: descendente, o ascendente si se pasa `antes`.
+    """
+    archivo = ArchivoFrio.de(session)
+    if archivo is None or not archivo.anios(usuario_id):
+        return filas
+    columnas = archivo.tramo(usuario_id, n, despues=despues, antes=antes)
+    if not len(columnas["id"]):
+        return filas
+    ids_categorias = set(columnas["categoria_id"].tolist())
+    nombres = dict(session.execute(select(Categoria.id, Categoria.nombre).where(Categoria.id.in_(ids_categorias))).all())
+    archivadas = [
+        FilaArchivada(id_, a_decimal(cantidad), fecha,
+                      TipoTransaccionEnum.INGRESO if signo == 1 else TipoTransaccionEnum.EGRESO,
+                      nombres.get(categoria_id))
+        for id_, cantidad, fecha, signo, categoria_id in zip(
+            columnas["id"].tolist(), columnas["cantidad"].tolist(), columnas["fecha"].astype(datetime).tolist(),
+            columnas["signo"].tolist(), columnas["categoria_id"].tolist())
+    ]
+    return sorted(list(filas) + archivadas, key=_cursor, reverse=antes is None)[:n]
+
+
+def consulta_listado(usuario_id):
+    # Solo las columnas que se muestran, con el nombre de la categoría en la misma sentencia
+    return (
+        select(
+            Transaccion.id,
+            Transaccion.cantidad,
+            Transaccion.fecha,
+            Transaccion.tipo,
+            Categoria.nombre.label("categoria_nombre"),
+        )
+        .outerjoin(Categoria, Transaccion.categoria_id == Categoria.id)
+        .where(Transaccion.usuario_id == usuario_id)
+    )
+
+
+def pagina_transacciones(session, usuario_id, tamano=TAMANO_PAGINA, despues=None, antes=None):
+    if despues is not None and antes is not None:
+        raise ValueError("Solo se puede indicar uno de los cursores 'despues' o 'antes'")
+    if tamano < 1:
+        raise ValueError("El tamaño de página debe ser mayor que cero")
+
+    clave = tuple_(Transaccion.fecha, Transaccion.id)
+    consulta = consulta_listado(usuario_id)
+
+    if antes is not None:
+        # Se recorre hacia atrás en orden ascendente y luego se invierte
+        filas = session.execute(
+            consulta.where(clave > tuple_(*antes))
+            .order_by(Transaccion.fecha.asc(), Transaccion.id.asc())
+            .limit(tamano + 1)
+        ).all()
+        filas = _con_archivadas(session, usuario_id, filas, tamano + 1, antes=antes)
+        hay_mas = len(filas) > tamano
+        filas = list(reversed(filas[:tamano]))
+        return Pagina(
+            filas,
+            siguiente=_cursor(filas[-1]) if filas else None,
+            anterior=_cursor(filas[0]) if hay_mas else None
+        )
+
+    if despues is not None:
+        consulta = consulta.where(clave < tuple_(*despues))
+    filas = session.execute(
+        consulta.order_by(Transaccion.fecha.desc(), Transaccion.id.desc())
+        .limit(tamano + 1)
+    ).all()
+    filas = _con_archivadas(session, usuario_id, filas, tamano + 1, despues=despues)
+    hay_mas = len(filas) > tamano
+    filas = filas[:tamano]
+    return Pagina(
+        filas,
+        siguiente=_cursor(filas[-1]) if hay_mas else None,
+        anterior=_cursor(filas[0]) if despues is not None and filas else None
+    )
@@ -0,0 +1,74 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import select
+
+from src.model import eliminacion
+from src.model.errors import ContrasenaIncorrectaError, CorreoYaRegistradoError, UsuarioNoEncontradoError
+from src.model.listado import TAMANO_PAGINA, pagina_transacciones
+from src.model.transaccion import Transaccion
+from src.model.usuario import Usuario
+
+# Operaciones de la aplicación sobre una AsyncSession (ver db.crear_sesiones_async).
+# Las validaciones del modelo se ejecutan con run_sync sobre la sesión síncrona
+# subyacente, y bcrypt en un hilo aparte para no bloquear el bucle de eventos.
+
+
+async def crear_usuario(session, nombre, correo, contrasena):
+    existe = await session.scalar(select(Usuario.id).where(Usuario.correo == correo))
+    if existe is not None:
+        raise CorreoYaRegistradoError("El correo ya está registrado.")
+    usuario = await asyncio.to_thread(Usuario, nombre=nombre, correo=correo, contraseña=contrasena)
+    session.add(usuario)
+    await session.commit()
+    return usuario
+
+
+async def iniciar_sesion(session, correo, contrasena):
+    """Devuelve el usuario si las credenciales son correctas; si cambió el coste de bcrypt guarda el nuevo hash."""
+    usuario = await session.scalar(select(Usuario).where(Usuario.correo == correo))
+    if usuario is None:
+        raise ContrasenaIncorrectaError("Correo o contraseña incorrectos")
+    await asyncio.to_thread(usuario.iniciar_sesion, correo, contrasena)
+    await session.commit()
+    return usuario
+
+
+async def registrar_transaccion(session, usuario_id, cantidad, tipo, categoria, fecha=None):
+    usuario = await session.get(Usuario, usuario_id)
+    if usuario is None:
+        raise UsuarioNoEncontradoError(f"No existe el usuario {usuario_id}")
+
+    def construir(sesion_sincrona):
+        return Transaccion(
+            cantidad=cantidad,
+            fecha=fecha or datetime.now(),
+            tipo=tipo,
+            categoria=categoria,
+            usuario=usuario,
+            session=sesion_sincrona
+        )
+
+    transaccion = await session.run_sync(construir)
+    session.add(transaccion)
+    await session.commit()
+    return transaccion
+
+
+async def listar_transacciones(session, usuario_id, tamano=TAMANO_PAGINA, despues=None, antes=None):
+    """La misma paginación por cursor que listado.pagina_transacciones."""
+    return await session.run_sync(pagina_transacciones, usuario_id, tamano, despues, antes)
+
+
+async def eliminar_transaccion(session, usuario_id, transaccion_id):
+    """Elimina la transacción si pertenece al usuario. Devuelve False si no existe o es de otro usuario."""
+    eliminadas = await session.run_sync(eliminacion.eliminar_transacciones, usuario_id, [transaccion_id])
+    await session.commit()
+    return eliminadas == 1
+
+
+async def resumen(session, usuario_id, meses=12, top=5):
+    """Los mismos datos que servicios.resumen, calculados con la sesión síncrona subyacente."""
+    from src.model import servicios
+
+    return await session.run_sync(lambda sesion: servicios.resumen(usuario_id, meses, top, session=sesion))
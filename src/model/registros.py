@@ -1,11 +1,9 @@
 import re
 from sqlalchemy import Column, Integer, String
 from sqlalchemy.orm import validates
-from sqlalchemy.ext.declarative import declarative_base
+from src.model.base import Base
 from src.model.errors import CorreoInvalidoError, ContrasenaInseguraError, CamposVaciosError
 
-Base = declarative_base()
-
 class Registro(Base):
     __tablename__ = "registros"
 
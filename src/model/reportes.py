@@ -0,0 +1,225 @@
+from datetime import datetime
+
+import numpy as np
+from sqlalchemy import select, func, case
+
+from src.model.analitica import agrupar
+from src.model.archivo import ArchivoFrio
+from src.model.cache_reportes import cacheado
+from src.model.categoria import Categoria
+from src.model.dinero import a_decimal
+from src.model.transaccion import Transaccion, TipoTransaccionEnum
+from src.model.resumen_mensual import ResumenMensual
+
+# Formatos de periodo por dialecto. La semana es ISO en PostgreSQL y
+# "semana del año empezando en lunes" (%W) en SQLite.
+_FORMATOS_PERIODO = {
+    "postgresql": {"dia": "YYYY-MM-DD", "semana": 'IYYY-"W"IW', "mes": "YYYY-MM", "anio": "YYYY"},
+    "sqlite": {"dia": "%Y-%m-%d", "semana": "%Y-W%W", "mes": "%Y-%m", "anio": "%Y"},
+}
+# Los mismos periodos calculados en Python, para las transacciones archivadas
+_FORMATOS_PYTHON = {"dia": "%Y-%m-%d", "semana": "%Y-W%W", "mes": "%Y-%m", "anio": "%Y"}
+
+
+def _expresion_periodo(dialecto, periodo):
+    formatos = _FORMATOS_PERIODO.get(dialecto)
+    if formatos is None:
+        raise ValueError(f"Dialecto no soportado para reportes por periodo: '{dialecto}'")
+    if periodo not in formatos:
+        raise ValueError("Periodo debe ser 'dia', 'semana', 'mes' o 'anio'")
+    if dialecto == "postgresql":
+        return func.to_char(Transaccion.fecha, formatos[periodo])
+    return func.strftime(formatos[periodo], Transaccion.fecha)
+
+
+def _tipo(tipo):
+    if tipo is None or isinstance(tipo, TipoTransaccionEnum):
+        return tipo
+    return TipoTransaccionEnum(str(tipo).capitalize())
+
+
+def _filtrar(consulta, usuario_id, desde=None, hasta=None, tipo=None):
+    consulta = consulta.where(Transaccion.usuario_id == usuario_id)
+    if desde is not None:
+        consulta = consulta.where(Transaccion.fecha >= desde)
+    if hasta is not None:
+        consulta = consulta.where(Transaccion.fecha <= hasta)
+    if tipo is not None:
+        consulta = consulta.where(Transaccion.tipo == _tipo(tipo))
+    return consulta
+
+
+def _validar_rango(desde, hasta):
+    if desde is not None and hasta is not None and desde > hasta:
+        raise ValueError("La fecha inicial no puede ser posterior a la final")
+
+
+def _etiqueta_periodo(dialecto, periodo, dia):
+    if dialecto == "postgresql" and periodo == "semana":
+        anio, semana, _ = dia.isocalendar()
+        return f"{anio}-W{semana:02d}"
+    return dia.strftime(_FORMATOS_PYTHON[periodo])
+
+
+def _archivadas(session, usuario_id, desde=None, hasta=None, tipo=None):
+    """Columnas archivadas del usuario (ver archivo.ArchivoFrio) o None si no hay ninguna."""
+    archivo = ArchivoFrio.de(session)
+    if archivo is None or not archivo.anios(usuario_id):
+        return None
+    columnas = archivo.columnas(usuario_id, desde, hasta)
+    if tipo is not None:
+        mascara = columnas["signo"] == (1 if _tipo(tipo) == TipoTransaccionEnum.INGRESO else -1)
+        columnas = {nombre: valores[mascara] for nombre, valores in columnas.items()}
+    return columnas if len(columnas["id"]) else None
+
+
+def _archivadas_por_categoria(session, archivadas):
+    """{(categoria, tipo): [total, num_transacciones]} de las transacciones archivadas."""
+    totales = {}
+    ids_categorias = np.unique(archivadas["categoria_id"]).tolist()
+    nombres = dict(session.execute(select(Categoria.id, Categoria.nombre).where(Categoria.id.in_(ids_categorias))).all())
+    for tipo, signo in ((TipoTransaccionEnum.INGRESO, 1), (TipoTransaccionEnum.EGRESO, -1)):
+        mascara = archivadas["signo"] == signo
+        for categoria_id, total, n in zip(*agrupar(archivadas["categoria_id"][mascara], archivadas["cantidad"][mascara])):
+            totales[(nombres.get(int(categoria_id)), tipo.value)] = [a_decimal(total), int(n)]
+    return totales
+
+
+def _sumar_por_categoria(session, filas, archivadas):
+    """Suma a [(categoria, tipo, total, num_transacciones)] las archivadas; por total descendente."""
+    totales = _archivadas_por_categoria(session, archivadas)
+    for nombre, tipo, total, n in filas:
+        acumulado = totales.setdefault((nombre, tipo), [0, 0])
+        acumulado[0] += total
+        acumulado[1] += n
+    return sorted(((nombre, tipo, total, n) for (nombre, tipo), (total, n) in totales.items()),
+                  key=lambda fila: (-fila[2], fila[0]))
+
+
+def _ingresos_egresos(columna_tipo, columna_total):
+    ingresos = func.coalesce(func.sum(case((columna_tipo == TipoTransaccionEnum.INGRESO, columna_total), else_=0)), 0)
+    egresos = func.coalesce(func.sum(case((columna_tipo == TipoTransaccionEnum.EGRESO, columna_total), else_=0)), 0)
+    return ingresos, egresos
+
+
+# Los reportes pasan por la cache del engine (cache_reportes.py); sin `hasta`, una
+# transacción con fecha futura no entra en el balance guardado hasta que caduque o cambien los datos
+
+@cacheado
+def balance(session, usuario_id, hasta=None):
+    """
+    (ingresos, egresos, neto) acumulados hasta la fecha indicada (por defecto, ahora).
+    Los meses completos salen del resumen mensual y solo el mes de `hasta` se suma
+    desde transacciones; las transacciones archivadas se suman desde el archivo.
+    """
+    hasta = hasta or datetime.now()
+    mes = hasta.strftime("%Y-%m")
+    inicio_mes = hasta.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+    meses_completos = select(*_ingresos_egresos(ResumenMensual.tipo, ResumenMensual.total)).where(
+        ResumenMensual.usuario_id == usuario_id,
+        ResumenMensual.anio_mes < mes
+    )
+    mes_en_curso = select(*_ingresos_egresos(Transaccion.tipo, Transaccion.cantidad)).where(
+        Transaccion.usuario_id == usuario_id,
+        Transaccion.fecha >= inicio_mes,
+        Transaccion.fecha <= hasta
+    )
+    ingresos_a, egresos_a = session.execute(meses_completos).one()
+    ingresos_b, egresos_b = session.execute(mes_en_curso).one()
+    ingresos = ingresos_a + ingresos_b
+    egresos = egresos_a + egresos_b
+    archivadas = _archivadas(session, usuario_id, hasta=hasta)
+    if archivadas is not None:
+        ingreso = archivadas["signo"] == 1
+        ingresos += a_decimal(archivadas["cantidad"][ingreso].sum())
+        egresos += a_decimal(archivadas["cantidad"][~ingreso].sum())
+    return (ingresos, egresos, ingresos - egresos)
+
+
+@cacheado
+def totales_por_tipo(session, usuario_id, desde=None, hasta=None):
+    """[(tipo, total, num_transacciones)]"""
+    _validar_rango(desde, hasta)
+    consulta = _filtrar(
+        select(Transaccion.tipo, func.sum(Transaccion.cantidad), func.count()),
+        usuario_id, desde, hasta
+    ).group_by(Transaccion.tipo).order_by(Transaccion.tipo)
+    filas = [(t.value, total, n) for t, total, n in session.execute(consulta)]
+    archivadas = _archivadas(session, usuario_id, desde, hasta)
+    if archivadas is None:
+        return filas
+    totales = {tipo: [total, n] for tipo, total, n in filas}
+    for tipo, signo in ((TipoTransaccionEnum.EGRESO, -1), (TipoTransaccionEnum.INGRESO, 1)):
+        cantidades = archivadas["cantidad"][archivadas["signo"] == signo]
+        if len(cantidades):
+            acumulado = totales.setdefault(tipo.value, [0, 0])
+            acumulado[0] += a_decimal(cantidades.sum())
+            acumulado[1] += len(cantidades)
+    return [(tipo, total, n) for tipo, (total, n) in totales.items()]
+
+
+@cacheado
+def totales_por_categoria(session, usuario_id, desde=None, hasta=None, tipo=None):
+    """[(categoria, tipo, total, num_transacciones)] ordenado por total descendente."""
+    _validar_rango(desde, hasta)
+    total = func.sum(Transaccion.cantidad)
+    consulta = _filtrar(
+        select(Categoria.nombre, Transaccion.tipo, total, func.count())
+        .join(Categoria, Transaccion.categoria_id == Categoria.id),
+        usuario_id, desde, hasta, tipo
+    ).group_by(Categoria.nombre, Transaccion.tipo).order_by(total.desc(), Categoria.nombre)
+    filas = [(nombre, t.value, suma, n) for nombre, t, suma, n in session.execute(consulta)]
+    archivadas = _archivadas(session, usuario_id, desde, hasta, tipo)
+    return filas if archivadas is None else _sumar_por_categoria(session, filas, archivadas)
+
+
+@cacheado
+def top_categorias(session, usuario_id, n=5, tipo=TipoTransaccionEnum.EGRESO, desde=None, hasta=None):
+    """Las n categorías con mayor total: [(categoria, total)]"""
+    if n < 1:
+        raise ValueError("n debe ser mayor que cero")
+    _validar_rango(desde, hasta)
+    archivadas = _archivadas(session, usuario_id, desde, hasta, tipo)
+    if archivadas is not None:
+        # Con transacciones archivadas el orden final se decide después de sumarlas
+        filas = totales_por_categoria(session, usuario_id, desde, hasta, tipo)
+        totales = {}
+        for nombre, _, total, _ in filas:
+            totales[nombre] = totales.get(nombre, 0) + total
+        return sorted(totales.items(), key=lambda fila: (-fila[1], fila[0]))[:n]
+    total = func.sum(Transaccion.cantidad)
+    consulta = _filtrar(
+        select(Categoria.nombre, total).join(Categoria, Transaccion.categoria_id == Categoria.id),
+        usuario_id, desde, hasta, tipo
+    ).group_by(Categoria.nombre).order_by(total.desc(), Categoria.nombre).limit(n)
+    return [tuple(fila) for fila in session.execute(consulta)]
+
+
+@cacheado
+def totales_por_periodo(session, usuario_id, periodo="mes", desde=None, hasta=None):
+    """[(periodo, ingresos, egresos, neto)] en orden cronológico."""
+    _validar_rango(desde, hasta)
+    dialecto = session.get_bind().dialect.name
+    clave = _expresion_periodo(dialecto, periodo).label("periodo")
+    ingresos, egresos = _ingresos_egresos(Transaccion.tipo, Transaccion.cantidad)
+    consulta = _filtrar(select(clave, ingresos, egresos), usuario_id, desde, hasta).group_by(clave).order_by(clave)
+    filas = session.execute(consulta).all()
+    archivadas = _archivadas(session, usuario_id, desde, hasta)
+    if archivadas is None:
+        return [(p, i, e, i - e) for p, i, e in filas]
+
+    totales = {p: [i, e] for p, i, e in filas}
+    # Una etiqueta por día distinto y luego la suma por etiqueta, en céntimos
+    dias, por_dia = np.unique(archivadas["fecha"].astype("datetime64[D]"), return_inverse=True)
+    etiquetas, por_etiqueta = np.unique([_etiqueta_periodo(dialecto, periodo, dia) for dia in dias.tolist()],
+                                        return_inverse=True)
+    indices = por_etiqueta[por_dia]
+    ingreso = archivadas["signo"] == 1
+    _, ingresos_archivados, _ = agrupar(indices, np.where(ingreso, archivadas["cantidad"], 0))
+    unicos, egresos_archivados, _ = agrupar(indices, np.where(ingreso, 0, archivadas["cantidad"]))
+    for indice, ingresos_p, egresos_p in zip(unicos.tolist(), ingresos_archivados, egresos_archivados):
+        acumulado = totales.setdefault(str(etiquetas[indice]), [0, 0])
+        acumulado[0] += a_decimal(ingresos_p)
+        acumulado[1] += a_decimal(egresos_p)
+    return [(p, i, e, i - e) for p, (i, e) in sorted(totales.items())]
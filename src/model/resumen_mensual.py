@@ -0,0 +1,187 @@
+import argparse
+from collections import defaultdict
+
+from sqlalchemy import Column, Integer, String, Enum, ForeignKey, select, delete, func, event, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+
+from src.model.base import Base
+from src.model.dinero import Centimos, a_centimos, a_decimal
+from src.model.transaccion import Transaccion, TipoTransaccionEnum
+
+
+class ResumenMensual(Base):
+    """
+    Total y número de transacciones por usuario, mes, categoría y tipo.
+    Se mantiene en la misma transacción que las altas, bajas y modificaciones
+    de Transaccion; reconstruir_resumen lo recalcula desde cero.
+    """
+    __tablename__ = "resumen_mensual"
+
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), primary_key=True)
+    anio_mes = Column(String(7), primary_key=True)  # "AAAA-MM"
+    categoria_id = Column(Integer, ForeignKey("categorias.id"), primary_key=True)
+    tipo = Column(Enum(TipoTransaccionEnum), primary_key=True)
+    total = Column(Centimos, nullable=False, default=0)
+    num_transacciones = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return (f"<ResumenMensual(usuario_id={self.usuario_id}, anio_mes={self.anio_mes}, "
+                f"categoria_id={self.categoria_id}, tipo={self.tipo.value}, total={self.total}, "
+                f"num_transacciones={self.num_transacciones})>")
+
+
+_CAMPOS = ("cantidad", "fecha", "tipo", "categoria_id", "usuario_id")
+
+
+def _clave(valores):
+    return (valores["usuario_id"], valores["fecha"].strftime("%Y-%m"), valores["categoria_id"], valores["tipo"])
+
+
+def acumular(conexion, filas, signo=1):
+    """
+    Suma (signo=1) o resta (signo=-1) un conjunto de transacciones al resumen.
+    `filas` son diccionarios, mappings o filas con cantidad, fecha, tipo, categoria_id y usuario_id.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    for fila in filas:
+        valores = fila._mapping if hasattr(fila, "_mapping") else fila
+        delta = deltas[_clave(valores)]
+        # Se acumula en céntimos: aritmética entera y exacta
+        delta[0] += signo * a_centimos(valores["cantidad"])
+        delta[1] += signo
+    _aplicar(conexion, deltas)
+
+
+def _aplicar(conexion, deltas):
+    if not deltas:
+        return
+    tabla = ResumenMensual.__table__
+    filas = [
+        {"usuario_id": u, "anio_mes": m, "categoria_id": c, "tipo": t, "total": a_decimal(total), "num_transacciones": n}
+        for (u, m, c, t), (total, n) in deltas.items()
+    ]
+    dialecto = conexion.dialect.name
+    if dialecto in ("postgresql", "sqlite"):
+        insertar = (postgresql.insert if dialecto == "postgresql" else sqlite.insert)(tabla)
+        conexion.execute(
+            insertar.on_conflict_do_update(
+                index_elements=[c.name for c in tabla.primary_key.columns],
+                set_={
+                    "total": tabla.c.total + insertar.excluded.total,
+                    "num_transacciones": tabla.c.num_transacciones + insertar.excluded.num_transacciones,
+                }
+            ),
+            filas
+        )
+    else:
+        for fila in filas:
+            actualizadas = conexion.execute(
+                tabla.update()
+                .where(*[c == fila[c.name] for c in tabla.primary_key.columns])
+                .values(total=tabla.c.total + fila["total"],
+                        num_transacciones=tabla.c.num_transacciones + fila["num_transacciones"])
+            ).rowcount
+            if not actualizadas:
+                conexion.execute(tabla.insert().values(**fila))
+
+    # Los grupos que se quedan sin transacciones se eliminan
+    if any(n < 0 for _, n in deltas.values()):
+        conexion.execute(delete(tabla).where(tabla.c.num_transacciones <= 0))
+
+
+def _leer_de_bd(conexion, transaccion_id):
+    tabla = Transaccion.__table__
+    return conexion.execute(
+        select(*[tabla.c[campo] for campo in _CAMPOS]).where(tabla.c.id == transaccion_id)
+    ).mappings().first()
+
+
+def _valores_anteriores(conexion, target):
+    estado = inspect(target)
+    valores = {}
+    for campo in _CAMPOS:
+        historial = estado.attrs[campo].history
+        if historial.deleted:
+            valores[campo] = historial.deleted[0]
+        elif historial.unchanged:
+            valores[campo] = historial.unchanged[0]
+        else:
+            # Valor anterior no cargado: se lee la fila tal como está antes del UPDATE
+            return _leer_de_bd(conexion, estado.identity[0])
+    return valores
+
+
+def _valores_actuales(target):
+    return {campo: getattr(target, campo) for campo in _CAMPOS}
+
+
+def _al_insertar(mapper, conexion, target):
+    acumular(conexion, [_valores_actuales(target)])
+
+
+def _antes_de_actualizar(mapper, conexion, target):
+    estado = inspect(target)
+    if not any(estado.attrs[campo].history.has_changes() for campo in _CAMPOS):
+        return
+    anteriores = _valores_anteriores(conexion, target)
+    acumular(conexion, [anteriores], signo=-1)
+    acumular(conexion, [_valores_actuales(target)])
+
+
+def _antes_de_eliminar(mapper, conexion, target):
+    estado = inspect(target)
+    if estado.unloaded.intersection(_CAMPOS):
+        valores = _leer_de_bd(conexion, estado.identity[0])
+    else:
+        valores = _valores_anteriores(conexion, target)
+    if valores:
+        acumular(conexion, [valores], signo=-1)
+
+
+event.listen(Transaccion, "after_insert", _al_insertar)
+event.listen(Transaccion, "before_update", _antes_de_actualizar)
+event.listen(Transaccion, "before_delete", _antes_de_eliminar)
+
+
+def _expresion_anio_mes(dialecto):
+    if dialecto == "postgresql":
+        return func.to_char(Transaccion.fecha, "YYYY-MM")
+    if dialecto == "sqlite":
+        return func.strftime("%Y-%m", Transaccion.fecha)
+    return func.concat(func.extract("year", Transaccion.fecha), "-", func.lpad(func.extract("month", Transaccion.fecha), 2, "0"))
+
+
+def reconstruir_resumen(conexion, usuario_id=None):
+    """Recalcula el resumen desde transacciones (todo, o solo un usuario) para reparar desajustes."""
+    tabla = ResumenMensual.__table__
+    anio_mes = _expresion_anio_mes(conexion.dialect.name).label("anio_mes")
+
+    borrar = delete(tabla)
+    origen = select(
+        Transaccion.usuario_id, anio_mes, Transaccion.categoria_id, Transaccion.tipo,
+        func.sum(Transaccion.cantidad), func.count()
+    ).group_by(Transaccion.usuario_id, anio_mes, Transaccion.categoria_id, Transaccion.tipo)
+    if usuario_id is not None:
+        borrar = borrar.where(tabla.c.usuario_id == usuario_id)
+        origen = origen.where(Transaccion.usuario_id == usuario_id)
+
+    conexion.execute(borrar)
+    conexion.execute(tabla.insert().from_select(
+        ["usuario_id", "anio_mes", "categoria_id", "tipo", "total", "num_transacciones"], origen
+    ))
+
+
+def main(argv=None):
+    from src.model.db import engine
+
+    parser = argparse.ArgumentParser(description="Reconstruye el resumen mensual a partir de las transacciones.")
+    parser.add_argument("--usuario", type=int, help="Solo el usuario con este id.")
+    args = parser.parse_args(argv)
+
+    with engine.begin() as conexion:
+        reconstruir_resumen(conexion, args.usuario)
+    print("Resumen mensual reconstruido.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+from contextlib import contextmanager
+from datetime import datetime
+
+from sqlalchemy import select
+
+from src.model import eliminacion, reportes
+from src.model.catalogo_categorias import CatalogoCategorias
+from src.model.db import SessionLocal, obtener_engine
+from src.model.errors import ContrasenaIncorrectaError, CorreoYaRegistradoError, UsuarioNoEncontradoError
+from src.model.esquema import inicializar_base
+from src.model.listado import TAMANO_PAGINA, pagina_transacciones
+from src.model.sesion import UsuarioSesion
+from src.model.transaccion import Transaccion
+from src.model.usuario import Usuario
+
+# Operaciones de la aplicación con argumentos simples, compartidas por la consola,
+# la interfaz Kivy y los scripts. Todas aceptan `session`: si se pasa, la operación
+# forma parte de la unidad de trabajo del llamador, que decide cuándo confirmar;
+# si no, la operación abre su propia sesión, confirma y la cierra.
+
+_base_preparada = False
+
+
+def preparar_base():
+    """
+    Inicializa la base de datos de la aplicación (esquema.inicializar_base) la primera
+    vez que se llama en el proceso; si ya está en la versión actual, solo la comprueba.
+    """
+    global _base_preparada
+    if not _base_preparada:
+        inicializar_base(obtener_engine())
+        _base_preparada = True
+
+
+@contextmanager
+def unidad_de_trabajo(session=None):
+    """
+    Sesión para un bloque de operaciones con un único commit al salir (rollback si hay
+    una excepción). Con `session`, se usa esa sesión y el commit queda a cargo del llamador.
+        with unidad_de_trabajo() as db:
+            for cantidad in cantidades:
+                registrar_transaccion(usuario_id, cantidad, "Egreso", "Alimentación", session=db)
+    """
+    if session is not None:
+        yield session
+        return
+    # Sin expirar al confirmar: los objetos devueltos se pueden leer después de cerrar la sesión
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        yield db
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def _usuario(db, usuario):
+    """Usuario de la sesión a partir de un Usuario, del UsuarioSesion de la sesión iniciada o de su id."""
+    if isinstance(usuario, UsuarioSesion):
+        usuario = usuario.id
+    if isinstance(usuario, Usuario):
+        # Objeto de otra sesión (p. ej. el de la sesión iniciada): se copia sin consultar
+        return usuario if usuario in db else db.merge(usuario, load=False)
+    encontrado = db.get(Usuario, usuario)
+    if encontrado is None:
+        raise UsuarioNoEncontradoError(f"No existe el usuario {usuario}")
+    return encontrado
+
+
+def crear_usuario(nombre, correo, contrasena, session=None):
+    with unidad_de_trabajo(session) as db:
+        if db.scalar(select(Usuario.id).where(Usuario.correo == correo)) is not None:
+            raise CorreoYaRegistradoError("El correo ya está registrado.")
+        usuario = Usuario(nombre=nombre, correo=correo, contraseña=contrasena)
+        db.add(usuario)
+        db.flush()
+        return usuario
+
+
+def iniciar_sesion(correo, contrasena, session=None):
+    """Devuelve el usuario si las credenciales son correctas; si cambió el coste de bcrypt guarda el nuevo hash."""
+    with unidad_de_trabajo(session) as db:
+        usuario = db.scalar(select(Usuario).where(Usuario.correo == correo))
+        if usuario is None:
+            raise ContrasenaIncorrectaError("Correo o contraseña incorrectos")
+        usuario.iniciar_sesion(correo, contrasena)
+        return usuario
+
+
+def categorias(tipo, session=None):
+    """Nombres de las categorías de un tipo ('Ingreso' o 'Egreso')."""
+    with unidad_de_trabajo(session) as db:
+        return CatalogoCategorias.nombres(db, tipo)
+
+
+def registrar_transaccion(usuario, cantidad, tipo, categoria, fecha=None, session=None):
+    """`usuario` es un Usuario, el UsuarioSesion de la sesión iniciada o su id; `categoria` es el nombre de la categoría."""
+    with unidad_de_trabajo(session) as db:
+        # El usuario de la sesión iniciada se comprobó al iniciarla: basta su id, sin consultarlo
+        transaccion = Transaccion(
+            cantidad=cantidad,
+            fecha=fecha or datetime.now(),
+            tipo=tipo,
+            categoria=categoria,
+            usuario=usuario.id if isinstance(usuario, UsuarioSesion) else _usuario(db, usuario),
+            session=db
+        )
+        db.add(transaccion)
+        db.flush()
+        return transaccion
+
+
+def listar_transacciones(usuario_id, tamano=TAMANO_PAGINA, despues=None, antes=None, session=None):
+    """Página de transacciones del usuario (ver listado.pagina_transacciones)."""
+    with unidad_de_trabajo(session) as db:
+        return pagina_transacciones(db, usuario_id, tamano=tamano, despues=despues, antes=antes)
+
+
+def eliminar_transaccion(usuario_id, transaccion_id, session=None):
+    """Elimina la transacción si pertenece al usuario. Devuelve False si no existe o es de otro usuario."""
+    with unidad_de_trabajo(session) as db:
+        return eliminacion.eliminar_transacciones(db, usuario_id, ids=[transaccion_id]) == 1
+
+
+def eliminar_transacciones(usuario_id, ids=None, desde=None, hasta=None, categoria=None, session=None):
+    """
+    Elimina con una sola sentencia las transacciones del usuario con esos ids, con fecha
+    entre `desde` y `hasta` (incluidas) y/o de esa categoría. Devuelve cuántas se han eliminado.
+    """
+    with unidad_de_trabajo(session) as db:
+        return eliminacion.eliminar_transacciones(db, usuario_id, ids=ids, desde=desde, hasta=hasta,
+                                                  categoria=categoria)
+
+
+def resumen(usuario_id, meses=12, top=5, session=None):
+    """
+    Balance, categorías con más gasto y los últimos `meses` meses:
+    {"balance": (ingresos, egresos, neto), "top_categorias": [(nombre, total)],
+     "meses": [(periodo, ingresos, egresos, neto)]}
+    """
+    with unidad_de_trabajo(session) as db:
+        return {
+            "balance": reportes.balance(db, usuario_id),
+            "top_categorias": reportes.top_categorias(db, usuario_id, n=top),
+            "meses": reportes.totales_por_periodo(db, usuario_id, "mes")[-meses:],
+        }
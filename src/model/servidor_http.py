@@ -0,0 +1,350 @@
+import argparse
+import asyncio
+import json
+import logging
+import re
+from collections import namedtuple
+from contextlib import suppress
+from datetime import datetime
+from decimal import Decimal
+from http import HTTPStatus
+from urllib.parse import parse_qsl, urlsplit
+
+from src.model import operaciones_async
+from src.model.errors import (
+    ContrasenaIncorrectaError, CorreoYaRegistradoError, ErrorBase, TransaccionNoEncontradaError,
+    UsuarioNoEncontradoError
+)
+from src.model.estadisticas_sql import ESTADISTICAS_SQL
+from src.model.sesion import Sesion, instantanea
+
+# API HTTP/1.1 con JSON sobre las operaciones asíncronas (operaciones_async.py), con
+# conexiones persistentes (keep-alive) y el pool de conexiones del engine asíncrono.
+# La autenticación es un token (Authorization: Bearer <token>) del almacén de sesiones:
+# cada petición se atiende dentro de Sesion.usar(token), en la tarea de su conexión.
+# Las sentencias SQL de cada ruta se miden como una acción ("GET /resumen") en ESTADISTICAS_SQL.
+#
+#   POST   /usuarios              {nombre, correo, contrasena}         -> 201 usuario
+#   POST   /sesiones              {correo, contrasena}                 -> 201 {token, usuario}
+#   DELETE /sesiones                                                   -> 204
+#   POST   /transacciones         {cantidad, tipo, categoria, fecha?}  -> 201 transacción
+#   GET    /transacciones         ?tamano=&despues=&antes=             -> {transacciones, siguiente, anterior}
+#   DELETE /transacciones/<id>                                         -> 204
+#   GET    /resumen               ?meses=&top=                         -> {balance, top_categorias, meses}
+#
+# Las cantidades viajan como texto ("12.50") para no perder precisión.
+
+registro = logging.getLogger(__name__)
+
+TAMANO_MAXIMO_CUERPO = 1024 * 1024
+# Máximos de los parámetros enteros de la consulta (?tamano=, ?meses=, ?top=)
+TAMANO_MAXIMO_PAGINA = 100
+MESES_MAXIMOS = 120
+TOP_MAXIMO = 50
+TIEMPO_INACTIVO = 30
+
+Peticion = namedtuple("Peticion", "parametros datos usuario argumentos")
+
+
+class ErrorHTTP(Exception):
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+
+
+# Errores del modelo -> código HTTP; el resto de ErrorBase y ValueError son 400
+_ESTADOS_ERROR = (
+    (ContrasenaIncorrectaError, HTTPStatus.UNAUTHORIZED),
+    (CorreoYaRegistradoError, HTTPStatus.CONFLICT),
+    (UsuarioNoEncontradoError, HTTPStatus.NOT_FOUND),
+    (TransaccionNoEncontradaError, HTTPStatus.NOT_FOUND),
+    (ErrorBase, HTTPStatus.BAD_REQUEST),
+    (ValueError, HTTPStatus.BAD_REQUEST),
+)
+
+
+def _json(valor):
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    if hasattr(valor, "value"):
+        return valor.value
+    raise TypeError(f"No se puede convertir a JSON: {valor!r}")
+
+
+def _campo(datos, nombre):
+    valor = datos.get(nombre)
+    if valor is None or valor == "":
+        raise ErrorHTTP(HTTPStatus.BAD_REQUEST, f"Falta el campo '{nombre}'")
+    return valor
+
+
+def _entero(parametros, nombre, defecto, maximo):
+    try:
+        valor = int(parametros.get(nombre, defecto))
+    except ValueError:
+        raise ErrorHTTP(HTTPStatus.BAD_REQUEST, f"'{nombre}' debe ser un número entero")
+    if not 1 <= valor <= maximo:
+        raise ErrorHTTP(HTTPStatus.BAD_REQUEST, f"'{nombre}' debe estar entre 1 y {maximo}")
+    return valor
+
+
+def cursor_a_texto(cursor):
+    return None if cursor is None else f"{cursor[0].isoformat()}_{cursor[1]}"
+
+
+def texto_a_cursor(texto):
+    if not texto:
+        return None
+    try:
+        fecha, id_ = texto.rsplit("_", 1)
+        return datetime.fromisoformat(fecha), int(id_)
+    except ValueError:
+        raise ErrorHTTP(HTTPStatus.BAD_REQUEST, f"Cursor inválido: '{texto}'")
+
+
+def _usuario(usuario):
+    return instantanea(usuario)._asdict()
+
+
+def _fila(fila):
+    return {"id": fila.id, "cantidad": fila.cantidad, "fecha": fila.fecha, "tipo": fila.tipo,
+            "categoria": fila.categoria_nombre}
+
+
+class ServidorAPI:
+    """
+    Servidor HTTP de la API. `sesiones` es una fábrica de AsyncSession
+    (db.crear_sesiones_async); cada petición usa una sesión propia del pool.
+    """
+
+    def __init__(self, sesiones):
+        self.sesiones = sesiones
+        self._servidor = None
+        self._rutas = []
+        for metodo, patron, manejador, autenticada in (
+            ("POST", "/usuarios", self.crear_usuario, False),
+            ("POST", "/sesiones", self.iniciar_sesion, False),
+            ("DELETE", "/sesiones", self.cerrar_sesion, True),
+            ("POST", "/transacciones", self.registrar_transaccion, True),
+            ("GET", "/transacciones", self.listar_transacciones, True),
+            ("DELETE", "/transacciones/{id}", self.eliminar_transaccion, True),
+            ("GET", "/resumen", self.resumen, True),
+        ):
+            expresion = re.compile("^" + patron.replace("{id}", r"(?P<id>\d+)") + "$")
+            self._rutas.append((metodo, expresion, manejador, autenticada, f"{metodo} {patron}"))
+
+    # ---- Operaciones ----
+
+    async def crear_usuario(self, peticion):
+        async with self.sesiones() as db:
+            usuario = await operaciones_async.crear_usuario(
+                db, _campo(peticion.datos, "nombre"), _campo(peticion.datos, "correo"),
+                _campo(peticion.datos, "contrasena"))
+        return HTTPStatus.CREATED, _usuario(usuario)
+
+    async def iniciar_sesion(self, peticion):
+        async with self.sesiones() as db:
+            usuario = await operaciones_async.iniciar_sesion(
+                db, _campo(peticion.datos, "correo"), _campo(peticion.datos, "contrasena"))
+        token = Sesion.almacen.crear(usuario)
+        return HTTPStatus.CREATED, {"token": token, "usuario": _usuario(usuario)}
+
+    async def cerrar_sesion(self, peticion):
+        Sesion.cerrar_sesion()
+        return HTTPStatus.NO_CONTENT, None
+
+    async def registrar_transaccion(self, peticion):
+        fecha = peticion.datos.get("fecha")
+        try:
+            fecha = datetime.fromisoformat(fecha) if fecha else None
+        except (TypeError, ValueError):
+            raise ErrorHTTP(HTTPStatus.BAD_REQUEST, "La fecha debe tener formato ISO (AAAA-MM-DD[THH:MM:SS])")
+        categoria = _campo(peticion.datos, "categoria")
+        async with self.sesiones() as db:
+            transaccion = await operaciones_async.registrar_transaccion(
+                db, peticion.usuario.id, str(_campo(peticion.datos, "cantidad")), _campo(peticion.datos, "tipo"),
+                categoria, fecha)
+            return HTTPStatus.CREATED, {"id": transaccion.id, "cantidad": transaccion.cantidad,
+                                        "fecha": transaccion.fecha, "tipo": transaccion.tipo, "categoria": categoria}
+
+    async def listar_transacciones(self, peticion):
+        tamano = _entero(peticion.parametros, "tamano", operaciones_async.TAMANO_PAGINA, TAMANO_MAXIMO_PAGINA)
+        async with self.sesiones() as db:
+            pagina = await operaciones_async.listar_transacciones(
+                db, peticion.usuario.id, tamano,
+                texto_a_cursor(peticion.parametros.get("despues")), texto_a_cursor(peticion.parametros.get("antes")))
+        return HTTPStatus.OK, {"transacciones": [_fila(fila) for fila in pagina.filas],
+                               "siguiente": cursor_a_texto(pagina.siguiente),
+                               "anterior": cursor_a_texto(pagina.anterior)}
+
+    async def eliminar_transaccion(self, peticion):
+        async with self.sesiones() as db:
+            eliminada = await operaciones_async.eliminar_transaccion(db, peticion.usuario.id,
+                                                                     int(peticion.argumentos["id"]))
+        if not eliminada:
+            raise ErrorHTTP(HTTPStatus.NOT_FOUND, "Transacción no encontrada o no pertenece al usuario")
+        return HTTPStatus.NO_CONTENT, None
+
+    async def resumen(self, peticion):
+        async with self.sesiones() as db:
+            datos = await operaciones_async.resumen(db, peticion.usuario.id,
+                                                    _entero(peticion.parametros, "meses", 12, MESES_MAXIMOS),
+                                                    _entero(peticion.parametros, "top", 5, TOP_MAXIMO))
+        ingresos, egresos, neto = datos["balance"]
+        return HTTPStatus.OK, {
+            "balance": {"ingresos": ingresos, "egresos": egresos, "neto": neto},
+            "top_categorias": [{"categoria": nombre, "total": total} for nombre, total in datos["top_categorias"]],
+            "meses": [{"periodo": p, "ingresos": i, "egresos": e, "neto": n} for p, i, e, n in datos["meses"]],
+        }
+
+    # ---- Enrutado ----
+
+    async def despachar(self, metodo, destino, cabeceras, cuerpo=b""):
+        """Atiende una petición ya leída: (estado, datos de la respuesta o None)."""
+        url = urlsplit(destino)
+        ruta = url.path.rstrip("/") or "/"
+        permitidos = []
+        for metodo_ruta, expresion, manejador, autenticada, accion in self._rutas:
+            coincidencia = expresion.match(ruta)
+            if coincidencia is None:
+                continue
+            if metodo_ruta != metodo:
+                permitidos.append(metodo_ruta)
+                continue
+            break
+        else:
+            if permitidos:
+                return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"Método no permitido; usa {', '.join(permitidos)}"}
+            return HTTPStatus.NOT_FOUND, {"error": f"No existe la ruta {ruta}"}
+
+        autorizacion = cabeceras.get("authorization", "")
+        token = autorizacion[len("Bearer "):].strip() if autorizacion.startswith("Bearer ") else None
+        with Sesion.usar(token) as usuario:
+            try:
+                if autenticada and usuario is None:
+                    raise ErrorHTTP(HTTPStatus.UNAUTHORIZED, "Falta una sesión válida (Authorization: Bearer <token>)")
+                try:
+                    datos = json.loads(cuerpo) if cuerpo else {}
+                except ValueError:
+                    raise ErrorHTTP(HTTPStatus.BAD_REQUEST, "El cuerpo no es JSON válido")
+                if not isinstance(datos, dict):
+                    raise ErrorHTTP(HTTPStatus.BAD_REQUEST, "El cuerpo debe ser un objeto JSON")
+                peticion = Peticion(dict(parse_qsl(url.query)), datos, usuario, coincidencia.groupdict())
+                with ESTADISTICAS_SQL.medir(accion):
+                    return await manejador(peticion)
+            except ErrorHTTP as error:
+                return error.estado, {"error": str(error)}
+            except Exception as error:
+                for tipo, estado in _ESTADOS_ERROR:
+                    if isinstance(error, tipo):
+                        return estado, {"error": str(error)}
+                registro.exception("Error al atender %s %s", metodo, ruta)
+                return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Error interno del servidor"}
+
+    # ---- HTTP ----
+
+    @staticmethod
+    def _respuesta(estado, datos, mantener):
+        cuerpo = b"" if datos is None else json.dumps(datos, default=_json, ensure_ascii=False).encode("utf-8")
+        cabeceras = [f"HTTP/1.1 {estado.value} {estado.phrase}", f"Content-Length: {len(cuerpo)}",
+                     f"Connection: {'keep-alive' if mantener else 'close'}"]
+        if datos is not None:
+            cabeceras.append("Content-Type: application/json; charset=utf-8")
+        return ("\r\n".join(cabeceras) + "\r\n\r\n").encode("latin-1") + cuerpo
+
+    async def _atender(self, lector, escritor):
+        try:
+            while True:
+                try:
+                    cabecera = await asyncio.wait_for(lector.readuntil(b"\r\n\r\n"), TIEMPO_INACTIVO)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+                except asyncio.LimitOverrunError:
+                    escritor.write(self._respuesta(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, None, False))
+                    break
+                try:
+                    linea, *lineas = cabecera.decode("latin-1").split("\r\n")
+                    metodo, destino, version = linea.split(" ")
+                    cabeceras = {}
+                    for linea_cabecera in lineas:
+                        if linea_cabecera:
+                            nombre, valor = linea_cabecera.split(":", 1)
+                            cabeceras[nombre.strip().lower()] = valor.strip()
+                    longitud = int(cabeceras.get("content-length", 0))
+                    if longitud < 0:
+                        raise ValueError("Content-Length negativo")
+                except ValueError:
+                    escritor.write(self._respuesta(HTTPStatus.BAD_REQUEST, {"error": "Petición HTTP mal formada"},
+                                                   False))
+                    break
+                if "transfer-encoding" in cabeceras:
+                    escritor.write(self._respuesta(HTTPStatus.LENGTH_REQUIRED, {"error": "Usa Content-Length"}, False))
+                    break
+                if longitud > TAMANO_MAXIMO_CUERPO:
+                    escritor.write(self._respuesta(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, None, False))
+                    break
+                cuerpo = await lector.readexactly(longitud) if longitud else b""
+
+                estado, datos = await self.despachar(metodo, destino, cabeceras, cuerpo)
+                mantener = version == "HTTP/1.1" and cabeceras.get("connection", "").lower() != "close"
+                escritor.write(self._respuesta(estado, datos, mantener))
+                await escritor.drain()
+                if not mantener:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            escritor.close()
+            with suppress(ConnectionError):
+                await escritor.wait_closed()
+
+    async def iniciar(self, host="127.0.0.1", puerto=8080):
+        """Empieza a aceptar conexiones; devuelve el puerto (útil con puerto=0)."""
+        self._servidor = await asyncio.start_server(self._atender, host, puerto)
+        return self._servidor.sockets[0].getsockname()[1]
+
+    async def cerrar(self):
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+            self._servidor = None
+
+
+async def servir(host, puerto, perfil=None, **overrides):
+    from src.model.db import crear_engine, crear_engine_async, crear_sesiones_async, leer_configuracion
+    from src.model.esquema import inicializar_base
+
+    config = leer_configuracion(perfil, **overrides)
+    engine = crear_engine(perfil, **overrides)
+    inicializar_base(engine)
+    engine.dispose()
+    engine_async = crear_engine_async(perfil, **overrides)
+    servidor = ServidorAPI(crear_sesiones_async(engine_async))
+    puerto = await servidor.iniciar(host, puerto)
+    print(f"API escuchando en http://{host}:{puerto}", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await servidor.cerrar()
+        await engine_async.dispose()
+        if config["estadisticas_json"]:
+            ESTADISTICAS_SQL.volcar(config["estadisticas_json"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor HTTP de la API de gastos personales.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--puerto", type=int, default=8080)
+    parser.add_argument("--perfil", help="Perfil de base de datos (por defecto, el configurado).")
+    parser.add_argument("--url", help="URL de la base de datos (por defecto, la configurada).")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    overrides = {"url": args.url} if args.url else {}
+    with suppress(KeyboardInterrupt):
+        asyncio.run(servir(args.host, args.puerto, args.perfil, **overrides))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,122 @@
+import contextvars
+import secrets
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+# Usuario con sesión iniciada: una copia inmutable de sus datos, no el objeto del ORM
+UsuarioSesion = namedtuple("UsuarioSesion", "id nombre correo")
+
+# Token de la sesión del contexto actual. Cada hilo y cada tarea de asyncio tiene su
+# propio valor: un proceso puede atender a varios usuarios a la vez sin mezclarlos
+_token_actual = contextvars.ContextVar("token_sesion", default=None)
+
+
+def instantanea(usuario):
+    """UsuarioSesion con los datos de un Usuario (o de cualquier objeto con id, nombre y correo)."""
+    return UsuarioSesion(usuario.id, usuario.nombre, usuario.correo)
+
+
+class AlmacenSesiones:
+    """
+    Sesiones en memoria: token -> (UsuarioSesion, caducidad). La caducidad se renueva
+    cada vez que se usa el token; las sesiones caducadas se eliminan al consultarlas
+    y, en bloque, al crear sesiones nuevas cuando la tabla ha crecido.
+    """
+    DURACION = 8 * 3600
+    PURGA_MINIMA = 1024
+
+    def __init__(self, duracion=DURACION, reloj=time.monotonic):
+        if duracion <= 0:
+            raise ValueError("La duración de la sesión debe ser mayor que cero")
+        self.duracion = duracion
+        self._reloj = reloj
+        self._sesiones = {}
+        self._lock = threading.Lock()
+        self._proxima_purga = self.PURGA_MINIMA
+
+    def crear(self, usuario):
+        """Abre una sesión para el usuario y devuelve su token."""
+        datos = usuario if isinstance(usuario, UsuarioSesion) else instantanea(usuario)
+        token = secrets.token_urlsafe(32)
+        with self._lock:
+            if len(self._sesiones) >= self._proxima_purga:
+                self._purgar()
+                self._proxima_purga = max(self.PURGA_MINIMA, 2 * len(self._sesiones))
+            self._sesiones[token] = (datos, self._reloj() + self.duracion)
+        return token
+
+    def obtener(self, token):
+        """El UsuarioSesion del token, o None si no existe o ha caducado."""
+        ahora = self._reloj()
+        with self._lock:
+            sesion = self._sesiones.get(token)
+            if sesion is None:
+                return None
+            datos, caduca = sesion
+            if caduca <= ahora:
+                del self._sesiones[token]
+                return None
+            self._sesiones[token] = (datos, ahora + self.duracion)
+            return datos
+
+    def cerrar(self, token):
+        with self._lock:
+            self._sesiones.pop(token, None)
+
+    def purgar(self):
+        """Elimina las sesiones caducadas; devuelve cuántas."""
+        with self._lock:
+            return self._purgar()
+
+    def _purgar(self):
+        ahora = self._reloj()
+        caducadas = [token for token, (_, caduca) in self._sesiones.items() if caduca <= ahora]
+        for token in caducadas:
+            del self._sesiones[token]
+        return len(caducadas)
+
+    def __len__(self):
+        return len(self._sesiones)
+
 
 class Sesion:
-    _usuario_actual = None
+    """
+    Sesión del contexto actual (hilo o tarea de asyncio). La consola y la interfaz Kivy
+    usan iniciar_sesion/obtener_usuario_actual en su hilo; un servidor guarda el token
+    que devuelve iniciar_sesion y atiende cada petición dentro de `with Sesion.usar(token)`.
+    """
+    almacen = AlmacenSesiones()
 
     @classmethod
     def iniciar_sesion(cls, usuario):
-        cls._usuario_actual = usuario
+        token = cls.almacen.crear(usuario)
+        _token_actual.set(token)
+        return token
 
     @classmethod
     def cerrar_sesion(cls):
-        cls._usuario_actual = None
+        token = _token_actual.get()
+        if token is not None:
+            cls.almacen.cerrar(token)
+            _token_actual.set(None)
 
     @classmethod
     def obtener_usuario_actual(cls):
-        return cls._usuario_actual
+        token = _token_actual.get()
+        return cls.almacen.obtener(token) if token is not None else None
+
+    @classmethod
+    def token_actual(cls):
+        return _token_actual.get()
+
+    @classmethod
+    @contextmanager
+    def usar(cls, token):
+        """Activa la sesión del token en el bloque y restaura la anterior al salir."""
+        marca = _token_actual.set(token)
+        try:
+            yield cls.obtener_usuario_actual()
+        finally:
+            _token_actual.reset(marca)
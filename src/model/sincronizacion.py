@@ -0,0 +1,324 @@
+import threading
+import time
+from collections import namedtuple
+
+from sqlalchemy import bindparam, delete, select, update
+
+from src.model.archivo import ArchivoFrio
+from src.model.cache_reportes import CacheReportes
+from src.model.catalogo_categorias import CatalogoCategorias
+from src.model.categoria import Categoria
+from src.model.errors import UsuarioNoEncontradoError
+from src.model.esquema import inicializar_base
+from src.model.resumen_mensual import acumular
+from src.model.transaccion import Transaccion
+from src.model.transaccion_eliminada import TransaccionEliminada, registrar_bajas
+from src.model.usuario import Usuario
+
+# Sincronización de un almacén local (SQLite) con el servidor. Cada transacción se
+# identifica por su uid en las dos copias; si difieren, gana el estado con la marca de
+# tiempo más reciente: `modificada` si está viva o `eliminada` si se borró (registro en
+# transacciones_eliminadas). Con marcas iguales gana el servidor. Las transacciones que
+# una copia tiene en su archivo (archivo.py) no se sincronizan: no se envían de vuelta
+# a la tabla ni se traen del archivo.
+
+TAMANO_LOTE = 500
+
+# Estado de una transacción en una copia: viva o eliminada, y desde cuándo; o archivada
+Estado = namedtuple("Estado", "eliminada marca archivada", defaults=(False,))
+ARCHIVADA = Estado(False, None, True)
+
+
+class ResumenSincronizacion:
+    def __init__(self, correo):
+        self.correo = correo
+        self.enviadas = 0  # altas y cambios copiados al servidor
+        self.recibidas = 0  # altas y cambios copiados al almacén local
+        self.eliminadas_en_servidor = 0
+        self.eliminadas_en_local = 0
+        self.segundos = 0.0
+
+    def __repr__(self):
+        return (f"<ResumenSincronizacion(correo={self.correo}, enviadas={self.enviadas}, recibidas={self.recibidas}, "
+                f"eliminadas_en_servidor={self.eliminadas_en_servidor}, eliminadas_en_local={self.eliminadas_en_local})>")
+
+
+def _lotes(elementos, tamano=TAMANO_LOTE):
+    elementos = list(elementos)
+    for i in range(0, len(elementos), tamano):
+        yield elementos[i:i + tamano]
+
+
+def _usuario_id(conexion, correo):
+    return conexion.scalar(select(Usuario.id).where(Usuario.correo == correo))
+
+
+def _copiar_usuario(origen, destino, correo):
+    """Copia el usuario (con el hash de su contraseña) y devuelve su id en el destino."""
+    tabla = Usuario.__table__
+    fila = origen.execute(select(tabla.c.nombre, tabla.c.correo, tabla.c.contraseña)
+                          .where(tabla.c.correo == correo)).mappings().one()
+    return destino.execute(tabla.insert().values(**fila)).inserted_primary_key[0]
+
+
+def estados(conexion, usuario_id, desde=None):
+    """
+    {uid: Estado} de las transacciones del usuario (con fecha desde `desde`), de las que
+    tiene en el archivo del engine, si hay, y de sus bajas.
+    """
+    tabla = Transaccion.__table__
+    consulta = select(tabla.c.uid, tabla.c.modificada).where(tabla.c.usuario_id == usuario_id)
+    if desde is not None:
+        consulta = consulta.where(tabla.c.fecha >= desde)
+    resultado = {uid: Estado(False, modificada) for uid, modificada in conexion.execute(consulta)}
+    archivo = ArchivoFrio.del_engine(conexion.engine)
+    if archivo is not None:
+        for uid in archivo.uids(usuario_id, desde):
+            resultado.setdefault(uid, ARCHIVADA)
+    bajas = TransaccionEliminada.__table__
+    for uid, eliminada in conexion.execute(select(bajas.c.uid, bajas.c.eliminada).where(bajas.c.usuario_id == usuario_id)):
+        resultado.setdefault(uid, Estado(True, eliminada))
+    return resultado
+
+
+def planificar(locales, remotos):
+    """(enviar, recibir): {uid: Estado ganador} que hay que copiar al servidor y al almacén local."""
+    enviar, recibir = {}, {}
+    for uid in locales.keys() | remotos.keys():
+        local, remoto = locales.get(uid), remotos.get(uid)
+        if local == remoto or ARCHIVADA in (local, remoto):
+            continue
+        if remoto is None or (local is not None and local.marca > remoto.marca):
+            enviar[uid] = local
+        else:
+            recibir[uid] = remoto
+    return enviar, recibir
+
+
+def leer_cambios(conexion, ganadores):
+    """(filas vivas con el nombre y el tipo de su categoría, bajas [(uid, eliminada)]) de los uid ganadores."""
+    tabla = Transaccion.__table__
+    filas = []
+    for lote in _lotes(uid for uid, estado in ganadores.items() if not estado.eliminada):
+        filas.extend(conexion.execute(
+            select(tabla.c.uid, tabla.c.cantidad, tabla.c.fecha, tabla.c.tipo, tabla.c.modificada,
+                   Categoria.nombre.label("categoria"), Categoria.tipo.label("tipo_categoria"),
+                   Categoria.descripcion.label("descripcion_categoria"))
+            .join(Categoria, tabla.c.categoria_id == Categoria.id)
+            .where(tabla.c.uid.in_(lote))
+        ).mappings().all())
+    bajas = [(uid, estado.marca) for uid, estado in ganadores.items() if estado.eliminada]
+    return filas, bajas
+
+
+def _categorias(conexion, filas):
+    """{nombre: id} en el destino de las categorías de las filas; crea las que falten."""
+    tabla = Categoria.__table__
+    nombres = {fila["categoria"] for fila in filas}
+    ids = dict(conexion.execute(select(tabla.c.nombre, tabla.c.id).where(tabla.c.nombre.in_(nombres))).all())
+    for fila in filas:
+        if fila["categoria"] not in ids:
+            ids[fila["categoria"]] = conexion.execute(tabla.insert().values(
+                nombre=fila["categoria"], tipo=fila["tipo_categoria"], descripcion=fila["descripcion_categoria"]
+            )).inserted_primary_key[0]
+            CatalogoCategorias.invalidar(conexion.engine)
+    return ids
+
+
+def _vigentes(conexion, uids, esperados):
+    """
+    Filas actuales del destino para esos uid y los uid que se pueden sobrescribir: los que
+    siguen como en la foto `esperados` (si cambiaron entretanto, se dejan para la siguiente vez).
+    """
+    tabla = Transaccion.__table__
+    actuales = {fila["uid"]: fila for fila in conexion.execute(
+        select(tabla.c.id, tabla.c.uid, tabla.c.cantidad, tabla.c.fecha, tabla.c.tipo, tabla.c.categoria_id,
+               tabla.c.usuario_id, tabla.c.modificada).where(tabla.c.uid.in_(uids))
+    ).mappings()}
+    libres = set()
+    for uid in uids:
+        esperado, actual = esperados.get(uid), actuales.get(uid)
+        if esperado is None or esperado.eliminada:
+            sin_cambios = actual is None
+        else:
+            sin_cambios = actual is not None and actual["modificada"] == esperado.marca
+        if sin_cambios:
+            libres.add(uid)
+    return actuales, libres
+
+
+def escribir_cambios(conexion, usuario_id, filas, bajas, esperados):
+    """
+    Aplica en el destino las filas y bajas leídas con leer_cambios, con el resumen mensual
+    ajustado en la misma transacción. Devuelve (filas escritas, bajas aplicadas).
+    """
+    tabla = Transaccion.__table__
+    escritas = 0
+    categorias = _categorias(conexion, filas) if filas else {}
+    for lote in _lotes(filas):
+        actuales, libres = _vigentes(conexion, [fila["uid"] for fila in lote], esperados)
+        nuevas = [{
+            "uid": fila["uid"], "cantidad": fila["cantidad"], "fecha": fila["fecha"], "tipo": fila["tipo"],
+            "modificada": fila["modificada"], "categoria_id": categorias[fila["categoria"]], "usuario_id": usuario_id,
+        } for fila in lote if fila["uid"] in libres]
+        reemplazadas = [actuales[fila["uid"]] for fila in nuevas if fila["uid"] in actuales]
+        if reemplazadas:
+            acumular(conexion, reemplazadas, signo=-1)
+            conexion.execute(
+                update(tabla).where(tabla.c.uid == bindparam("b_uid")).values(
+                    cantidad=bindparam("cantidad"), fecha=bindparam("fecha"), tipo=bindparam("tipo"),
+                    modificada=bindparam("modificada"), categoria_id=bindparam("categoria_id")),
+                [{"b_uid": fila["uid"], "cantidad": fila["cantidad"], "fecha": fila["fecha"], "tipo": fila["tipo"],
+                  "modificada": fila["modificada"], "categoria_id": fila["categoria_id"]}
+                 for fila in nuevas if fila["uid"] in actuales]
+            )
+        altas = [fila for fila in nuevas if fila["uid"] not in actuales]
+        if altas:
+            conexion.execute(tabla.insert(), altas)
+        acumular(conexion, nuevas)
+        if nuevas:
+            bajas_tabla = TransaccionEliminada.__table__
+            conexion.execute(delete(bajas_tabla).where(bajas_tabla.c.uid.in_([fila["uid"] for fila in nuevas])))
+        escritas += len(nuevas)
+
+    aplicadas = 0
+    for lote in _lotes(bajas):
+        actuales, libres = _vigentes(conexion, [uid for uid, _ in lote], esperados)
+        lote = [(uid, marca) for uid, marca in lote if uid in libres or uid not in actuales]
+        eliminadas = [actuales[uid] for uid, _ in lote if uid in actuales]
+        if eliminadas:
+            acumular(conexion, eliminadas, signo=-1)
+            conexion.execute(delete(tabla).where(tabla.c.uid.in_([fila["uid"] for fila in eliminadas])))
+        registrar_bajas(conexion, [(uid, usuario_id, marca) for uid, marca in lote])
+        aplicadas += len(eliminadas)
+    return escritas, aplicadas
+
+
+class Sincronizador:
+    """
+    Sincroniza las transacciones de los usuarios del almacén local con el servidor
+    (dos engines cualesquiera: en las pruebas, dos archivos SQLite). Con `desde`, solo
+    las transacciones con fecha a partir de ese día (p. ej. si el resto está archivado).
+    """
+
+    def __init__(self, local, remoto, desde=None):
+        self.local = local
+        self.remoto = remoto
+        self.desde = desde
+        self.servidor_preparado = False
+
+    def preparar_servidor(self):
+        """Crea o migra el esquema del servidor si no está al día (una vez por Sincronizador)."""
+        if not self.servidor_preparado:
+            inicializar_base(self.remoto)
+            self.servidor_preparado = True
+
+    def sincronizar(self, correo):
+        """
+        Una pasada para un usuario: lee el estado local, envía y recibe los cambios en una
+        transacción del servidor y después los aplica en local en una transacción corta.
+        """
+        resumen = ResumenSincronizacion(correo)
+        inicio = time.perf_counter()
+        with self.local.connect() as local:
+            usuario_local = _usuario_id(local, correo)
+            if usuario_local is None:
+                raise UsuarioNoEncontradoError(f"No existe el usuario {correo}")
+            locales = estados(local, usuario_local, self.desde)
+
+        with self.remoto.begin() as remoto:
+            usuario_remoto = _usuario_id(remoto, correo)
+            if usuario_remoto is None:
+                with self.local.connect() as local:
+                    usuario_remoto = _copiar_usuario(local, remoto, correo)
+            remotos = estados(remoto, usuario_remoto, self.desde)
+            enviar, recibir = planificar(locales, remotos)
+            with self.local.connect() as local:
+                filas, bajas = leer_cambios(local, enviar)
+            resumen.enviadas, resumen.eliminadas_en_servidor = escribir_cambios(
+                remoto, usuario_remoto, filas, bajas, remotos)
+            filas, bajas = leer_cambios(remoto, recibir)
+        # Escrituras con Core: los reportes guardados se invalidan después de confirmarlas
+        if enviar:
+            CacheReportes.invalidar(self.remoto, usuario_remoto)
+
+        with self.local.begin() as local:
+            resumen.recibidas, resumen.eliminadas_en_local = escribir_cambios(
+                local, usuario_local, filas, bajas, locales)
+        if recibir:
+            CacheReportes.invalidar(self.local, usuario_local)
+        resumen.segundos = time.perf_counter() - inicio
+        return resumen
+
+    def sincronizar_todo(self):
+        """Sincroniza todos los usuarios del almacén local. Devuelve [ResumenSincronizacion]."""
+        with self.local.connect() as local:
+            correos = local.scalars(select(Usuario.correo).order_by(Usuario.id)).all()
+        return [self.sincronizar(correo) for correo in correos]
+
+    def traer_usuario(self, correo):
+        """Copia al almacén local un usuario que solo existe en el servidor. Devuelve False si no existe."""
+        with self.remoto.connect() as remoto, self.local.begin() as local:
+            if _usuario_id(local, correo) is not None:
+                return True
+            if _usuario_id(remoto, correo) is None:
+                return False
+            _copiar_usuario(remoto, local, correo)
+        self.sincronizar(correo)
+        return True
+
+
+class SincronizacionPeriodica:
+    """
+    Hilo que sincroniza al arrancar, cada `intervalo` segundos y cuando se llama a ahora().
+    Si el servidor no responde, el error se guarda en `ultimo_error` y se reintenta después.
+    """
+
+    def __init__(self, sincronizador, intervalo=60, al_fallar=None):
+        self.sincronizador = sincronizador
+        self.intervalo = intervalo
+        self.al_fallar = al_fallar
+        self.ultimos = []
+        self.ultimo_error = None
+        self._despertar = threading.Event()
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        self._hilo = threading.Thread(target=self._bucle, name="sincronizacion", daemon=True)
+        self._hilo.start()
+
+    def ahora(self):
+        self._despertar.set()
+
+    def detener(self, esperar=True):
+        self._detener.set()
+        self._despertar.set()
+        if esperar and self._hilo is not None:
+            self._hilo.join()
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            try:
+                self.sincronizador.preparar_servidor()
+                self.ultimos = self.sincronizador.sincronizar_todo()
+                self.ultimo_error = None
+            except Exception as error:
+                self.ultimo_error = error
+                if self.al_fallar is not None:
+                    self.al_fallar(error)
+            self._despertar.wait(self.intervalo)
+            self._despertar.clear()
+
+
+def desde_configuracion(intervalo=60):
+    """
+    Sincronización periódica del almacén local de la configuración (opción `local`) con el
+    servidor (opción `url`), o None si no hay almacén local. Inicializa el almacén local si hace falta.
+    """
+    from src.model.db import crear_engine, engine, leer_configuracion
+
+    if not leer_configuracion()["local"]:
+        return None
+    inicializar_base(engine)
+    return SincronizacionPeriodica(Sincronizador(engine, crear_engine()), intervalo)
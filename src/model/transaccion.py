@@ -1,10 +1,22 @@
-from datetime import datetime
-from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Enum
+import uuid
+from datetime import datetime, timezone
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship, validates, Session
 import enum
 
 from src.model.base import Base
 from src.model.categoria import Categoria
+from src.model.catalogo_categorias import CatalogoCategorias
+from src.model.dinero import Centimos, redondear
+
+def ahora_utc():
+    """Fecha y hora actual en UTC, sin zona: la referencia común de clientes y servidor."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def nuevo_uid():
+    return uuid.uuid4().hex
+
 
 class TipoTransaccionEnum(enum.Enum):
     INGRESO = "Ingreso"
@@ -14,17 +26,20 @@ class Transaccion(Base):
     __tablename__ = "transacciones"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    cantidad = Column(Float, nullable=False)
+    cantidad = Column(Centimos, nullable=False)  # céntimos en la base de datos, Decimal en Python
     fecha = Column(DateTime, nullable=False, default=datetime.now)
     tipo = Column(Enum(TipoTransaccionEnum), nullable=False)
     categoria_id = Column(Integer, ForeignKey("categorias.id"), nullable=False)
     usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
+    # Identidad común a todas las copias de la base (sincronizacion.py) y última modificación
+    uid = Column(String(32), nullable=False, unique=True, default=nuevo_uid)
+    modificada = Column(DateTime, nullable=False, default=ahora_utc, onupdate=ahora_utc)
 
     categoria = relationship("Categoria")
     usuario = relationship("Usuario")
 
     def __init__(self, cantidad, fecha, tipo, categoria, usuario, session: Session, id=None):
-        self._validar_datos_iniciales(cantidad, tipo, categoria, fecha, usuario, session)
+        self.validar_datos(cantidad, tipo, categoria, fecha, usuario, session)
         self.id = id
         self.cantidad = cantidad
         self.fecha = fecha
@@ -40,23 +55,30 @@ class Transaccion(Base):
         else:
             self.tipo = tipo
 
-        self.categoria = categoria
-        self.usuario = usuario
+        if isinstance(categoria, Categoria):
+            self.categoria = categoria
+        else:
+            # Nombre de categoría: el id sale del catálogo, sin consultar la base de datos
+            self.categoria_id = CatalogoCategorias.obtener_id(session, self.tipo, categoria)
+        if isinstance(usuario, int):
+            # Solo el id: no hace falta cargar el usuario para insertar la transacción
+            self.usuario_id = usuario
+        else:
+            self.usuario = usuario
 
-    def _validar_datos_iniciales(self, cantidad, tipo, categoria, fecha, usuario, session: Session):
+    @staticmethod
+    def validar_datos(cantidad, tipo, categoria, fecha, usuario, session: Session):
+        # No crea ningún objeto ORM: también la usa la importación masiva
         tipo_str = tipo.value if isinstance(tipo, TipoTransaccionEnum) else tipo.capitalize()
 
-        if cantidad < 0:
+        if redondear(cantidad) < 0:
             raise ValueError("El monto de la transacción no puede ser negativo")
         if tipo_str not in ["Ingreso", "Egreso"]:
             raise ValueError("Tipo debe ser 'Ingreso' o 'Egreso'")
 
-        categorias_en_db = session.query(Categoria).filter(Categoria.tipo == tipo_str).all()
-        categorias_validas = [cat.nombre for cat in categorias_en_db]
-
         nombre_categoria = categoria.nombre if hasattr(categoria, "nombre") else categoria
 
-        if nombre_categoria not in categorias_validas:
+        if CatalogoCategorias.obtener_id(session, tipo_str, nombre_categoria) is None:
             raise ValueError(f"Categoría '{nombre_categoria}' no válida para tipo '{tipo_str}'")
 
         if fecha > datetime.now():
@@ -66,6 +88,7 @@ class Transaccion(Base):
 
     @validates("cantidad")
     def validar_cantidad(self, key, value):
+        value = redondear(value)
         if value < 0:
             raise ValueError("La cantidad no puede ser negativa")
         return value
@@ -128,3 +151,16 @@ class Transaccion(Base):
             self.modificar_tipo(nuevo_tipo)
         if nueva_categoria is not None:
             self.modificar_categoria(nueva_categoria)
+
+
+# Índices de las consultas frecuentes: listado paginado por (fecha, id) descendente
+# y totales por categoría en un rango de fechas, siempre filtrando por usuario
+Index("ix_transacciones_usuario_fecha_id",
+      Transaccion.usuario_id, Transaccion.fecha.desc(), Transaccion.id.desc())
+Index("ix_transacciones_usuario_categoria_fecha",
+      Transaccion.usuario_id, Transaccion.categoria_id, Transaccion.fecha)
+
+# El resumen mensual y el registro de bajas se mantienen con eventos sobre Transaccion;
+# se importan aquí para que estén activos siempre que se use el modelo
+import src.model.resumen_mensual  # noqa: E402,F401
+import src.model.transaccion_eliminada  # noqa: E402,F401
@@ -0,0 +1,45 @@
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, delete, event, inspect, select
+
+from src.model.base import Base
+from src.model.transaccion import Transaccion, ahora_utc
+
+
+class TransaccionEliminada(Base):
+    """
+    Baja de una transacción: su uid, el usuario y cuándo se eliminó (UTC). La sincronización
+    la usa para distinguir una transacción borrada de una que la otra copia aún no conoce.
+    """
+    __tablename__ = "transacciones_eliminadas"
+
+    uid = Column(String(32), primary_key=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False, index=True)
+    eliminada = Column(DateTime, nullable=False, default=ahora_utc)
+
+    def __repr__(self):
+        return f"<TransaccionEliminada(uid={self.uid}, usuario_id={self.usuario_id}, eliminada={self.eliminada})>"
+
+
+def registrar_bajas(conexion, bajas):
+    """Anota las bajas [(uid, usuario_id, eliminada)], sustituyendo las anteriores del mismo uid."""
+    if not bajas:
+        return
+    tabla = TransaccionEliminada.__table__
+    conexion.execute(delete(tabla).where(tabla.c.uid.in_([uid for uid, _, _ in bajas])))
+    conexion.execute(tabla.insert(), [{"uid": uid, "usuario_id": usuario_id, "eliminada": eliminada}
+                                      for uid, usuario_id, eliminada in bajas])
+
+
+def _antes_de_eliminar(mapper, conexion, target):
+    estado = inspect(target)
+    if estado.unloaded.intersection(("uid", "usuario_id")):
+        tabla = Transaccion.__table__
+        fila = conexion.execute(select(tabla.c.uid, tabla.c.usuario_id).where(tabla.c.id == estado.identity[0])).first()
+        if fila is None:
+            return
+        uid, usuario_id = fila
+    else:
+        uid, usuario_id = target.uid, target.usuario_id
+    registrar_bajas(conexion, [(uid, usuario_id, ahora_utc())])
+
+
+event.listen(Transaccion, "before_delete", _antes_de_eliminar)
@@ -1,3 +1,4 @@
+import os
 import re
 from sqlalchemy import Column, Integer, String
 from sqlalchemy.orm import validates
@@ -15,6 +16,9 @@ from src.model.errors import (
 class Usuario(Base):
     __tablename__ = "usuarios"
 
+    # Factor de trabajo de bcrypt; los hashes con otro coste se regeneran al iniciar sesión
+    COSTE_BCRYPT = int(os.environ.get("GASTOS_BCRYPT_COSTE", "12"))
+
     id = Column(Integer, primary_key=True, autoincrement=True)
     nombre = Column(String(100), nullable=False)
     correo = Column(String(100), unique=True, nullable=False)
@@ -46,7 +50,7 @@ class Usuario(Base):
 
     def _hash_password(self, contraseña: str) -> str:
         # Hashear la contraseña usando bcrypt y devolver en formato string utf-8
-        salt = bcrypt.gensalt()
+        salt = bcrypt.gensalt(rounds=self.COSTE_BCRYPT)
         hashed = bcrypt.hashpw(contraseña.encode("utf-8"), salt)
         return hashed.decode("utf-8")
 
@@ -54,9 +58,18 @@ class Usuario(Base):
         # Verifica si la contraseña dada coincide con el hash guardado
         return bcrypt.checkpw(contraseña.encode("utf-8"), self.contraseña.encode("utf-8"))
 
+    def necesita_rehash(self) -> bool:
+        # Formato del hash: $2b$<coste>$<salt+hash>
+        try:
+            return int(self.contraseña.split("$")[2]) != self.COSTE_BCRYPT
+        except (IndexError, ValueError):
+            return True
+
     def iniciar_sesion(self, correo: str, contraseña: str) -> bool:
         if self.correo != correo or not self.verificar_contraseña(contraseña):
             raise ContrasenaIncorrectaError("Correo o contraseña incorrectos")
+        if self.necesita_rehash():
+            self.contraseña = self._hash_password(contraseña)
         return True
 
     def cambiar_contraseña(self, nueva_contraseña: str):
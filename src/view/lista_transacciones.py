@@ -0,0 +1,30 @@
+from kivy.uix.recycleview import RecycleView
+from kivy.uix.recycleboxlayout import RecycleBoxLayout
+
+ALTO_FILA = 30
+
+
+def fila_a_dato(t):
+    categoria_nombre = t.categoria_nombre or "Sin categoría"
+    detalle = (f"ID: {t.id} | {t.tipo} | {t.cantidad} | "
+               f"{t.fecha.strftime('%Y-%m-%d %H:%M')} | Categoría: {categoria_nombre}")
+    return {"text": detalle}
+
+
+class ListaTransacciones(RecycleView):
+    """
+    Lista virtualizada: solo crea los Label de las filas visibles y los reutiliza
+    al desplazarse. Los datos son diccionarios {"text": ...} en self.data.
+    """
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        contenedor = RecycleBoxLayout(
+            orientation="vertical",
+            default_size=(None, ALTO_FILA),
+            default_size_hint=(1, None),
+            size_hint_y=None
+        )
+        contenedor.bind(minimum_height=contenedor.setter("height"))
+        self.add_widget(contenedor)
+        # viewclass se asigna después de añadir el layout: se guarda en el layout manager
+        self.viewclass = "Label"
@@ -1,23 +1,30 @@
 from kivy.app import App
 from kivy.uix.button import Button
 from kivy.uix.label import Label
-from kivy.uix.textinput import TextInput
 from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.popup import Popup
-from kivy.uix.scrollview import ScrollView
-from kivy.uix.spinner import Spinner
-from datetime import datetime
-
-from src.model.usuario import Usuario
-from src.model.categoria import Categoria
-from src.model.transaccion import Transaccion
-from src.model.errors import ContrasenaIncorrectaError, CorreoInvalidoError
+
+from src.model.errors import ContrasenaIncorrectaError, CorreoYaRegistradoError
+from src.model.estadisticas_sql import volcar_configurado
 from src.model.sesion import Sesion
 
-from src.model.db import SessionLocal
+from src.view.segundo_plano import EJECUTOR_BD
+
+TAMANO_PAGINA_LISTA = 200
+
+# Para el primer frame solo se importan los widgets del menú. Los de los formularios
+# (TextInput, Popup, Spinner, la lista) se importan al abrirlos, y la capa de datos
+# (SQLAlchemy, bcrypt, NumPy) en el hilo del ejecutor: on_start la precarga en segundo plano
+
+
+def _servicios():
+    from src.model import servicios
+    return servicios
 
 
 class MenuApp(App):
+    # Sincronización con el servidor cuando se trabaja sobre un almacén local (opción `local`)
+    sincronizacion = None
+
     def build(self):
         self.root = BoxLayout(orientation='vertical', padding=20, spacing=10)
 
@@ -45,10 +52,14 @@ class MenuApp(App):
         self.boton_visualizar_transacciones.bind(on_press=self.visualizar_transacciones)
         self.root.add_widget(self.boton_visualizar_transacciones)
 
-        self.boton_eliminar_transaccion = Button(text="Eliminar Transacción", size_hint_y=None, height=50)
+        self.boton_eliminar_transaccion = Button(text="Eliminar Transacciones", size_hint_y=None, height=50)
         self.boton_eliminar_transaccion.bind(on_press=self.eliminar_transaccion)
         self.root.add_widget(self.boton_eliminar_transaccion)
 
+        self.boton_ver_resumen = Button(text="Ver Resumen", size_hint_y=None, height=50)
+        self.boton_ver_resumen.bind(on_press=self.ver_resumen)
+        self.root.add_widget(self.boton_ver_resumen)
+
         self.boton_cerrar_sesion = Button(text="Cerrar Sesión", size_hint_y=None, height=50)
         self.boton_cerrar_sesion.bind(on_press=self.cerrar_sesion)
         self.root.add_widget(self.boton_cerrar_sesion)
@@ -60,11 +71,67 @@ class MenuApp(App):
 
         return self.root
 
+    def on_start(self):
+        def preparar(db):
+            from src.model import sincronizacion
+            _servicios().preparar_base()
+            return sincronizacion.desde_configuracion()
+
+        def iniciar_sincronizacion(periodica):
+            self.sincronizacion = periodica
+            if periodica is not None:
+                periodica.iniciar()
+
+        EJECUTOR_BD.enviar(preparar, iniciar_sincronizacion)
+
+    def on_stop(self):
+        # Las consultas pendientes ya no tienen a quién entregar el resultado
+        EJECUTOR_BD.cerrar(esperar=False)
+        if self.sincronizacion is not None:
+            self.sincronizacion.detener(esperar=False)
+        volcar_configurado()
+
+    def sincronizar_pronto(self):
+        # Tras un cambio local se adelanta el envío al servidor, sin esperar al siguiente intervalo
+        if self.sincronizacion is not None:
+            self.sincronizacion.ahora()
+
     def actualizar_usuario_label(self):
         usuario = Sesion.obtener_usuario_actual()
         self.usuario_label.text = f"Usuario en sesión: {usuario.nombre}" if usuario else "Usuario en sesión: Ninguno"
 
+    def ejecutar(self, funcion, al_terminar, boton=None, popup=None, al_fallar=None, accion=None):
+        """
+        Ejecuta funcion(db) en el ejecutor de datos. Mientras tanto el botón queda
+        desactivado con el texto "Procesando..."; cerrar el popup cancela la tarea.
+        Sus sentencias SQL cuentan para `accion` en las estadísticas (estadisticas_sql.py).
+        """
+        texto = boton.text if boton is not None else None
+        if boton is not None:
+            boton.disabled = True
+            boton.text = "Procesando..."
+
+        def restaurar():
+            if boton is not None:
+                boton.disabled = False
+                boton.text = texto
+
+        def terminar(resultado):
+            restaurar()
+            al_terminar(resultado)
+
+        def fallar(error):
+            restaurar()
+            (al_fallar or self.mostrar_error)(error)
+
+        tarea = EJECUTOR_BD.enviar(funcion, terminar, fallar, accion=accion)
+        if popup is not None:
+            popup.bind(on_dismiss=lambda *_: tarea.cancelar())
+        return tarea
+
     def crear_usuario(self, instance):
+        from kivy.uix.popup import Popup
+        from kivy.uix.textinput import TextInput
         layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
         nombre_input = TextInput()
         correo_input = TextInput()
@@ -78,31 +145,28 @@ class MenuApp(App):
         layout.add_widget(contrasena_input)
 
         def on_submit(_):
-            db = SessionLocal()
-            try:
-                # Validar que correo no exista
-                existe = db.query(Usuario).filter(Usuario.correo == correo_input.text).first()
-                if existe:
-                    raise CorreoInvalidoError("El correo ya está registrado.")
-                nuevo_usuario = Usuario(
-                    nombre=nombre_input.text,
-                    correo=correo_input.text,
-                    contraseña=contrasena_input.text
-                )
-                db.add(nuevo_usuario)
-                db.commit()
-                db.refresh(nuevo_usuario)
-
-                Sesion.iniciar_sesion(nuevo_usuario)
-                popup.dismiss()
-                self.actualizar_usuario_label()
-                self.mostrar_popup("Usuario creado exitosamente.")
-            except CorreoInvalidoError as e:
-                self.mostrar_popup(str(e))
-            except Exception as e:
-                self.mostrar_popup(f"Error: {str(e)}")
-            finally:
-                db.close()
+            nombre, correo, contrasena = nombre_input.text, correo_input.text, contrasena_input.text
+            # El hash de bcrypt y el alta se hacen en el ejecutor de datos, fuera del hilo de la interfaz
+            self.ejecutar(
+                lambda db: _servicios().crear_usuario(nombre, correo, contrasena, session=db),
+                usuario_creado,
+                boton=submit_button,
+                popup=popup,
+                al_fallar=mostrar_error,
+                accion="crear_usuario"
+            )
+
+        def usuario_creado(nuevo_usuario):
+            Sesion.iniciar_sesion(nuevo_usuario)
+            popup.dismiss()
+            self.actualizar_usuario_label()
+            self.mostrar_popup("Usuario creado exitosamente.")
+
+        def mostrar_error(error):
+            if isinstance(error, CorreoYaRegistradoError):
+                self.mostrar_popup(str(error))
+            else:
+                self.mostrar_error(error)
 
         submit_button = Button(text="Crear Usuario", size_hint_y=None, height=50)
         submit_button.bind(on_press=on_submit)
@@ -112,6 +176,8 @@ class MenuApp(App):
         popup.open()
 
     def iniciar_sesion(self, instance):
+        from kivy.uix.popup import Popup
+        from kivy.uix.textinput import TextInput
         layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
         correo_input = TextInput()
         contrasena_input = TextInput(password=True)
@@ -122,21 +188,39 @@ class MenuApp(App):
         layout.add_widget(contrasena_input)
 
         def on_submit(_):
-            db = SessionLocal()
-            try:
-                usuario = db.query(Usuario).filter(Usuario.correo == correo_input.text).first()
-                if not usuario or usuario.contraseña != contrasena_input.text:
-                    raise ContrasenaIncorrectaError()
-                Sesion.iniciar_sesion(usuario)
-                popup.dismiss()
-                self.actualizar_usuario_label()
-                self.mostrar_popup("Inicio de sesión exitoso.")
-            except ContrasenaIncorrectaError:
+            correo, contrasena = correo_input.text, contrasena_input.text
+
+            def iniciar(db):
+                # Verificación con bcrypt y, si cambió el coste, nuevo hash, en el ejecutor de datos
+                try:
+                    return _servicios().iniciar_sesion(correo, contrasena, session=db)
+                except ContrasenaIncorrectaError:
+                    # Con almacén local, el usuario puede existir solo en el servidor todavía
+                    if self.sincronizacion is None or not self.sincronizacion.sincronizador.traer_usuario(correo):
+                        raise
+                    db.rollback()
+                    return _servicios().iniciar_sesion(correo, contrasena, session=db)
+
+            self.ejecutar(
+                iniciar,
+                sesion_iniciada,
+                boton=submit_button,
+                popup=popup,
+                al_fallar=sesion_fallida,
+                accion="iniciar_sesion"
+            )
+
+        def sesion_iniciada(usuario):
+            Sesion.iniciar_sesion(usuario)
+            popup.dismiss()
+            self.actualizar_usuario_label()
+            self.mostrar_popup("Inicio de sesión exitoso.")
+
+        def sesion_fallida(error):
+            if isinstance(error, ContrasenaIncorrectaError):
                 self.mostrar_popup("Correo o contraseña incorrectos.")
-            except Exception as e:
-                self.mostrar_popup(f"Error: {str(e)}")
-            finally:
-                db.close()
+            else:
+                self.mostrar_error(error)
 
         submit_button = Button(text="Iniciar Sesión", size_hint_y=None, height=50)
         submit_button.bind(on_press=on_submit)
@@ -146,6 +230,10 @@ class MenuApp(App):
         popup.open()
 
     def registrar_transaccion(self, instance):
+        from kivy.uix.popup import Popup
+        from kivy.uix.spinner import Spinner
+        from kivy.uix.textinput import TextInput
+        from src.model.dinero import redondear
         usuario = Sesion.obtener_usuario_actual()
         if not usuario:
             self.mostrar_popup("Debes iniciar sesión para registrar una transacción.")
@@ -156,22 +244,16 @@ class MenuApp(App):
         tipo_spinner = Spinner(text="Ingreso", values=["Ingreso", "Egreso"])
         categoria_spinner = Spinner(text="", values=[])
 
-        def actualizar_categorias(tipo):
-            db = SessionLocal()
-            try:
-                categorias_validas = db.query(Categoria).filter(Categoria.tipo == tipo).all()
-                nombres = [c.nombre for c in categorias_validas]
-                categoria_spinner.values = nombres
-                if nombres:
-                    categoria_spinner.text = nombres[0]
-                else:
-                    categoria_spinner.text = ""
-            finally:
-                db.close()
+        def mostrar_categorias(nombres):
+            categoria_spinner.values = nombres
+            categoria_spinner.text = nombres[0] if nombres else ""
 
-        # Inicializar categorías al abrir el popup
-        actualizar_categorias(tipo_spinner.text)
-        tipo_spinner.bind(text=lambda instance, value: actualizar_categorias(value))
+        def actualizar_categorias(tipo):
+            # Solo la primera apertura consulta la base de datos; después responde el catálogo
+            categoria_spinner.text = "Cargando..."
+            categoria_spinner.values = []
+            self.ejecutar(lambda db: _servicios().categorias(tipo, session=db), mostrar_categorias, popup=popup,
+                          accion="categorias")
 
         layout.add_widget(Label(text="Cantidad:"))
         layout.add_widget(cantidad_input)
@@ -181,41 +263,29 @@ class MenuApp(App):
         layout.add_widget(categoria_spinner)
 
         def on_submit(_):
-            db = SessionLocal()
             try:
-                cantidad = float(cantidad_input.text)
-                tipo = tipo_spinner.text
-                nombre_categoria = categoria_spinner.text
-                if not nombre_categoria:
-                    self.mostrar_popup("Debes seleccionar una categoría.")
-                    return
-
-                categoria = db.query(Categoria).filter(
-                    Categoria.nombre == nombre_categoria,
-                    Categoria.tipo == tipo
-                ).first()
-                if not categoria:
-                    self.mostrar_popup("Categoría no válida.")
-                    return
-
-                nueva_transaccion = Transaccion(
-                    cantidad=cantidad,
-                    fecha=datetime.now(),
-                    tipo=tipo,
-                    categoria_id=categoria.id,
-                    usuario_id=usuario.id
-                )
-                db.add(nueva_transaccion)
-                db.commit()
-
-                popup.dismiss()
-                self.mostrar_popup("Transacción registrada exitosamente.")
+                cantidad = redondear(cantidad_input.text)
             except ValueError:
                 self.mostrar_popup("Cantidad inválida.")
-            except Exception as e:
-                self.mostrar_popup(f"Error: {str(e)}")
-            finally:
-                db.close()
+                return
+            tipo = tipo_spinner.text
+            nombre_categoria = categoria_spinner.text if categoria_spinner.values else ""
+            if not nombre_categoria:
+                self.mostrar_popup("Debes seleccionar una categoría.")
+                return
+
+            def guardada(transaccion):
+                self.sincronizar_pronto()
+                popup.dismiss()
+                self.mostrar_popup("Transacción registrada exitosamente.")
+
+            self.ejecutar(
+                lambda db: _servicios().registrar_transaccion(usuario, cantidad, tipo, nombre_categoria, session=db),
+                guardada,
+                boton=submit_button,
+                popup=popup,
+                accion="registrar_transaccion"
+            )
 
         submit_button = Button(text="Registrar", size_hint_y=None, height=50)
         submit_button.bind(on_press=on_submit)
@@ -224,88 +294,181 @@ class MenuApp(App):
         popup = Popup(title="Registrar Transacción", content=layout, size_hint=(0.8, 0.7))
         popup.open()
 
+        # Inicializar categorías al abrir el popup
+        actualizar_categorias(tipo_spinner.text)
+        tipo_spinner.bind(text=lambda instance, value: actualizar_categorias(value))
+
     def visualizar_transacciones(self, instance):
+        from kivy.uix.popup import Popup
+        from src.view.lista_transacciones import ListaTransacciones, fila_a_dato
         usuario = Sesion.obtener_usuario_actual()
         if not usuario:
             self.mostrar_popup("Debes iniciar sesión para visualizar transacciones.")
             return
 
-        db = SessionLocal()
-        try:
-            transacciones = db.query(Transaccion).filter(
-                Transaccion.usuario_id == usuario.id
-            ).order_by(Transaccion.fecha.desc()).all()
+        lista = ListaTransacciones(size_hint=(1, 1))
+        estado = {"siguiente": None, "cargando": False}
+        usuario_id = usuario.id
+
+        popup = Popup(title="Transacciones", content=Label(text="Cargando transacciones..."), size_hint=(0.9, 0.9))
+
+        def cargar_pagina(despues=None):
+            estado["cargando"] = True
+            self.ejecutar(
+                lambda db: _servicios().listar_transacciones(usuario_id, tamano=TAMANO_PAGINA_LISTA, despues=despues,
+                                                          session=db),
+                lambda pagina: pagina_cargada(pagina, primera=despues is None),
+                popup=popup,
+                al_fallar=fallo_pagina,
+                accion="visualizar_transacciones"
+            )
+
+        def pagina_cargada(pagina, primera):
+            estado["cargando"] = False
+            estado["siguiente"] = pagina.siguiente
+            if primera and not pagina.filas:
+                popup.content = Label(text="No hay transacciones para mostrar.")
+                return
+            lista.data.extend(fila_a_dato(t) for t in pagina.filas)
+            if primera:
+                popup.content = lista
+                lista.bind(scroll_y=al_desplazar)
+
+        def fallo_pagina(error):
+            estado["cargando"] = False
+            self.mostrar_error(error)
+
+        def al_desplazar(instance, scroll_y):
+            # Al llegar al final de la lista se carga la siguiente página
+            if scroll_y <= 0 and estado["siguiente"] and not estado["cargando"]:
+                cargar_pagina(despues=estado["siguiente"])
 
-            scroll_view = ScrollView(size_hint=(1, 1))
-            layout = BoxLayout(orientation='vertical', size_hint_y=None)
-            layout.bind(minimum_height=layout.setter('height'))
-
-            if not transacciones:
-                layout.add_widget(Label(text="No hay transacciones para mostrar."))
-            else:
-                for t in transacciones:
-                    # Accedemos a la categoría asociada para mostrar su nombre
-                    categoria_nombre = t.categoria.nombre if t.categoria else "Sin categoría"
-                    detalle = (f"ID: {t.id} | {t.tipo} | {t.cantidad} | "
-                               f"{t.fecha.strftime('%Y-%m-%d %H:%M')} | Categoría: {categoria_nombre}")
-                    layout.add_widget(Label(text=detalle, size_hint_y=None, height=30))
-
-            scroll_view.add_widget(layout)
-            popup = Popup(title="Transacciones", content=scroll_view, size_hint=(0.9, 0.9))
-            popup.open()
-        except Exception as e:
-            self.mostrar_popup(f"Error: {str(e)}")
-        finally:
-            db.close()
+        popup.open()
+        cargar_pagina()
 
     def eliminar_transaccion(self, instance):
+        from kivy.uix.popup import Popup
+        from kivy.uix.spinner import Spinner
+        from kivy.uix.textinput import TextInput
         usuario = Sesion.obtener_usuario_actual()
         if not usuario:
-            self.mostrar_popup("Debes iniciar sesión para eliminar una transacción.")
+            self.mostrar_popup("Debes iniciar sesión para eliminar transacciones.")
             return
 
+        todas, confirmar = "(todas)", "Pulsa otra vez para confirmar"
         layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
-        id_input = TextInput(input_filter='int')
+        ids_input = TextInput(hint_text="Ej.: 3, 7, 12", multiline=False)
+        desde_input = TextInput(hint_text="AAAA-MM-DD", multiline=False)
+        hasta_input = TextInput(hint_text="AAAA-MM-DD", multiline=False)
+        categoria_spinner = Spinner(text=todas, values=[todas])
+
+        # Los filtros se combinan: p. ej. una categoría dentro de un rango de fechas
+        layout.add_widget(Label(text="IDs (separados por comas):"))
+        layout.add_widget(ids_input)
+        layout.add_widget(Label(text="Desde:"))
+        layout.add_widget(desde_input)
+        layout.add_widget(Label(text="Hasta (incluida):"))
+        layout.add_widget(hasta_input)
+        layout.add_widget(Label(text="Categoría:"))
+        layout.add_widget(categoria_spinner)
+        usuario_id = usuario.id
 
-        layout.add_widget(Label(text="ID de la transacción a eliminar:"))
-        layout.add_widget(id_input)
+        def mostrar_categorias(nombres):
+            categoria_spinner.values = [todas] + nombres
 
         def on_submit(_):
-            db = SessionLocal()
-            try:
-                id_eliminar = int(id_input.text)
-                transaccion = db.query(Transaccion).filter(
-                    Transaccion.id == id_eliminar,
-                    Transaccion.usuario_id == usuario.id
-                ).first()
-                if not transaccion:
-                    self.mostrar_popup("Transacción no encontrada o no pertenece al usuario.")
-                    return
+            ids_texto, desde, hasta = ids_input.text.strip(), desde_input.text.strip(), hasta_input.text.strip()
+            categoria = categoria_spinner.text if categoria_spinner.text != todas else None
+            if not (ids_texto or desde or hasta or categoria):
+                self.mostrar_popup("Indica los IDs, un rango de fechas o una categoría.")
+                return
+            # Un rango o una categoría pueden abarcar muchas transacciones: se pide confirmación
+            if (desde or hasta or categoria) and submit_button.text != confirmar:
+                submit_button.text = confirmar
+                return
+            submit_button.text = "Eliminar"
+
+            def eliminar(db):
+                from src.model.eliminacion import fecha_de_texto, ids_de_texto
+                return _servicios().eliminar_transacciones(
+                    usuario_id,
+                    ids=ids_de_texto(ids_texto) if ids_texto else None,
+                    desde=fecha_de_texto(desde) if desde else None,
+                    hasta=fecha_de_texto(hasta, fin_del_dia=True) if hasta else None,
+                    categoria=categoria,
+                    session=db
+                )
 
-                db.delete(transaccion)
-                db.commit()
+            def eliminadas(cantidad):
+                if not cantidad:
+                    self.mostrar_popup("No se encontró ninguna transacción del usuario con esos criterios.")
+                    return
+                self.sincronizar_pronto()
                 popup.dismiss()
-                self.mostrar_popup("Transacción eliminada exitosamente.")
-            except ValueError:
-                self.mostrar_popup("ID inválido.")
-            except Exception as e:
-                self.mostrar_popup(f"Error: {str(e)}")
-            finally:
-                db.close()
+                self.mostrar_popup(f"{cantidad} transacción(es) eliminada(s) exitosamente.")
+
+            self.ejecutar(
+                eliminar,
+                eliminadas,
+                boton=submit_button,
+                popup=popup,
+                accion="eliminar_transacciones"
+            )
 
         submit_button = Button(text="Eliminar", size_hint_y=None, height=50)
         submit_button.bind(on_press=on_submit)
         layout.add_widget(submit_button)
+        # Si cambian los filtros después de pedir confirmación, hay que confirmar otra vez
+        for campo in (ids_input, desde_input, hasta_input, categoria_spinner):
+            campo.bind(text=lambda *_: setattr(submit_button, "text", "Eliminar"))
+
+        popup = Popup(title="Eliminar Transacciones", content=layout, size_hint=(0.8, 0.8))
+        popup.open()
+        self.ejecutar(
+            lambda db: _servicios().categorias("Egreso", session=db) + _servicios().categorias("Ingreso", session=db),
+            mostrar_categorias,
+            popup=popup,
+            accion="categorias"
+        )
+
+    def ver_resumen(self, instance):
+        from kivy.uix.popup import Popup
+        usuario = Sesion.obtener_usuario_actual()
+        if not usuario:
+            self.mostrar_popup("Debes iniciar sesión para ver el resumen.")
+            return
+
+        usuario_id = usuario.id
+        texto = Label(text="Cargando resumen...")
+        popup = Popup(title="Resumen", content=texto, size_hint=(0.8, 0.8))
+
+        def formatear(datos):
+            ingresos, egresos, neto = datos["balance"]
+            lineas = [f"Ingresos: {ingresos:.2f}   Egresos: {egresos:.2f}   Balance: {neto:.2f}", "",
+                      "Categorías con más gasto:"]
+            lineas += [f"{nombre}: {total:.2f}" for nombre, total in datos["top_categorias"]]
+            lineas += ["", "Últimos meses (ingresos / egresos / neto):"]
+            lineas += [f"{periodo}: {ing:.2f} / {egr:.2f} / {net:.2f}" for periodo, ing, egr, net in datos["meses"]]
+            texto.text = "\n".join(lineas)
+
+        def fallo(error):
+            popup.dismiss()
+            self.mostrar_error(error)
 
-        popup = Popup(title="Eliminar Transacción", content=layout, size_hint=(0.7, 0.6))
         popup.open()
+        self.ejecutar(lambda db: _servicios().resumen(usuario_id, meses=6, session=db), formatear, popup=popup,
+                      al_fallar=fallo, accion="ver_resumen")
 
     def cerrar_sesion(self, instance):
         Sesion.cerrar_sesion()
         self.actualizar_usuario_label()
         self.mostrar_popup("Sesión cerrada.")
 
+    def mostrar_error(self, error):
+        self.mostrar_popup(f"Error: {str(error)}")
+
     def mostrar_popup(self, mensaje):
+        from kivy.uix.popup import Popup
         popup = Popup(title="Información", content=Label(text=mensaje), size_hint=(0.7, 0.5))
        
         popup.open()
@@ -0,0 +1,100 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from kivy.clock import Clock
+
+from src.model.estadisticas_sql import ESTADISTICAS_SQL
+
+def en_segundo_plano(pool, funcion, al_terminar, al_fallar=None):
+    """
+    Ejecuta `funcion` en `pool` y entrega el resultado en el hilo de Kivy:
+    al_terminar(resultado) o al_fallar(excepcion), programados con Clock.schedule_once.
+    """
+    def entregar(futuro):
+        if futuro.cancelled():
+            return
+        error = futuro.exception()
+        if error is None:
+            resultado = futuro.result()
+            Clock.schedule_once(lambda dt: al_terminar(resultado))
+        elif al_fallar is not None:
+            Clock.schedule_once(lambda dt: al_fallar(error))
+
+    futuro = pool.submit(funcion)
+    futuro.add_done_callback(entregar)
+    return futuro
+
+
+class Tarea:
+    """
+    Trabajo enviado a EjecutorBD. cancelar() evita que empiece si aún está en cola;
+    si ya se está ejecutando, termina en su hilo pero su resultado no se entrega.
+    """
+    def __init__(self):
+        self.futuro = None
+        self._cancelada = threading.Event()
+
+    @property
+    def cancelada(self):
+        return self._cancelada.is_set()
+
+    def cancelar(self):
+        self._cancelada.set()
+        if self.futuro is not None:
+            self.futuro.cancel()
+
+
+class EjecutorBD:
+    """
+    Pool de hilos para el acceso a datos desde la interfaz. Cada tarea recibe una
+    sesión propia (funcion(db)) y es una unidad de trabajo: se confirma si termina
+    sin errores, se deshace si no, y la sesión se cierra. Los resultados vuelven
+    al hilo de Kivy con Clock.schedule_once.
+    """
+    def __init__(self, fabrica_sesiones=None, max_workers=4):
+        self._fabrica_sesiones = fabrica_sesiones
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="datos")
+
+    def _nueva_sesion(self):
+        if self._fabrica_sesiones is None:
+            from src.model.db import SessionLocal
+            # Sin expirar al confirmar: los objetos devueltos se leen luego en el hilo de Kivy
+            return SessionLocal(expire_on_commit=False)
+        return self._fabrica_sesiones()
+
+    def _ejecutar(self, tarea, funcion, accion):
+        if tarea.cancelada:
+            return None
+        # Con `accion`, las sentencias de la tarea (el commit incluido) cuentan para esa acción
+        with ESTADISTICAS_SQL.medir(accion) if accion is not None else nullcontext():
+            db = self._nueva_sesion()
+            try:
+                resultado = funcion(db)
+                db.commit()
+                return resultado
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+    def enviar(self, funcion, al_terminar, al_fallar=None, accion=None):
+        tarea = Tarea()
+
+        def terminar(resultado):
+            if not tarea.cancelada:
+                al_terminar(resultado)
+
+        def fallar(error):
+            if not tarea.cancelada and al_fallar is not None:
+                al_fallar(error)
+
+        tarea.futuro = en_segundo_plano(self._pool, lambda: self._ejecutar(tarea, funcion, accion), terminar, fallar)
+        return tarea
+
+    def cerrar(self, esperar=True):
+        self._pool.shutdown(wait=esperar, cancel_futures=True)
+
+
+EJECUTOR_BD = EjecutorBD()
@@ -1,13 +1,49 @@
+import asyncio
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 import pytest
 from src.model.transaccion import Transaccion
 from unittest.mock import MagicMock
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, func, inspect, select, text
 from src.model.base import Base  # Importa Base desde base.py
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
 from src.model.usuario import Usuario
 from src.model.categoria import Categoria, TipoCategoria
 from src.model.registros import Registro
-from src.model.errors import CorreoInvalidoError, ContrasenaInseguraError, CamposVaciosError, FechaFuturaError, CantidadNegativaError, UsuarioNoEncontradoError, CategoriaInvalidaError, TipoTransaccionInvalidoError, ContrasenaIncorrectaError
+from src.model.catalogo_categorias import CatalogoCategorias
+from src.model.importacion import importar_transacciones, leer_filas
+from src.model.listado import consulta_listado, pagina_transacciones
+from src.model.esquema import VERSION_ESQUEMA, crear_esquema, inicializar_base, tabla_version, version_esquema
+from src.model.dinero import CANTIDAD_MAXIMA, CENTIMO, a_centimos, a_decimal, centimos, redondear
+from decimal import Decimal
+from src.model.resumen_mensual import ResumenMensual, reconstruir_resumen
+from src.model import reportes
+from src.model.db import PERFILES, crear_engine, crear_engine_async, crear_engine_local, crear_sesiones_async, leer_configuracion, url_async
+from src.model import operaciones_async, servicios
+from src.model.analitica import HistorialColumnar
+from src.model.archivo import ArchivoFrio
+from src.model import cache_reportes
+from src.model.cache_reportes import CacheReportes
+from src.model import sincronizacion
+from src.model.sincronizacion import SincronizacionPeriodica, Sincronizador
+from src.model.transaccion_eliminada import TransaccionEliminada
+from src.model.sesion import AlmacenSesiones, Sesion, UsuarioSesion
+from src.model import servidor_http
+from src.model.servidor_http import ServidorAPI
+from src.model.estadisticas_sql import SIN_ACCION, EstadisticasSQL, instrumentar
+from src.model.eliminacion import fecha_de_texto, ids_de_texto
+from src.model.errors import FechaInvalidaError, RangoFechasInvalidoError
+import numpy as np
+from src.model.errors import CorreoInvalidoError, CorreoYaRegistradoError, ContrasenaInseguraError, CamposVaciosError, FechaFuturaError, CantidadNegativaError, UsuarioNoEncontradoError, CategoriaInvalidaError, TipoTransaccionInvalidoError, ContrasenaIncorrectaError
 from datetime import datetime, timedelta
 from src.model.errors import (
     CantidadNegativaError,
@@ -527,4 +563,2528 @@ class TestVisualizarTransacciones:
     def test_visualizar_transacciones_con_caracteres_especiales(self):
         """Prueba de error: intentar visualizar transacciones con caracteres especiales en las fechas"""
         with pytest.raises(TypeError):
-            resultado = [t for t in self.transacciones if datetime(2021, 1, 1) <= t.fecha <= "fecha_invalida"]
\ No newline at end of file
+            resultado = [t for t in self.transacciones if datetime(2021, 1, 1) <= t.fecha <= "fecha_invalida"]
+
+class TestCatalogoCategorias:
+    def setup_method(self):
+        self.engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+
+        self.usuario = Usuario(nombre="Juan", correo="juan@example.com", contraseña="segura123")
+        self.categoria = Categoria(nombre="Alimentación", tipo="Egreso")
+        self.session.add_all([self.usuario, self.categoria])
+        self.session.commit()
+        self.categoria_id = self.categoria.id
+        self.session.refresh(self.usuario)
+
+        self.sentencias = []
+        event.listen(self.engine, "before_cursor_execute", self._contar)
+
+    def teardown_method(self):
+        self.session.close()
+
+    def _contar(self, conn, cursor, statement, parameters, context, executemany):
+        self.sentencias.append(statement)
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_catalogo_se_carga_una_sola_vez(self):
+        """Prueba normal: el catálogo solo consulta la base de datos la primera vez"""
+        assert CatalogoCategorias.nombres(self.session, "Egreso") == ["Alimentación"]
+        assert CatalogoCategorias.obtener_id(self.session, TipoCategoria.EGRESO, "Alimentación") == self.categoria_id
+        assert len(self.sentencias) == 1
+
+    def test_registrar_transaccion_solo_inserta(self):
+        """Prueba normal: con el catálogo cargado, registrar una transacción no hace ningún SELECT"""
+        CatalogoCategorias.nombres(self.session, "Egreso")
+        self.sentencias.clear()
+
+        transaccion = Transaccion(80.0, datetime.now(), "Egreso", "Alimentación", self.usuario, self.session)
+        self.session.add(transaccion)
+        self.session.flush()
+
+        assert transaccion.categoria_id == self.categoria_id
+        assert not [s for s in self.sentencias if s.startswith("SELECT")]
+        assert [s for s in self.sentencias if s.startswith("INSERT INTO transacciones")]
+
+    def test_catalogo_se_invalida_al_insertar_categoria(self):
+        """Prueba normal: una categoría nueva aparece en el catálogo tras insertarla"""
+        CatalogoCategorias.nombres(self.session, "Egreso")
+        self.session.add(Categoria(nombre="Transporte", tipo="Egreso"))
+        self.session.commit()
+
+        assert set(CatalogoCategorias.nombres(self.session, "Egreso")) == {"Alimentación", "Transporte"}
+
+    # ---- PRUEBAS EXTREMAS ----
+
+    def test_catalogo_leido_antes_del_commit_de_otra_sesion(self, tmp_path):
+        """Prueba extrema: lo que otra sesión carga entre el flush y el commit no se queda en el catálogo"""
+        engine = create_engine(f"sqlite:///{tmp_path / 'catalogo.db'}")
+        Base.metadata.create_all(engine)
+        Sesiones = sessionmaker(bind=engine)
+        with Sesiones() as a, Sesiones() as b:
+            a.add(Categoria(nombre="Alimentación", tipo="Egreso"))
+            a.commit()
+            a.add(Categoria(nombre="Transporte", tipo="Egreso"))
+            a.flush()
+            assert CatalogoCategorias.nombres(b, "Egreso") == ["Alimentación"]
+            b.rollback()
+            a.commit()
+            assert set(CatalogoCategorias.nombres(b, "Egreso")) == {"Alimentación", "Transporte"}
+        engine.dispose()
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_categoria_deshecha_no_queda_en_el_catalogo(self):
+        """Prueba de error: una categoría de una transacción deshecha no es válida después"""
+        CatalogoCategorias.nombres(self.session, "Egreso")
+        self.session.add(Categoria(nombre="Transporte", tipo="Egreso"))
+        self.session.flush()
+        assert "Transporte" in CatalogoCategorias.nombres(self.session, "Egreso")
+        self.session.rollback()
+
+        with pytest.raises(ValueError):
+            Transaccion(80.0, datetime.now(), "Egreso", "Transporte", self.usuario, self.session)
+
+    def test_catalogo_se_invalida_al_eliminar_categoria(self):
+        """Prueba de error: una categoría eliminada deja de ser válida"""
+        CatalogoCategorias.nombres(self.session, "Egreso")
+        self.session.delete(self.categoria)
+        self.session.commit()
+
+        with pytest.raises(ValueError):
+            Transaccion(80.0, datetime.now(), "Egreso", "Alimentación", self.usuario, self.session)
+
+    def test_catalogo_tipo_invalido(self):
+        """Prueba de error: pedir categorías de un tipo inexistente"""
+        with pytest.raises(ValueError):
+            CatalogoCategorias.nombres(self.session, "Donación")
+
+
+class TestImportacion:
+    def setup_method(self):
+        engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(engine)
+        self.session = sessionmaker(bind=engine)()
+
+        self.usuario = Usuario(nombre="Juan", correo="juan@example.com", contraseña="segura123")
+        self.session.add_all([
+            self.usuario,
+            Categoria(nombre="Alimentación", tipo="Egreso"),
+            Categoria(nombre="Salario", tipo="Ingreso"),
+        ])
+        self.session.commit()
+
+    def teardown_method(self):
+        self.session.close()
+
+    def _importar(self, texto, formato="csv", **kwargs):
+        return importar_transacciones(self.session, leer_filas(io.StringIO(texto), formato), **kwargs)
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_importar_csv_en_lotes(self):
+        """Prueba normal: importar un CSV en varios lotes"""
+        filas = "\n".join(f"{i}.5,2024-01-{i % 28 + 1:02d}T10:00:00,Egreso,Alimentación,juan@example.com" for i in range(25))
+        resumen = self._importar("cantidad,fecha,tipo,categoria,usuario\n" + filas, tamano_lote=10)
+
+        assert resumen.importadas == 25
+        assert resumen.rechazadas == []
+        assert self.session.query(Transaccion).filter_by(usuario_id=self.usuario.id).count() == 25
+
+    def test_importar_jsonl_con_correo_por_defecto(self):
+        """Prueba normal: importar JSON Lines sin columna de usuario"""
+        texto = '{"cantidad": 1500, "fecha": "2024-02-01", "tipo": "ingreso", "categoria": "Salario"}\n'
+        resumen = self._importar(texto, "jsonl", correo_por_defecto="juan@example.com")
+
+        assert resumen.importadas == 1
+        t = self.session.query(Transaccion).one()
+        assert t.tipo.value == "Ingreso"
+        assert t.categoria.nombre == "Salario"
+
+    def test_copy_de_postgresql_escribe_uid_y_modificada(self):
+        """Prueba normal: el COPY de PostgreSQL incluye uid y modificada, que no tienen valor por defecto en la base"""
+        from src.model import importacion
+        lote = [(2, {"cantidad": "10.5", "fecha": "2024-01-02", "tipo": "Egreso", "categoria": "Alimentación"})] * 3
+        valores = importacion._validar_lote(self.session, lote, "juan@example.com", {}, importacion.ResumenImportacion())
+        sesion = MagicMock()
+        cursor = sesion.connection.return_value.connection.cursor.return_value
+        importacion._copiar_postgresql(sesion, valores)
+
+        sentencia, buffer = cursor.copy_expert.call_args.args
+        assert "uid, modificada)" in sentencia
+        filas = [linea.split(",") for linea in buffer.getvalue().splitlines()]
+        assert all(len(fila) == 7 and len(fila[5]) == 32 and fila[6] for fila in filas)
+        assert len({fila[5] for fila in filas}) == 3
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_importar_rechaza_filas_invalidas(self):
+        """Prueba de error: las reglas de Transaccion se aplican fila a fila"""
+        futura = (datetime.now() + timedelta(days=30)).isoformat()
+        texto = ("cantidad,fecha,tipo,categoria,usuario\n"
+                 "-5,2024-01-01,Egreso,Alimentación,juan@example.com\n"
+                 f"5,{futura},Egreso,Alimentación,juan@example.com\n"
+                 "5,2024-01-01,Egreso,Salario,juan@example.com\n"
+                 "5,2024-01-01,Egreso,Alimentación,nadie@example.com\n"
+                 "abc,2024-01-01,Egreso,Alimentación,juan@example.com\n"
+                 "5,2024-01-01,Egreso,Alimentación,juan@example.com\n")
+        resumen = self._importar(texto)
+
+        assert resumen.importadas == 1
+        assert [numero for numero, _ in resumen.rechazadas] == [2, 3, 4, 5, 6]
+
+    def test_importar_jsonl_rechaza_lineas_invalidas(self):
+        """Prueba de error: una línea mal formada, que no es un objeto o con una cantidad desmesurada no aborta la importación"""
+        valida = '{"cantidad": 5, "fecha": "2024-01-01", "tipo": "Egreso", "categoria": "Alimentación"}'
+        texto = "\n".join([
+            valida,
+            '{"cantidad": 5, "fecha": ',
+            "[1, 2]",
+            '{"cantidad": "1e30", "fecha": "2024-01-01", "tipo": "Egreso", "categoria": "Alimentación"}',
+            valida,
+        ])
+        resumen = self._importar(texto, "jsonl", correo_por_defecto="juan@example.com", tamano_lote=10)
+
+        assert resumen.importadas == 2
+        assert [numero for numero, _ in resumen.rechazadas] == [2, 3, 4]
+        assert self.session.query(Transaccion).count() == 2
+
+
+class TestPaginacionTransacciones:
+    def setup_method(self):
+        engine = create_engine('sqlite:///:memory:')
+        Base.metadata.create_all(engine)
+        self.session = sessionmaker(bind=engine)()
+
+        self.usuario = Usuario(nombre="Juan", correo="juan@example.com", contraseña="segura123")
+        otro = Usuario(nombre="Ana", correo="ana@example.com", contraseña="segura123")
+        categoria = Categoria(nombre="Alimentación", tipo="Egreso")
+        self.session.add_all([self.usuario, otro, categoria])
+        self.session.commit()
+
+        base = datetime(2024, 1, 1)
+        # Fechas repetidas de dos en dos para comprobar el desempate por id
+        for i in range(25):
+            self.session.add(Transaccion(float(i), base + timedelta(days=i // 2), "Egreso", categoria, self.usuario, self.session))
+        self.session.add(Transaccion(1.0, base, "Egreso", categoria, otro, self.session))
+        self.session.commit()
+
+        self.esperado = [t.id for t in self.session.query(Transaccion)
+                         .filter_by(usuario_id=self.usuario.id)
+                         .order_by(Transaccion.fecha.desc(), Transaccion.id.desc())]
+
+    def teardown_method(self):
+        self.session.close()
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_recorrer_todas_las_paginas(self):
+        """Prueba normal: avanzar página a página recorre todas las transacciones sin repetir"""
+        ids = []
+        pagina = pagina_transacciones(self.session, self.usuario.id, tamano=10)
+        assert pagina.anterior is None
+        while True:
+            ids.extend(t.id for t in pagina.filas)
+            if not pagina.siguiente:
+                break
+            pagina = pagina_transacciones(self.session, self.usuario.id, tamano=10, despues=pagina.siguiente)
+
+        assert ids == self.esperado
+        assert len(pagina.filas) == 5
+
+    def test_volver_a_la_pagina_anterior(self):
+        """Prueba normal: retroceder devuelve la misma página que se vio antes"""
+        primera = pagina_transacciones(self.session, self.usuario.id, tamano=10)
+        segunda = pagina_transacciones(self.session, self.usuario.id, tamano=10, despues=primera.siguiente)
+        de_vuelta = pagina_transacciones(self.session, self.usuario.id, tamano=10, antes=segunda.anterior)
+
+        assert [t.id for t in de_vuelta.filas] == [t.id for t in primera.filas]
+        assert de_vuelta.anterior is None
+        assert de_vuelta.siguiente == primera.siguiente
+
+    def test_listado_no_consulta_categorias_por_fila(self):
+        """Prueba normal: el número de sentencias no depende del número de filas listadas"""
+        sentencias = []
+
+        def contar(conn, cursor, statement, parameters, context, executemany):
+            sentencias.append(statement)
+
+        engine = self.session.get_bind()
+        event.listen(engine, "before_cursor_execute", contar)
+        try:
+            for tamano in (3, 30):
+                sentencias.clear()
+                pagina = pagina_transacciones(self.session, self.usuario.id, tamano=tamano)
+                nombres = {t.categoria_nombre for t in pagina.filas}
+                assert nombres == {"Alimentación"}
+                assert len(sentencias) == 1
+        finally:
+            event.remove(engine, "before_cursor_execute", contar)
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_tamano_de_pagina_invalido(self):
+        """Prueba de error: el tamaño de página debe ser positivo"""
+        with pytest.raises(ValueError):
+            pagina_transacciones(self.session, self.usuario.id, tamano=0)
+
+
+class TestConfiguracionDB:
+    # ---- PRUEBAS NORMALES ----
+
+    def test_perfil_por_defecto_sin_echo(self):
+        """Prueba normal: el perfil por defecto no registra el SQL"""
+        config = leer_configuracion(archivo_config="", entorno={})
+        assert config["perfil"] == "desktop"
+        assert config["echo"] is False
+
+    def test_variables_de_entorno_sobrescriben_el_perfil(self):
+        """Prueba normal: las variables GASTOS_DB_* tienen prioridad sobre el perfil"""
+        entorno = {"GASTOS_DB_PERFIL": "server", "GASTOS_DB_POOL_SIZE": "7", "GASTOS_DB_ECHO": "debug"}
+        config = leer_configuracion(archivo_config="", entorno=entorno)
+        assert config["perfil"] == "server"
+        assert config["pool_size"] == 7
+        assert config["max_overflow"] == PERFILES["server"]["max_overflow"]
+        assert config["echo"] == "debug"
+
+    def test_archivo_de_configuracion(self, tmp_path):
+        """Prueba normal: leer la sección [database] del archivo de configuración"""
+        archivo = tmp_path / "config.ini"
+        archivo.write_text("[database]\nperfil = test\npool_pre_ping = true\n", encoding="utf-8")
+        config = leer_configuracion(archivo_config=str(archivo), entorno={})
+        assert config["url"] == "sqlite://"
+        assert config["pool_pre_ping"] is True
+
+    def test_engine_de_pruebas_comparte_la_base_en_memoria(self):
+        """Prueba normal: el perfil test usa una única base en memoria para todas las sesiones"""
+        engine = crear_engine("test")
+        Base.metadata.create_all(engine)
+        Sesiones = sessionmaker(bind=engine)
+        with Sesiones() as s:
+            s.add(Categoria(nombre="Salario", tipo="Ingreso"))
+            s.commit()
+        with Sesiones() as s:
+            assert s.query(Categoria).count() == 1
+        assert engine.echo is False
+
+    def test_opcion_archivo_como_override(self, tmp_path):
+        """Prueba normal: archivo= es la opción del directorio del archivo, no el archivo de configuración"""
+        config = leer_configuracion("server", archivo_config="", entorno={}, archivo=str(tmp_path))
+        assert config["archivo"] == str(tmp_path)
+        engine = crear_engine("test", archivo=str(tmp_path))
+        with sessionmaker(bind=engine)() as db:
+            assert ArchivoFrio.de(db).directorio == str(tmp_path)
+        engine.dispose()
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_perfil_desconocido(self):
+        """Prueba de error: pedir un perfil que no existe"""
+        with pytest.raises(ValueError):
+            leer_configuracion("produccion", archivo_config="", entorno={})
+
+
+class TestEsquemaEIndices:
+    def setup_method(self):
+        self.engine = create_engine('sqlite:///:memory:')
+        crear_esquema(self.engine)
+
+    def _plan(self, consulta):
+        sql = str(consulta.compile(self.engine, compile_kwargs={"literal_binds": True}))
+        with self.engine.connect() as conexion:
+            return " | ".join(fila[-1] for fila in conexion.execute(text("EXPLAIN QUERY PLAN " + sql)))
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_listado_usa_indice_usuario_fecha(self):
+        """Prueba normal: el listado paginado recorre el índice sin ordenar en memoria"""
+        consulta = consulta_listado(1).order_by(Transaccion.fecha.desc(), Transaccion.id.desc()).limit(21)
+        plan = self._plan(consulta)
+        assert "ix_transacciones_usuario_fecha_id" in plan
+        assert "TEMP B-TREE" not in plan
+
+    def test_totales_por_categoria_usan_indice(self):
+        """Prueba normal: los totales de una categoría en un rango usan el índice por categoría"""
+        consulta = select(func.sum(Transaccion.cantidad)).where(
+            Transaccion.usuario_id == 1,
+            Transaccion.categoria_id == 2,
+            Transaccion.fecha.between(datetime(2024, 1, 1), datetime(2024, 2, 1))
+        )
+        assert "ix_transacciones_usuario_categoria_fecha" in self._plan(consulta)
+
+    def test_categorias_por_tipo_usan_indice(self):
+        """Prueba normal: el catálogo de categorías filtra por tipo con índice"""
+        consulta = select(Categoria.id, Categoria.nombre).where(Categoria.tipo == TipoCategoria.EGRESO)
+        assert "ix_categorias_tipo" in self._plan(consulta)
+
+    # ---- PRUEBAS EXTREMAS ----
+
+    def test_crear_esquema_es_idempotente_y_repone_indices(self):
+        """Prueba extrema: repetir el arranque no falla y recrea índices que falten"""
+        with self.engine.begin() as conexion:
+            conexion.execute(text("DROP INDEX ix_transacciones_usuario_categoria_fecha"))
+
+        crear_esquema(self.engine)
+        crear_esquema(self.engine)
+
+        indices = {i["name"] for i in inspect(self.engine).get_indexes("transacciones")}
+        assert {"ix_transacciones_usuario_fecha_id", "ix_transacciones_usuario_categoria_fecha"} <= indices
+
+
+class TestResumenMensual:
+    def setup_method(self):
+        engine = create_engine('sqlite:///:memory:')
+        crear_esquema(engine)
+        self.session = sessionmaker(bind=engine)()
+
+        self.usuario = Usuario(nombre="Juan", correo="juan@example.com", contraseña="segura123")
+        self.comida = Categoria(nombre="Alimentación", tipo="Egreso")
+        self.transporte = Categoria(nombre="Transporte", tipo="Egreso")
+        self.session.add_all([self.usuario, self.comida, self.transporte])
+        self.session.commit()
+
+    def teardown_method(self):
+        self.session.close()
+
+    def _registrar(self, cantidad, fecha, categoria=None):
+        t = Transaccion(cantidad, fecha, "Egreso", categoria or self.comida, self.usuario, self.session)
+        self.session.add(t)
+        self.session.commit()
+        return t
+
+    def _resumen(self):
+        return {
+            (r.anio_mes, r.categoria_id): (r.total, r.num_transacciones)
+            for r in self.session.query(ResumenMensual).filter_by(usuario_id=self.usuario.id)
+        }
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_resumen_se_actualiza_al_insertar(self):
+        """Prueba normal: cada alta suma al mes y categoría correspondientes"""
+        self._registrar(10.0, datetime(2024, 1, 5))
+        self._registrar(15.0, datetime(2024, 1, 20))
+        self._registrar(7.0, datetime(2024, 2, 1))
+
+        assert self._resumen() == {
+            ("2024-01", self.comida.id): (25.0, 2),
+            ("2024-02", self.comida.id): (7.0, 1),
+        }
+
+    def test_resumen_se_actualiza_al_modificar(self):
+        """Prueba normal: modificar cantidad, fecha o categoría mueve el importe entre grupos"""
+        t = self._registrar(10.0, datetime(2024, 1, 5))
+        self._registrar(5.0, datetime(2024, 1, 6))
+
+        t.modificar_transaccion(nueva_cantidad=30.0, nueva_fecha=datetime(2024, 3, 1))
+        self.session.commit()
+        # Objeto expirado tras el commit: el valor anterior se lee de la base de datos
+        t.modificar_transaccion(nueva_categoria=self.transporte)
+        self.session.commit()
+
+        assert self._resumen() == {
+            ("2024-01", self.comida.id): (5.0, 1),
+            ("2024-03", self.transporte.id): (30.0, 1),
+        }
+
+    def test_resumen_se_actualiza_al_eliminar(self):
+        """Prueba normal: eliminar la última transacción de un grupo elimina el grupo"""
+        t = self._registrar(10.0, datetime(2024, 1, 5))
+        self.session.delete(t)
+        self.session.commit()
+
+        assert self._resumen() == {}
+
+    def test_importacion_actualiza_el_resumen(self):
+        """Prueba normal: la importación masiva también suma al resumen"""
+        texto = ("cantidad,fecha,tipo,categoria,usuario\n"
+                 "4,2024-04-01,Egreso,Alimentación,juan@example.com\n"
+                 "6,2024-04-02,Egreso,Alimentación,juan@example.com\n")
+        importar_transacciones(self.session, leer_filas(io.StringIO(texto), "csv"))
+
+        assert self._resumen() == {("2024-04", self.comida.id): (10.0, 2)}
+
+    def test_reconstruir_coincide_con_el_mantenimiento_incremental(self):
+        """Prueba normal: reconstruir el resumen da el mismo resultado que las actualizaciones"""
+        for i in range(12):
+            self._registrar(float(i), datetime(2024, i % 3 + 1, 1), self.comida if i % 2 else self.transporte)
+        incremental = self._resumen()
+
+        reconstruir_resumen(self.session.connection(), self.usuario.id)
+        self.session.commit()
+
+        assert self._resumen() == incremental
+
+
+class TestReportes:
+    URL = 'sqlite:///:memory:'
+
+    def setup_method(self):
+        engine = create_engine(self.URL)
+        Base.metadata.drop_all(engine)
+        crear_esquema(engine)
+        self.session = sessionmaker(bind=engine)()
+
+        self.usuario = Usuario(nombre="Juan", correo="juan@example.com", contraseña="segura123")
+        otro = Usuario(nombre="Ana", correo="ana@example.com", contraseña="segura123")
+        salario = Categoria(nombre="Salario", tipo="Ingreso")
+        comida = Categoria(nombre="Alimentación", tipo="Egreso")
+        transporte = Categoria(nombre="Transporte", tipo="Egreso")
+        self.session.add_all([self.usuario, otro, salario, comida, transporte])
+        self.session.commit()
+
+        datos = [
+            (1000.0, datetime(2024, 1, 1), "Ingreso", salario),
+            (200.0, datetime(2024, 1, 10), "Egreso", comida),
+            (50.0, datetime(2024, 1, 15), "Egreso", transporte),
+            (1000.0, datetime(2024, 2, 1), "Ingreso", salario),
+            (300.0, datetime(2024, 2, 10), "Egreso", comida),
+            (20.0, datetime(2024, 2, 20), "Egreso", transporte),
+        ]
+        for cantidad, fecha, tipo, categoria in datos:
+            self.session.add(Transaccion(cantidad, fecha, tipo, categoria, self.usuario, self.session))
+        self.session.add(Transaccion(999.0, datetime(2024, 1, 5), "Egreso", comida, otro, self.session))
+        self.session.commit()
+
+    def teardown_method(self):
+        self.session.close()
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_balance_a_una_fecha(self):
+        """Prueba normal: el balance combina meses completos y el mes en curso"""
+        assert reportes.balance(self.session, self.usuario.id, datetime(2024, 2, 15)) == (2000.0, 550.0, 1450.0)
+        assert reportes.balance(self.session, self.usuario.id, datetime(2024, 1, 31)) == (1000.0, 250.0, 750.0)
+        assert reportes.balance(self.session, self.usuario.id) == (2000.0, 570.0, 1430.0)
+
+    def test_totales_por_tipo_y_categoria(self):
+        """Prueba normal: totales agrupados por tipo y por categoría"""
+        # El orden del enum depende del dialecto (nombre en SQLite, declaración en PostgreSQL)
+        assert sorted(reportes.totales_por_tipo(self.session, self.usuario.id)) == [
+            ("Egreso", 570.0, 4), ("Ingreso", 2000.0, 2)
+        ]
+        assert reportes.totales_por_categoria(self.session, self.usuario.id, tipo="Egreso") == [
+            ("Alimentación", "Egreso", 500.0, 2), ("Transporte", "Egreso", 70.0, 2)
+        ]
+
+    def test_top_categorias(self):
+        """Prueba normal: las categorías con mayor gasto en un rango"""
+        assert reportes.top_categorias(self.session, self.usuario.id, n=1) == [("Alimentación", 500.0)]
+        assert reportes.top_categorias(self.session, self.usuario.id, n=5, desde=datetime(2024, 2, 1)) == [
+            ("Alimentación", 300.0), ("Transporte", 20.0)
+        ]
+
+    def test_totales_por_periodo(self):
+        """Prueba normal: ingresos, egresos y neto por mes"""
+        assert reportes.totales_por_periodo(self.session, self.usuario.id, "mes") == [
+            ("2024-01", 1000.0, 250.0, 750.0), ("2024-02", 1000.0, 320.0, 680.0)
+        ]
+        assert len(reportes.totales_por_periodo(self.session, self.usuario.id, "dia")) == 6
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_rango_de_fechas_invertido(self):
+        """Prueba de error: la fecha inicial es posterior a la final"""
+        with pytest.raises(ValueError):
+            reportes.totales_por_tipo(self.session, self.usuario.id, datetime(2024, 3, 1), datetime(2024, 1, 1))
+
+    def test_periodo_invalido(self):
+        """Prueba de error: agrupar por un periodo que no existe"""
+        with pytest.raises(ValueError):
+            reportes.totales_por_periodo(self.session, self.usuario.id, "trimestre")
+
+
+@pytest.mark.skipif(not os.environ.get("GASTOS_TEST_PG_URL"), reason="GASTOS_TEST_PG_URL no configurada")
+class TestReportesPostgreSQL(TestReportes):
+    URL = os.environ.get("GASTOS_TEST_PG_URL")
+
+
+class TestReportesDialectoPostgreSQL:
+    def test_periodos_compilan_para_postgresql(self):
+        """Prueba normal: las expresiones de periodo usan to_char en PostgreSQL"""
+        from sqlalchemy.dialects import postgresql
+        for periodo in ("dia", "semana", "mes", "anio"):
+            sql = str(select(reportes._expresion_periodo("postgresql", periodo)).compile(dialect=postgresql.dialect()))
+            assert "to_char" in sql
+
+
+class TestCosteBcrypt:
+    # ---- PRUEBAS NORMALES ----
+
+    def test_hash_usa_el_coste_configurado(self, monkeypatch):
+        """Prueba normal: el hash se genera con el factor de trabajo configurado"""
+        monkeypatch.setattr(Usuario, "COSTE_BCRYPT", 4)
+        usuario = Usuario(nombre="Juan", correo="juan@example.com", contraseña="segura123")
+        assert usuario.contraseña.startswith("$2b$04$")
+        assert not usuario.necesita_rehash()
+
+    def test_rehash_al_iniciar_sesion_si_cambia_el_coste(self, monkeypatch):
+        """Prueba normal: al iniciar sesión se regenera el hash con el nuevo coste"""
+        monkeypatch.setattr(Usuario, "COSTE_BCRYPT", 4)
+        usuario = Usuario(nombre="Juan", correo="juan@example.com", contraseña="segura123")
+
+        monkeypatch.setattr(Usuario, "COSTE_BCRYPT", 5)
+        assert usuario.necesita_rehash()
+        assert usuario.iniciar_sesion("juan@example.com", "segura123")
+        assert usuario.contraseña.startswith("$2b$05$")
+        assert usuario.verificar_contraseña("segura123")
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_sin_rehash_si_la_contraseña_es_incorrecta(self, monkeypatch):
+        """Prueba de error: una contraseña incorrecta no modifica el hash guardado"""
+        monkeypatch.setattr(Usuario, "COSTE_BCRYPT", 4)
+        usuario = Usuario(nombre="Juan", correo="juan@example.com", contraseña="segura123")
+        hash_anterior = usuario.contraseña
+
+        monkeypatch.setattr(Usuario, "COSTE_BCRYPT", 5)
+        with pytest.raises(ContrasenaIncorrectaError):
+            usuario.iniciar_sesion("juan@example.com", "incorrecta")
+        assert usuario.contraseña == hash_anterior
+
+
+class TestEjecutorBD:
+    def setup_method(self):
+        os.environ.setdefault("KIVY_NO_ARGS", "1")
+        os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+        from kivy.clock import Clock
+        from src.view.segundo_plano import EjecutorBD
+
+        self.Clock = Clock
+        engine = crear_engine("test")
+        Base.metadata.create_all(bind=engine)
+        self.sesiones = []
+        fabrica = sessionmaker(bind=engine)
+
+        def nueva_sesion():
+            sesion = fabrica()
+            self.sesiones.append(sesion)
+            return sesion
+
+        self.ejecutor = EjecutorBD(fabrica_sesiones=nueva_sesion, max_workers=1)
+
+    def teardown_method(self):
+        self.ejecutor.cerrar()
+
+    def esperar(self, tarea):
+        # Los callbacks del futuro se ejecutan en orden: cuando corre este, ya se programó la entrega
+        import threading
+        entregado = threading.Event()
+        tarea.futuro.add_done_callback(lambda futuro: entregado.set())
+        assert entregado.wait(5)
+        self.Clock.tick()
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_resultado_se_entrega_en_el_hilo_de_kivy(self):
+        """Prueba normal: la función recibe su propia sesión y el resultado llega por el Clock"""
+        import threading
+        resultados = []
+        hilos = []
+
+        def contar(db):
+            hilos.append(threading.current_thread().name)
+            return db.scalar(select(func.count()).select_from(Usuario))
+
+        tarea = self.ejecutor.enviar(contar, resultados.append)
+        self.esperar(tarea)
+        assert resultados == [0]
+        assert hilos[0].startswith("datos")
+        assert len(self.sesiones) == 1
+
+    def test_error_se_entrega_a_al_fallar(self):
+        """Prueba normal: las excepciones de la tarea llegan a al_fallar y no a al_terminar"""
+        resultados, errores = [], []
+
+        def fallar(db):
+            raise ValueError("fallo")
+
+        tarea = self.ejecutor.enviar(fallar, resultados.append, errores.append)
+        self.esperar(tarea)
+        assert resultados == []
+        assert str(errores[0]) == "fallo"
+
+    # ---- PRUEBAS EXTREMAS ----
+
+    def test_tarea_cancelada_en_cola_no_se_ejecuta(self):
+        """Prueba extrema: una tarea cancelada antes de empezar no abre sesión ni entrega nada"""
+        import threading
+        liberar = threading.Event()
+        resultados = []
+
+        bloqueo = self.ejecutor.enviar(lambda db: liberar.wait(5), lambda r: None)
+        tarea = self.ejecutor.enviar(lambda db: 1, resultados.append)
+        tarea.cancelar()
+        liberar.set()
+        self.esperar(bloqueo)
+        self.Clock.tick()
+        assert tarea.cancelada
+        assert resultados == []
+        assert len(self.sesiones) == 1
+
+    def test_tarea_cancelada_en_curso_no_entrega_resultado(self):
+        """Prueba extrema: si se cancela mientras se ejecuta, el resultado se descarta"""
+        import threading
+        empezada, liberar = threading.Event(), threading.Event()
+        resultados = []
+
+        def lenta(db):
+            empezada.set()
+            liberar.wait(5)
+            return 1
+
+        tarea = self.ejecutor.enviar(lenta, resultados.append)
+        empezada.wait(5)
+        tarea.cancelar()
+        liberar.set()
+        self.esperar(tarea)
+        assert resultados == []
+
+
+class TestOperacionesAsync:
+    def setup_method(self):
+        self.coste = Usuario.COSTE_BCRYPT
+        Usuario.COSTE_BCRYPT = 4
+
+    def teardown_method(self):
+        Usuario.COSTE_BCRYPT = self.coste
+
+    def ejecutar(self, prueba):
+        """Crea una base SQLite en memoria (aiosqlite) con categorías y ejecuta prueba(Sesiones)"""
+        import asyncio
+
+        async def principal():
+            engine = crear_engine_async("test")
+            try:
+                async with engine.begin() as conexion:
+                    await conexion.run_sync(Base.metadata.create_all)
+                Sesiones = crear_sesiones_async(engine)
+                async with Sesiones() as db:
+                    db.add_all([Categoria(nombre="Comida", tipo="Egreso"), Categoria(nombre="Salario", tipo="Ingreso")])
+                    await db.commit()
+                return await prueba(Sesiones)
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(principal())
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_url_async_usa_el_driver_del_motor(self):
+        """Prueba normal: la URL síncrona se traduce a asyncpg o aiosqlite"""
+        assert url_async("postgresql+psycopg2://u:p@localhost/db").drivername == "postgresql+asyncpg"
+        assert url_async("sqlite:///gastos.db").drivername == "sqlite+aiosqlite"
+
+    def test_flujo_completo(self):
+        """Prueba normal: crear usuario, iniciar sesión, registrar, listar y eliminar"""
+        async def prueba(Sesiones):
+            async with Sesiones() as db:
+                usuario = await operaciones_async.crear_usuario(db, "Ana", "ana@example.com", "segura123")
+            async with Sesiones() as db:
+                usuario = await operaciones_async.iniciar_sesion(db, "ana@example.com", "segura123")
+                transaccion = await operaciones_async.registrar_transaccion(db, usuario.id, 25.0, "Egreso", "Comida")
+                pagina = await operaciones_async.listar_transacciones(db, usuario.id)
+                resumen = await db.scalar(select(ResumenMensual.total))
+                eliminada = await operaciones_async.eliminar_transaccion(db, usuario.id, transaccion.id)
+                restantes = await db.scalar(select(func.count()).select_from(Transaccion))
+            return usuario, pagina, resumen, eliminada, restantes
+
+        usuario, pagina, resumen, eliminada, restantes = self.ejecutar(prueba)
+        assert usuario.nombre == "Ana"
+        assert [(f.cantidad, f.categoria_nombre) for f in pagina.filas] == [(25.0, "Comida")]
+        assert resumen == 25.0
+        assert eliminada
+        assert restantes == 0
+
+    # ---- PRUEBAS EXTREMAS ----
+
+    def test_operaciones_concurrentes(self):
+        """Prueba extrema: varias tareas registran a la vez, cada una con su sesión"""
+        import asyncio
+
+        async def prueba(Sesiones):
+            async with Sesiones() as db:
+                usuario = await operaciones_async.crear_usuario(db, "Ana", "ana@example.com", "segura123")
+
+            async def registrar(i):
+                async with Sesiones() as db:
+                    await operaciones_async.registrar_transaccion(db, usuario.id, float(i), "Ingreso", "Salario")
+
+            await asyncio.gather(*(registrar(i) for i in range(20)))
+            async with Sesiones() as db:
+                return await operaciones_async.listar_transacciones(db, usuario.id, tamano=50)
+
+        pagina = self.ejecutar(prueba)
+        assert sorted(f.cantidad for f in pagina.filas) == [float(i) for i in range(20)]
+
+    def test_listado_y_resumen_incluyen_el_archivo(self, tmp_path):
+        """Prueba extrema: con la opción archivo, el engine asíncrono lista y resume también lo archivado"""
+        import asyncio
+
+        async def principal():
+            engine = crear_engine_async("test", archivo=str(tmp_path))
+            try:
+                async with engine.begin() as conexion:
+                    await conexion.run_sync(Base.metadata.create_all)
+                async with crear_sesiones_async(engine)() as db:
+                    db.add(Categoria(nombre="Comida", tipo="Egreso"))
+                    await db.commit()
+                    usuario = await operaciones_async.crear_usuario(db, "Ana", "ana@example.com", "segura123")
+                    for cantidad, fecha in ((10.0, datetime(2020, 5, 1)), (5.0, datetime(2024, 5, 1))):
+                        await operaciones_async.registrar_transaccion(db, usuario.id, cantidad, "Egreso", "Comida",
+                                                                      fecha=fecha)
+                    await db.run_sync(lambda sesion: ArchivoFrio.de(sesion).archivar(sesion, datetime(2021, 1, 1)))
+                    await db.commit()
+                    pagina = await operaciones_async.listar_transacciones(db, usuario.id)
+                    resumen = await operaciones_async.resumen(db, usuario.id)
+                    en_tabla = await db.scalar(select(func.count()).select_from(Transaccion))
+                return pagina, resumen, en_tabla
+            finally:
+                await engine.dispose()
+
+        pagina, resumen, en_tabla = asyncio.run(principal())
+        assert en_tabla == 1
+        assert [f.cantidad for f in pagina.filas] == [5.0, 10.0]
+        assert resumen["balance"] == (0.0, 15.0, -15.0)
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_correo_duplicado(self):
+        """Prueba de error: no se puede crear dos usuarios con el mismo correo"""
+        async def prueba(Sesiones):
+            async with Sesiones() as db:
+                await operaciones_async.crear_usuario(db, "Ana", "ana@example.com", "segura123")
+                await operaciones_async.crear_usuario(db, "Otra", "ana@example.com", "segura123")
+
+        with pytest.raises(CorreoYaRegistradoError):
+            self.ejecutar(prueba)
+
+    def test_contrasena_incorrecta(self):
+        """Prueba de error: credenciales incorrectas o correo inexistente"""
+        async def prueba(Sesiones):
+            async with Sesiones() as db:
+                await operaciones_async.crear_usuario(db, "Ana", "ana@example.com", "segura123")
+            errores = 0
+            for correo, contrasena in [("ana@example.com", "incorrecta"), ("nadie@example.com", "segura123")]:
+                async with Sesiones() as db:
+                    try:
+                        await operaciones_async.iniciar_sesion(db, correo, contrasena)
+                    except ContrasenaIncorrectaError:
+                        errores += 1
+            return errores
+
+        assert self.ejecutar(prueba) == 2
+
+    def test_eliminar_transaccion_de_otro_usuario(self):
+        """Prueba de error: no se elimina una transacción que pertenece a otro usuario"""
+        async def prueba(Sesiones):
+            async with Sesiones() as db:
+                ana = await operaciones_async.crear_usuario(db, "Ana", "ana@example.com", "segura123")
+                luis = await operaciones_async.crear_usuario(db, "Luis", "luis@example.com", "segura123")
+                transaccion = await operaciones_async.registrar_transaccion(db, ana.id, 5.0, "Egreso", "Comida")
+                return await operaciones_async.eliminar_transaccion(db, luis.id, transaccion.id)
+
+        assert self.ejecutar(prueba) is False
+
+    def test_categoria_invalida(self):
+        """Prueba de error: la categoría se valida igual que en el código síncrono"""
+        async def prueba(Sesiones):
+            async with Sesiones() as db:
+                usuario = await operaciones_async.crear_usuario(db, "Ana", "ana@example.com", "segura123")
+                await operaciones_async.registrar_transaccion(db, usuario.id, 5.0, "Egreso", "Salario")
+
+        with pytest.raises(ValueError):
+            self.ejecutar(prueba)
+
+
+class TestServicios:
+    def setup_method(self):
+        self.coste = Usuario.COSTE_BCRYPT
+        Usuario.COSTE_BCRYPT = 4
+        self.engine = crear_engine("test")
+        Base.metadata.create_all(bind=self.engine)
+        self.fabrica = sessionmaker(bind=self.engine)
+        self.session_local = servicios.SessionLocal
+        servicios.SessionLocal = self.fabrica
+
+        with self.fabrica() as db:
+            db.add_all([Categoria(nombre="Comida", tipo="Egreso"), Categoria(nombre="Salario", tipo="Ingreso")])
+            db.commit()
+        self.usuario = servicios.crear_usuario("Ana", "ana@example.com", "segura123")
+
+    def teardown_method(self):
+        servicios.SessionLocal = self.session_local
+        Usuario.COSTE_BCRYPT = self.coste
+        self.engine.dispose()
+
+    def contar_transacciones(self):
+        with self.fabrica() as db:
+            return db.scalar(select(func.count()).select_from(Transaccion))
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_objetos_devueltos_se_pueden_leer(self):
+        """Prueba normal: el usuario devuelto conserva sus datos tras cerrar la sesión"""
+        usuario = servicios.iniciar_sesion("ana@example.com", "segura123")
+        assert usuario.id == self.usuario.id
+        assert usuario.nombre == "Ana"
+
+    def test_registrar_listar_y_eliminar(self):
+        """Prueba normal: cada operación sin sesión confirma sus cambios"""
+        transaccion = servicios.registrar_transaccion(self.usuario.id, 30.0, "Egreso", "Comida")
+        pagina = servicios.listar_transacciones(self.usuario.id)
+        assert [(f.id, f.categoria_nombre) for f in pagina.filas] == [(transaccion.id, "Comida")]
+        assert servicios.eliminar_transaccion(self.usuario.id, transaccion.id)
+        assert self.contar_transacciones() == 0
+
+    def test_registrar_con_objeto_usuario(self):
+        """Prueba normal: se acepta el Usuario de la sesión iniciada en lugar de su id"""
+        servicios.registrar_transaccion(self.usuario, 10.0, "Ingreso", "Salario")
+        assert self.contar_transacciones() == 1
+
+    def test_registrar_con_la_sesion_iniciada_no_consulta_el_usuario(self):
+        """Prueba normal: con el UsuarioSesion de la sesión iniciada no se lee la fila del usuario"""
+        sesion = UsuarioSesion(self.usuario.id, "Ana", "ana@example.com")
+        servicios.categorias("Egreso")
+        sentencias = []
+        event.listen(self.engine, "before_cursor_execute", lambda *args: sentencias.append(args[2]))
+        transaccion = servicios.registrar_transaccion(sesion, 10.0, "Egreso", "Comida")
+        assert transaccion.usuario_id == self.usuario.id
+        assert not any("FROM usuarios" in sentencia for sentencia in sentencias)
+        assert self.contar_transacciones() == 1
+
+    def test_unidad_de_trabajo_con_un_solo_commit(self):
+        """Prueba normal: varias transacciones registradas bajo un único commit"""
+        commits = []
+        with servicios.unidad_de_trabajo() as db:
+            event.listen(db, "after_commit", lambda sesion: commits.append(1))
+            for i in range(5):
+                servicios.registrar_transaccion(self.usuario.id, float(i), "Egreso", "Comida", session=db)
+        assert commits == [1]
+        assert self.contar_transacciones() == 5
+
+    def test_resumen(self):
+        """Prueba normal: balance, categorías con más gasto y meses"""
+        servicios.registrar_transaccion(self.usuario.id, 100.0, "Ingreso", "Salario")
+        servicios.registrar_transaccion(self.usuario.id, 40.0, "Egreso", "Comida")
+        datos = servicios.resumen(self.usuario.id)
+        assert datos["balance"] == (100.0, 40.0, 60.0)
+        assert datos["top_categorias"] == [("Comida", 40.0)]
+        assert datos["meses"][-1][1:] == (100.0, 40.0, 60.0)
+
+    # ---- PRUEBAS EXTREMAS ----
+
+    def test_sesion_del_llamador_no_se_confirma(self):
+        """Prueba extrema: con una sesión externa, el commit es del llamador"""
+        db = self.fabrica()
+        servicios.registrar_transaccion(self.usuario.id, 10.0, "Egreso", "Comida", session=db)
+        db.rollback()
+        db.close()
+        assert self.contar_transacciones() == 0
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_unidad_de_trabajo_deshace_todo_si_falla(self):
+        """Prueba de error: si una operación falla, no se guarda ninguna del bloque"""
+        with pytest.raises(ValueError):
+            with servicios.unidad_de_trabajo() as db:
+                servicios.registrar_transaccion(self.usuario.id, 10.0, "Egreso", "Comida", session=db)
+                servicios.registrar_transaccion(self.usuario.id, -5.0, "Egreso", "Comida", session=db)
+        assert self.contar_transacciones() == 0
+
+    def test_correo_duplicado(self):
+        """Prueba de error: el correo ya registrado se rechaza"""
+        with pytest.raises(CorreoYaRegistradoError):
+            servicios.crear_usuario("Otra", "ana@example.com", "segura123")
+
+    def test_credenciales_incorrectas(self):
+        """Prueba de error: contraseña incorrecta o correo inexistente"""
+        with pytest.raises(ContrasenaIncorrectaError):
+            servicios.iniciar_sesion("ana@example.com", "incorrecta")
+        with pytest.raises(ContrasenaIncorrectaError):
+            servicios.iniciar_sesion("nadie@example.com", "segura123")
+
+    def test_usuario_inexistente(self):
+        """Prueba de error: no se registran transacciones para un id de usuario inexistente"""
+        with pytest.raises(UsuarioNoEncontradoError):
+            servicios.registrar_transaccion(9999, 10.0, "Egreso", "Comida")
+
+    def test_eliminar_transaccion_de_otro_usuario(self):
+        """Prueba de error: un usuario no puede eliminar transacciones ajenas"""
+        otro = servicios.crear_usuario("Luis", "luis@example.com", "segura123")
+        transaccion = servicios.registrar_transaccion(self.usuario.id, 10.0, "Egreso", "Comida")
+        assert not servicios.eliminar_transaccion(otro.id, transaccion.id)
+        assert self.contar_transacciones() == 1
+
+
+class TestCentimos:
+    def setup_method(self):
+        self.engine = create_engine("sqlite://")
+        Base.metadata.create_all(bind=self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.usuario = Usuario(nombre="Juan", correo="juan@example.com", contraseña="segura123")
+        self.categoria = Categoria(nombre="Comida", tipo="Egreso")
+        self.session.add_all([self.usuario, self.categoria])
+        self.session.commit()
+
+    def teardown_method(self):
+        self.session.close()
+
+    def registrar(self, cantidad):
+        transaccion = Transaccion(cantidad=cantidad, fecha=datetime(2024, 1, 15), tipo="Egreso",
+                                  categoria=self.categoria, usuario=self.usuario, session=self.session)
+        self.session.add(transaccion)
+        self.session.commit()
+        return transaccion
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_se_guarda_en_centimos_y_se_lee_como_decimal(self):
+        """Prueba normal: la columna guarda enteros y el modelo devuelve Decimal"""
+        transaccion = self.registrar(19.99)
+        self.session.expire_all()
+        assert transaccion.cantidad == Decimal("19.99")
+        assert self.session.execute(text("SELECT cantidad FROM transacciones")).scalar() == 1999
+        assert self.session.scalar(select(centimos(Transaccion.cantidad))) == 1999
+
+    def test_sumas_exactas(self):
+        """Prueba normal: diez importes de 0.10 suman exactamente 1.00 en SQL y en el resumen"""
+        for _ in range(10):
+            self.registrar("0.10")
+        total = self.session.scalar(select(func.sum(Transaccion.cantidad)))
+        assert total == Decimal("1.00")
+        assert self.session.scalar(select(ResumenMensual.total)) == Decimal("1.00")
+        assert reportes.balance(self.session, self.usuario.id, datetime(2024, 2, 1)) == (0, Decimal("1.00"), Decimal("-1.00"))
+
+    def test_redondeo_a_centimos(self):
+        """Prueba normal: los importes se redondean al céntimo (mitad hacia arriba)"""
+        assert redondear("2.345") == Decimal("2.35")
+        assert redondear(0.1) == Decimal("0.10")
+        assert a_centimos(Decimal("1234567.89")) == 123456789
+
+    # ---- PRUEBAS EXTREMAS ----
+
+    def test_importe_grande(self):
+        """Prueba extrema: importes que no caben en un float sin perder céntimos"""
+        transaccion = self.registrar("12345678901234.56")
+        self.session.expire_all()
+        assert transaccion.cantidad == Decimal("12345678901234.56")
+
+    def test_importe_maximo(self):
+        """Prueba extrema: el mayor importe admitido se guarda como el mayor BIGINT"""
+        assert a_centimos(CANTIDAD_MAXIMA) == 2 ** 63 - 1
+        transaccion = self.registrar(str(CANTIDAD_MAXIMA))
+        self.session.expire_all()
+        assert transaccion.cantidad == CANTIDAD_MAXIMA
+
+    def test_migracion_de_cantidades_float(self):
+        """Prueba extrema: una base con cantidades FLOAT se migra a céntimos conservando ids y resumen"""
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        with engine.begin() as conexion:
+            conexion.execute(text(
+                "CREATE TABLE transacciones (id INTEGER PRIMARY KEY, cantidad FLOAT NOT NULL, fecha DATETIME NOT NULL, "
+                "tipo VARCHAR(7) NOT NULL, categoria_id INTEGER NOT NULL, usuario_id INTEGER NOT NULL)"
+            ))
+            conexion.execute(text("CREATE INDEX ix_viejo ON transacciones (usuario_id)"))
+            conexion.execute(text(
+                "CREATE TABLE resumen_mensual (usuario_id INTEGER, anio_mes VARCHAR(7), categoria_id INTEGER, "
+                "tipo VARCHAR(7), total FLOAT NOT NULL, num_transacciones INTEGER NOT NULL, "
+                "PRIMARY KEY (usuario_id, anio_mes, categoria_id, tipo))"
+            ))
+            conexion.execute(text(
+                "INSERT INTO transacciones VALUES (7, 19.99, '2024-01-15 00:00:00.000000', 'EGRESO', 1, 1), "
+                "(9, 0.1, '2024-01-16 00:00:00.000000', 'EGRESO', 1, 1)"
+            ))
+
+        crear_esquema(engine)
+        crear_esquema(engine)  # idempotente
+
+        with sessionmaker(bind=engine)() as db:
+            assert db.execute(text("SELECT id, cantidad FROM transacciones ORDER BY id")).all() == [(7, 1999), (9, 10)]
+            assert db.get(Transaccion, 7).cantidad == Decimal("19.99")
+            assert db.scalar(select(ResumenMensual.total)) == Decimal("20.09")
+        assert "ix_transacciones_usuario_fecha_id" in {i["name"] for i in inspect(engine).get_indexes("transacciones")}
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_cantidad_invalida(self):
+        """Prueba de error: textos que no son números y valores no finitos se rechazan"""
+        for valor in ("abc", "", "nan", "inf"):
+            with pytest.raises(ValueError):
+                redondear(valor)
+
+    def test_cantidad_fuera_de_rango(self):
+        """Prueba de error: importes que no caben en BIGINT o en la precisión de quantize dan ValueError"""
+        for valor in ("1e30", "1e26", CANTIDAD_MAXIMA + CENTIMO, -(CANTIDAD_MAXIMA + CENTIMO)):
+            with pytest.raises(ValueError):
+                redondear(valor)
+        with pytest.raises(ValueError):
+            self.registrar(str(CANTIDAD_MAXIMA + CENTIMO))
+
+    def test_cantidad_negativa(self):
+        """Prueba de error: las cantidades negativas siguen sin permitirse"""
+        with pytest.raises(ValueError):
+            self.registrar("-0.01")
+
+
+class TestAnalitica:
+    def setup_method(self):
+        engine = create_engine("sqlite://")
+        crear_esquema(engine)
+        self.session = sessionmaker(bind=engine)()
+        self.usuario = Usuario(nombre="Juan", correo="juan@example.com", contraseña="segura123")
+        otro = Usuario(nombre="Ana", correo="ana@example.com", contraseña="segura123")
+        self.salario = Categoria(nombre="Salario", tipo="Ingreso")
+        self.comida = Categoria(nombre="Alimentación", tipo="Egreso")
+        self.transporte = Categoria(nombre="Transporte", tipo="Egreso")
+        self.session.add_all([self.usuario, otro, self.salario, self.comida, self.transporte])
+        self.session.commit()
+
+        datos = [
+            ("1000.00", datetime(2024, 1, 1, 9), "Ingreso", self.salario),
+            ("200.10", datetime(2024, 1, 3), "Egreso", self.comida),
+            ("49.90", datetime(2024, 1, 3, 20), "Egreso", self.transporte),
+            ("1000.00", datetime(2024, 2, 1), "Ingreso", self.salario),
+            ("300.00", datetime(2024, 3, 10), "Egreso", self.comida),
+        ]
+        for cantidad, fecha, tipo, categoria in datos:
+            self.session.add(Transaccion(cantidad, fecha, tipo, categoria, self.usuario, self.session))
+        self.session.add(Transaccion(999.0, datetime(2024, 1, 5), "Egreso", self.comida, otro, self.session))
+        self.session.commit()
+        self.historial = HistorialColumnar.cargar(self.session, self.usuario.id)
+
+    def teardown_method(self):
+        self.session.close()
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_carga_en_arrays_contiguos(self):
+        """Prueba normal: solo las transacciones del usuario, ordenadas por fecha y en céntimos"""
+        assert len(self.historial) == 5
+        assert self.historial.cantidad.dtype == np.int64
+        assert self.historial.cantidad.flags["C_CONTIGUOUS"]
+        assert self.historial.cantidad.tolist() == [100000, 20010, 4990, 100000, 30000]
+        assert self.historial.signo.tolist() == [1, -1, -1, 1, -1]
+        assert self.historial.fecha[0] == np.datetime64("2024-01-01T09:00")
+        assert self.historial.categoria_id[1] == self.comida.id
+
+    def test_totales_por_periodo_coinciden_con_reportes(self):
+        """Prueba normal: los totales mensuales coinciden con los de reportes"""
+        periodos, ingresos, egresos, neto = self.historial.totales_por_periodo("mes")
+        esperado = reportes.totales_por_periodo(self.session, self.usuario.id, "mes")
+        assert [str(p) for p in periodos] == [p for p, _, _, _ in esperado]
+        assert [a_decimal(i) for i in ingresos] == [i for _, i, _, _ in esperado]
+        assert [a_decimal(e) for e in egresos] == [e for _, _, e, _ in esperado]
+        assert [a_decimal(n) for n in neto] == [n for _, _, _, n in esperado]
+
+    def test_semanas_empiezan_en_lunes(self):
+        """Prueba normal: el 2024-03-10 (domingo) pertenece a la semana del lunes 2024-03-04"""
+        periodos, _, egresos, _ = self.historial.totales_por_periodo("semana")
+        assert periodos[-1] == np.datetime64("2024-03-04")
+        assert egresos[-1] == 30000
+
+    def test_totales_por_categoria(self):
+        """Prueba normal: total y número de transacciones por categoría, de mayor a menor"""
+        ids, totales, cuentas = self.historial.totales_por_categoria("Egreso")
+        assert ids.tolist() == [self.comida.id, self.transporte.id]
+        assert totales.tolist() == [50010, 4990]
+        assert cuentas.tolist() == [2, 1]
+
+    def test_serie_incluye_periodos_sin_transacciones(self):
+        """Prueba normal: la serie diaria tiene un valor por día, con 0 en los días vacíos"""
+        periodos, neto = self.historial.serie("dia", desde=datetime(2024, 1, 1), hasta=datetime(2024, 1, 4))
+        assert periodos.tolist() == [np.datetime64("2024-01-01") + i for i in range(4)]
+        assert neto.tolist() == [100000, 0, -25000, 0]
+
+    def test_ventanas_moviles(self):
+        """Prueba normal: suma y media de ventanas de dos meses del gasto"""
+        periodos, sumas = self.historial.suma_movil(2, "mes", "Egreso")
+        assert [str(p) for p in periodos] == ["2024-02", "2024-03"]
+        assert sumas.tolist() == [25000, 30000]
+        _, medias = self.historial.media_movil(2, "mes", "Egreso")
+        assert medias.tolist() == [12500.0, 15000.0]
+
+    def test_balance_acumulado(self):
+        """Prueba normal: el saldo final coincide con el balance de reportes"""
+        periodos, saldo = self.historial.balance_acumulado("mes")
+        assert saldo.tolist() == [75000, 175000, 145000]
+        assert a_decimal(saldo[-1]) == reportes.balance(self.session, self.usuario.id)[2]
+
+    def test_comparar_periodos(self):
+        """Prueba normal: diferencia y variación de cada mes frente al anterior"""
+        _, totales, diferencia, variacion = self.historial.comparar_periodos("mes", "Egreso")
+        assert totales.tolist() == [25000, 0, 30000]
+        assert diferencia.tolist() == [25000, -25000, 30000]
+        assert np.isnan(variacion[0]) and variacion[1] == -1.0 and np.isnan(variacion[2])
+
+    # ---- PRUEBAS EXTREMAS ----
+
+    def test_usuario_sin_transacciones(self):
+        """Prueba extrema: un usuario sin datos da arrays vacíos en todas las operaciones"""
+        vacio = HistorialColumnar.cargar(self.session, 999)
+        assert len(vacio) == 0
+        assert len(vacio.totales_por_periodo()[0]) == 0
+        assert len(vacio.serie()[1]) == 0
+        assert len(vacio.media_movil(7)[1]) == 0
+        assert len(vacio.comparar_periodos()[3]) == 0
+
+    def test_historial_vacio_con_un_solo_limite(self):
+        """Prueba extrema: sin transacciones y con un solo límite la serie es vacía; con los dos, ceros"""
+        vacio = HistorialColumnar.cargar(self.session, 999)
+        assert len(vacio.serie("mes", desde=datetime(2024, 1, 1))[0]) == 0
+        assert len(vacio.serie("mes", hasta=datetime(2024, 3, 1))[0]) == 0
+        assert vacio.serie("mes", desde=datetime(2024, 1, 1), hasta=datetime(2024, 3, 1))[1].tolist() == [0, 0, 0]
+
+    def test_rango_de_carga(self):
+        """Prueba extrema: cargar solo un rango de fechas"""
+        historial = HistorialColumnar.cargar(self.session, self.usuario.id, desde=datetime(2024, 2, 1),
+                                             hasta=datetime(2024, 2, 28))
+        assert historial.cantidad.tolist() == [100000]
+
+    def test_ventana_mayor_que_la_serie(self):
+        """Prueba extrema: una ventana más larga que la serie no da resultados"""
+        periodos, sumas = self.historial.suma_movil(12, "mes")
+        assert len(periodos) == 0 and len(sumas) == 0
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_periodo_invalido(self):
+        """Prueba de error: agrupar por un periodo que no existe"""
+        with pytest.raises(ValueError):
+            self.historial.totales_por_periodo("trimestre")
+
+    def test_ventana_invalida(self):
+        """Prueba de error: la ventana debe ser de al menos un periodo"""
+        with pytest.raises(ValueError):
+            self.historial.suma_movil(0)
+
+    def test_rango_invertido(self):
+        """Prueba de error: la fecha inicial es posterior a la final"""
+        with pytest.raises(ValueError):
+            HistorialColumnar.cargar(self.session, self.usuario.id, datetime(2024, 3, 1), datetime(2024, 1, 1))
+
+
+class TestArchivoFrio:
+    def setup_method(self, method):
+        self.engine = create_engine("sqlite://", poolclass=StaticPool)
+        crear_esquema(self.engine)
+        self.session = sessionmaker(bind=self.engine)()
+        self.usuario = Usuario(nombre="Juan", correo="juan@example.com", contraseña="segura123")
+        self.otro = Usuario(nombre="Ana", correo="ana@example.com", contraseña="segura123")
+        self.salario = Categoria(nombre="Salario", tipo="Ingreso")
+        self.comida = Categoria(nombre="Alimentación", tipo="Egreso")
+        self.transporte = Categoria(nombre="Transporte", tipo="Egreso")
+        self.session.add_all([self.usuario, self.otro, self.salario, self.comida, self.transporte])
+        self.session.commit()
+
+        datos = [
+            ("1000.00", datetime(2021, 1, 1), "Ingreso", self.salario),
+            ("200.10", datetime(2021, 6, 3), "Egreso", self.comida),
+            ("49.90", datetime(2021, 6, 3), "Egreso", self.transporte),
+            ("1200.00", datetime(2022, 2, 1), "Ingreso", self.salario),
+            ("300.00", datetime(2022, 3, 10), "Egreso", self.comida),
+            ("80.00", datetime(2023, 5, 1), "Egreso", self.transporte),
+            ("1300.00", datetime(2024, 1, 1), "Ingreso", self.salario),
+            ("15.25", datetime(2024, 1, 2), "Egreso", self.comida),
+        ]
+        for cantidad, fecha, tipo, categoria in datos:
+            self.session.add(Transaccion(cantidad, fecha, tipo, categoria, self.usuario, self.session))
+        self.session.add(Transaccion("999.00", datetime(2021, 1, 5), "Egreso", self.comida, self.otro, self.session))
+        self.session.commit()
+
+    def teardown_method(self):
+        self.session.close()
+        ArchivoFrio.olvidar(self.engine)
+
+    def reportes_y_listado(self):
+        u = self.usuario.id
+        filas = []
+        pagina = pagina_transacciones(self.session, u, tamano=3)
+        while True:
+            filas.extend((f.id, f.cantidad, f.fecha, f.tipo, f.categoria_nombre) for f in pagina.filas)
+            if not pagina.siguiente:
+                break
+            pagina = pagina_transacciones(self.session, u, tamano=3, despues=pagina.siguiente)
+        historial = HistorialColumnar.cargar(self.session, u)
+        return {
+            "balance": reportes.balance(self.session, u),
+            "balance_2022": reportes.balance(self.session, u, datetime(2022, 12, 31)),
+            "por_tipo": sorted(reportes.totales_por_tipo(self.session, u)),
+            "por_categoria": reportes.totales_por_categoria(self.session, u),
+            "top": reportes.top_categorias(self.session, u, n=2),
+            "por_mes": reportes.totales_por_periodo(self.session, u, "mes"),
+            "por_semana_2021": reportes.totales_por_periodo(self.session, u, "semana", hasta=datetime(2021, 12, 31)),
+            "listado": filas,
+            "historial": (historial.fecha.tolist(), historial.cantidad.tolist()),
+        }
+
+    def archivar(self, directorio, antes, usuario_id=None):
+        archivo = ArchivoFrio.registrar(self.engine, str(directorio))
+        movidas = archivo.archivar(self.session, antes, usuario_id)
+        self.session.commit()
+        return archivo, movidas
+
+    def filas_en_tabla(self, usuario_id):
+        return self.session.scalar(select(func.count()).select_from(Transaccion).where(Transaccion.usuario_id == usuario_id))
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_archivar_mueve_las_filas_a_archivos_por_usuario_y_anio(self, tmp_path):
+        """Prueba normal: las transacciones antiguas salen de la tabla y quedan en un directorio por año"""
+        archivo, movidas = self.archivar(tmp_path, datetime(2023, 1, 1))
+        assert movidas == {(self.usuario.id, 2021): 3, (self.usuario.id, 2022): 2, (self.otro.id, 2021): 1}
+        assert self.filas_en_tabla(self.usuario.id) == 3
+        assert archivo.anios(self.usuario.id) == [2021, 2022]
+        columnas = archivo.leer(self.usuario.id, 2021)
+        assert isinstance(columnas["cantidad"], np.memmap)
+        assert columnas["cantidad"].tolist() == [100000, 20010, 4990]
+        assert columnas["signo"].tolist() == [1, -1, -1]
+
+    def test_reportes_y_listado_incluyen_las_archivadas(self, tmp_path):
+        """Prueba normal: los reportes, el listado y el historial son iguales antes y después de archivar"""
+        antes = self.reportes_y_listado()
+        self.archivar(tmp_path, datetime(2023, 1, 1))
+        assert self.reportes_y_listado() == antes
+
+    def test_restaurar_devuelve_las_filas_a_la_tabla(self, tmp_path):
+        """Prueba normal: restaurar recupera las filas con sus ids y el resumen mensual"""
+        ids = set(self.session.scalars(select(Transaccion.id)))
+        resumen = self.session.execute(select(ResumenMensual.anio_mes, ResumenMensual.total)
+                                       .order_by(ResumenMensual.anio_mes, ResumenMensual.total)).all()
+        archivo, _ = self.archivar(tmp_path, datetime(2023, 1, 1))
+        assert archivo.restaurar(self.session, self.usuario.id, 2021) == 3
+        assert archivo.restaurar(self.session, self.usuario.id) == 2
+        assert archivo.restaurar(self.session, self.otro.id) == 1
+        self.session.commit()
+        assert set(self.session.scalars(select(Transaccion.id))) == ids
+        assert archivo.anios(self.usuario.id) == []
+        assert self.session.execute(select(ResumenMensual.anio_mes, ResumenMensual.total)
+                                    .order_by(ResumenMensual.anio_mes, ResumenMensual.total)).all() == resumen
+
+    # ---- PRUEBAS EXTREMAS ----
+
+    def test_archivar_dos_veces_el_mismo_anio(self, tmp_path):
+        """Prueba extrema: un segundo corte dentro del mismo año añade las filas al año ya archivado"""
+        archivo, _ = self.archivar(tmp_path, datetime(2021, 3, 1), self.usuario.id)
+        antes = self.reportes_y_listado()
+        self.archivar(tmp_path, datetime(2022, 1, 1), self.usuario.id)
+        assert archivo.leer(self.usuario.id, 2021)["cantidad"].tolist() == [100000, 20010, 4990]
+        assert self.reportes_y_listado() == antes
+
+    def test_rollback_deja_el_archivo_como_estaba(self, tmp_path):
+        """Prueba extrema: si la sesión se deshace, las filas siguen en la tabla y no quedan archivos"""
+        archivo, _ = self.archivar(tmp_path, datetime(2022, 1, 1), self.usuario.id)
+        archivo.archivar(self.session, datetime(2023, 1, 1), self.usuario.id)
+        archivo.restaurar(self.session, self.usuario.id, 2021)
+        self.session.rollback()
+        assert self.filas_en_tabla(self.usuario.id) == 5
+        assert archivo.anios(self.usuario.id) == [2021]
+        assert len(archivo.leer(self.usuario.id, 2021)["id"]) == 3
+        assert sorted(os.listdir(tmp_path / str(self.usuario.id))) == ["2021"]
+
+    def test_id_reutilizado_al_restaurar(self, tmp_path):
+        """Prueba extrema: si el id original ya está en uso, la fila se restaura con uno nuevo"""
+        archivo, _ = self.archivar(tmp_path, datetime(2021, 1, 2), self.usuario.id)
+        id_archivado = archivo.leer(self.usuario.id, 2021)["id"][0]
+        ocupante = Transaccion("1.00", datetime(2024, 2, 1), "Egreso", self.comida, self.otro, self.session, id=int(id_archivado))
+        self.session.add(ocupante)
+        self.session.commit()
+        assert archivo.restaurar(self.session, self.usuario.id) == 1
+        self.session.commit()
+        assert self.filas_en_tabla(self.usuario.id) == 8
+
+    def test_sin_archivo_registrado(self):
+        """Prueba extrema: sin archivo, los reportes solo consultan la tabla"""
+        assert ArchivoFrio.de(self.session) is None
+        assert reportes.balance(self.session, self.usuario.id)[0] == Decimal("3500.00")
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_restaurar_un_anio_no_archivado(self, tmp_path):
+        """Prueba de error: restaurar un año que no está en el archivo"""
+        archivo, _ = self.archivar(tmp_path, datetime(2022, 1, 1))
+        with pytest.raises(ValueError):
+            archivo.restaurar(self.session, self.usuario.id, 2019)
+
+
+class TestSincronizacion:
+    CORREO = "juan@example.com"
+
+    def setup_method(self, method):
+        Usuario.COSTE_BCRYPT = 4
+        self.directorio = tempfile.mkdtemp()
+        self.local = crear_engine_local(os.path.join(self.directorio, "cliente.db"))
+        self.remoto = crear_engine_local(os.path.join(self.directorio, "servidor.db"))
+        for engine in (self.local, self.remoto):
+            crear_esquema(engine)
+            with sessionmaker(bind=engine)() as db:
+                db.add(Categoria(nombre="Alimentación", tipo="Egreso"))
+                db.commit()
+        with sessionmaker(bind=self.local)() as db:
+            db.add(Categoria(nombre="Salario", tipo="Ingreso"))
+            db.add(Usuario(nombre="Juan", correo=self.CORREO, contraseña="segura123"))
+            db.commit()
+        self.sincronizador = Sincronizador(self.local, self.remoto)
+
+    def teardown_method(self):
+        self.local.dispose()
+        self.remoto.dispose()
+        shutil.rmtree(self.directorio, ignore_errors=True)
+        CatalogoCategorias.invalidar()
+        Usuario.COSTE_BCRYPT = 12
+
+    def registrar(self, engine, cantidad, tipo="Egreso", categoria="Alimentación", fecha=datetime(2024, 1, 10)):
+        with sessionmaker(bind=engine, expire_on_commit=False)() as db:
+            usuario_id = db.scalar(select(Usuario.id).where(Usuario.correo == self.CORREO))
+            transaccion = servicios.registrar_transaccion(usuario_id, cantidad, tipo, categoria, fecha=fecha, session=db)
+            db.commit()
+            return transaccion.uid
+
+    def cantidades(self, engine):
+        with sessionmaker(bind=engine)() as db:
+            return {t.uid: t.cantidad for t in db.scalars(select(Transaccion))}
+
+    def totales_resumen(self, engine):
+        with sessionmaker(bind=engine)() as db:
+            return sorted((r.anio_mes, r.tipo.value, r.total) for r in db.query(ResumenMensual))
+
+    def modificar(self, engine, uid, cantidad, modificada):
+        with sessionmaker(bind=engine)() as db:
+            transaccion = db.scalar(select(Transaccion).where(Transaccion.uid == uid))
+            transaccion.modificar_cantidad(cantidad)
+            transaccion.modificada = modificada
+            db.commit()
+
+    def eliminar(self, engine, uid, eliminada=None):
+        with sessionmaker(bind=engine)() as db:
+            db.delete(db.scalar(select(Transaccion).where(Transaccion.uid == uid)))
+            db.commit()
+            if eliminada is not None:
+                db.execute(TransaccionEliminada.__table__.update().values(eliminada=eliminada))
+                db.commit()
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_almacen_local_en_modo_wal(self):
+        """Prueba normal: el almacén local usa journal_mode=WAL"""
+        with self.local.connect() as conexion:
+            assert conexion.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+
+    def test_envia_altas_locales_y_crea_usuario_y_categorias(self):
+        """Prueba normal: las altas locales llegan al servidor con su usuario, categoría y resumen"""
+        self.registrar(self.local, "10.50")
+        self.registrar(self.local, "1000", "Ingreso", "Salario")
+        resumen = self.sincronizador.sincronizar(self.CORREO)
+        assert (resumen.enviadas, resumen.recibidas) == (2, 0)
+        assert self.cantidades(self.remoto) == self.cantidades(self.local)
+        assert self.totales_resumen(self.remoto) == self.totales_resumen(self.local)
+
+        repetida = self.sincronizador.sincronizar(self.CORREO)
+        assert (repetida.enviadas, repetida.recibidas, repetida.eliminadas_en_local) == (0, 0, 0)
+
+    def test_recibe_altas_y_bajas_del_servidor(self):
+        """Prueba normal: los cambios hechos en el servidor se aplican en el almacén local"""
+        uid = self.registrar(self.local, "10.50")
+        self.sincronizador.sincronizar(self.CORREO)
+        self.eliminar(self.remoto, uid)
+        nuevo = self.registrar(self.remoto, "7.25")
+
+        resumen = self.sincronizador.sincronizar(self.CORREO)
+        assert (resumen.recibidas, resumen.eliminadas_en_local) == (1, 1)
+        assert self.cantidades(self.local) == {nuevo: Decimal("7.25")}
+        assert self.totales_resumen(self.local) == self.totales_resumen(self.remoto)
+
+    def test_eliminacion_local_se_envia(self):
+        """Prueba normal: una baja local elimina la transacción del servidor"""
+        uid = self.registrar(self.local, "10.50")
+        self.sincronizador.sincronizar(self.CORREO)
+        self.eliminar(self.local, uid)
+        assert self.sincronizador.sincronizar(self.CORREO).eliminadas_en_servidor == 1
+        assert self.cantidades(self.remoto) == {}
+        assert self.totales_resumen(self.remoto) == []
+
+    # ---- PRUEBAS EXTREMAS ----
+
+    def test_conflicto_gana_la_modificacion_mas_reciente(self):
+        """Prueba extrema: si la misma transacción cambia en las dos copias, gana la más reciente"""
+        uid = self.registrar(self.local, "10.00")
+        self.sincronizador.sincronizar(self.CORREO)
+        self.modificar(self.local, uid, "11.00", datetime(2030, 1, 1, 12, 0, 0))
+        self.modificar(self.remoto, uid, "12.00", datetime(2030, 1, 1, 11, 0, 0))
+        self.sincronizador.sincronizar(self.CORREO)
+        assert self.cantidades(self.remoto) == self.cantidades(self.local) == {uid: Decimal("11.00")}
+        assert self.totales_resumen(self.remoto) == self.totales_resumen(self.local)
+
+    def test_empate_gana_el_servidor(self):
+        """Prueba extrema: con la misma marca de tiempo se queda la versión del servidor"""
+        uid = self.registrar(self.local, "10.00")
+        self.sincronizador.sincronizar(self.CORREO)
+        self.eliminar(self.local, uid, eliminada=datetime(2030, 1, 1))
+        self.modificar(self.remoto, uid, "12.00", datetime(2030, 1, 1))
+        self.sincronizador.sincronizar(self.CORREO)
+        assert self.cantidades(self.local) == {uid: Decimal("12.00")}
+
+    def test_modificacion_posterior_a_la_baja_la_recupera(self):
+        """Prueba extrema: una modificación más reciente que la baja en la otra copia la restaura"""
+        uid = self.registrar(self.local, "10.00")
+        self.sincronizador.sincronizar(self.CORREO)
+        self.eliminar(self.local, uid, eliminada=datetime(2030, 1, 1))
+        self.modificar(self.remoto, uid, "15.00", datetime(2030, 1, 2))
+        self.sincronizador.sincronizar(self.CORREO)
+        assert self.cantidades(self.local) == {uid: Decimal("15.00")}
+        with sessionmaker(bind=self.local)() as db:
+            assert db.scalar(select(func.count()).select_from(TransaccionEliminada)) == 0
+
+    def test_envio_en_lotes(self, monkeypatch):
+        """Prueba extrema: más transacciones que el tamaño de lote"""
+        monkeypatch.setattr(sincronizacion, "TAMANO_LOTE", 3)
+        monkeypatch.setattr(sincronizacion._lotes, "__defaults__", (3,))
+        for i in range(10):
+            self.registrar(self.local, f"{i + 1}.00")
+        assert self.sincronizador.sincronizar(self.CORREO).enviadas == 10
+        assert self.cantidades(self.remoto) == self.cantidades(self.local)
+
+    def test_migracion_de_una_base_sin_uid(self):
+        """Prueba extrema: una tabla creada sin uid ni modificada se migra con uids únicos"""
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        with engine.begin() as conexion:
+            conexion.execute(text(
+                "CREATE TABLE transacciones (id INTEGER PRIMARY KEY, cantidad BIGINT NOT NULL, fecha DATETIME NOT NULL, "
+                "tipo VARCHAR(7) NOT NULL, categoria_id INTEGER NOT NULL, usuario_id INTEGER NOT NULL)"
+            ))
+            conexion.execute(text(
+                "INSERT INTO transacciones VALUES (1, 100, '2024-01-15 00:00:00.000000', 'EGRESO', 1, 1), "
+                "(2, 200, '2024-01-16 00:00:00.000000', 'EGRESO', 1, 1)"
+            ))
+        crear_esquema(engine)
+        crear_esquema(engine)
+        with engine.connect() as conexion:
+            uids = conexion.execute(text("SELECT uid FROM transacciones")).scalars().all()
+            assert len(set(uids)) == 2 and all(len(uid) == 32 for uid in uids)
+            assert conexion.execute(text("SELECT COUNT(*) FROM transacciones WHERE modificada IS NULL")).scalar() == 0
+
+    def test_migracion_completa_uid_nulos_y_crea_indice_unico(self):
+        """Prueba extrema: en una base ya migrada, las filas sin uid se completan y uid pasa a ser único"""
+        engine = create_engine("sqlite://", poolclass=StaticPool)
+        with engine.begin() as conexion:
+            conexion.execute(text(
+                "CREATE TABLE transacciones (id INTEGER PRIMARY KEY, cantidad BIGINT NOT NULL, fecha DATETIME NOT NULL, "
+                "tipo VARCHAR(7) NOT NULL, categoria_id INTEGER NOT NULL, usuario_id INTEGER NOT NULL, "
+                "uid VARCHAR(32), modificada DATETIME)"
+            ))
+            conexion.execute(text(
+                "INSERT INTO transacciones VALUES (1, 100, '2024-01-15 00:00:00.000000', 'EGRESO', 1, 1, "
+                "'a', '2024-01-15 00:00:00.000000'), (2, 200, '2024-01-16 00:00:00.000000', 'EGRESO', 1, 1, NULL, NULL)"
+            ))
+        crear_esquema(engine)
+        with engine.connect() as conexion:
+            uids = conexion.execute(text("SELECT uid FROM transacciones ORDER BY id")).scalars().all()
+            assert uids[0] == "a" and len(uids[1]) == 32
+            assert conexion.execute(text("SELECT COUNT(*) FROM transacciones WHERE modificada IS NULL")).scalar() == 0
+        with pytest.raises(IntegrityError):
+            with engine.begin() as conexion:
+                conexion.execute(text("UPDATE transacciones SET uid = 'a' WHERE id = 2"))
+
+    def test_lo_archivado_en_el_servidor_no_se_reenvia(self):
+        """Prueba extrema: las transacciones que el servidor archiva no vuelven a su tabla al sincronizar"""
+        antigua = self.registrar(self.local, 10, fecha=datetime(2020, 3, 1))
+        reciente = self.registrar(self.local, 5, fecha=datetime(2024, 3, 1))
+        self.sincronizador.sincronizar(self.CORREO)
+        archivo = ArchivoFrio.registrar(self.remoto, os.path.join(self.directorio, "archivo"))
+        try:
+            with sessionmaker(bind=self.remoto)() as db:
+                archivo.archivar(db, datetime(2021, 1, 1))
+                db.commit()
+
+            resumen = self.sincronizador.sincronizar(self.CORREO)
+
+            assert (resumen.enviadas, resumen.recibidas, resumen.eliminadas_en_local) == (0, 0, 0)
+            assert set(self.cantidades(self.remoto)) == {reciente}
+            assert set(self.cantidades(self.local)) == {antigua, reciente}
+            with sessionmaker(bind=self.remoto)() as db:
+                usuario_id = db.scalar(select(Usuario.id).where(Usuario.correo == self.CORREO))
+                assert reportes.balance(db, usuario_id) == (0, 15, -15)
+        finally:
+            ArchivoFrio.olvidar(self.remoto)
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_usuario_inexistente(self):
+        """Prueba de error: sincronizar un usuario que no está en el almacén local"""
+        with pytest.raises(UsuarioNoEncontradoError):
+            self.sincronizador.sincronizar("nadie@example.com")
+
+    def test_servidor_inaccesible(self):
+        """Prueba de error: sin servidor, la sincronización periódica guarda el error y sigue viva"""
+        inaccesible = create_engine(f"sqlite:///{os.path.join(self.directorio, 'no', 'existe.db')}")
+        errores = []
+        periodica = SincronizacionPeriodica(Sincronizador(self.local, inaccesible), intervalo=0.05,
+                                            al_fallar=errores.append)
+        periodica.iniciar()
+        time.sleep(0.3)
+        periodica.detener()
+        assert len(errores) >= 2
+        assert periodica.ultimo_error is not None
+
+
+class TestCacheReportes:
+    def setup_method(self):
+        self.engine = create_engine('sqlite://', poolclass=StaticPool)
+        crear_esquema(self.engine)
+        self.sesiones = sessionmaker(bind=self.engine)
+        self.session = self.sesiones()
+        self.cache = CacheReportes.configurar(self.engine, tamano_maximo=8)
+
+        self.usuario = Usuario(nombre="Juan", correo="juan@example.com", contraseña="segura123")
+        self.otro = Usuario(nombre="Ana", correo="ana@example.com", contraseña="segura123")
+        self.comida = Categoria(nombre="Alimentación", tipo="Egreso")
+        self.salario = Categoria(nombre="Salario", tipo="Ingreso")
+        self.session.add_all([self.usuario, self.otro, self.comida, self.salario])
+        self.session.commit()
+        self.session.add(Transaccion(1000, datetime(2024, 1, 1), "Ingreso", self.salario, self.usuario, self.session))
+        self.session.add(Transaccion(200, datetime(2024, 1, 10), "Egreso", self.comida, self.usuario, self.session))
+        self.session.add(Transaccion(50, datetime(2024, 1, 10), "Egreso", self.comida, self.otro, self.session))
+        self.session.commit()
+        self.cache.limpiar()
+
+    def teardown_method(self):
+        self.session.close()
+
+    def agregar(self, cantidad, usuario):
+        with self.sesiones() as db:
+            db.add(Transaccion(cantidad, datetime(2024, 1, 20), "Egreso", db.get(Categoria, self.comida.id),
+                               db.get(Usuario, usuario.id), db))
+            db.commit()
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_segunda_consulta_sale_de_la_cache(self):
+        """Prueba normal: la misma consulta con los mismos parámetros es un acierto"""
+        primera = reportes.totales_por_tipo(self.session, self.usuario.id)
+        with self.sesiones() as otra:
+            assert reportes.totales_por_tipo(otra, self.usuario.id) == primera
+        reportes.totales_por_tipo(self.session, self.usuario.id, hasta=datetime(2024, 1, 5))
+        estadisticas = self.cache.estadisticas()
+        assert (estadisticas["aciertos"], estadisticas["fallos"], estadisticas["entradas"]) == (1, 2, 2)
+
+    def test_resultado_devuelto_es_una_copia(self):
+        """Prueba normal: modificar la lista devuelta no altera la cache"""
+        filas = reportes.totales_por_categoria(self.session, self.usuario.id)
+        filas.clear()
+        assert len(reportes.totales_por_categoria(self.session, self.usuario.id)) == 2
+
+    def test_cambio_en_transaccion_invalida_solo_a_su_usuario(self):
+        """Prueba normal: insertar, modificar o eliminar invalida los reportes del usuario afectado"""
+        reportes.balance(self.session, self.usuario.id, datetime(2024, 12, 31))
+        reportes.balance(self.session, self.otro.id, datetime(2024, 12, 31))
+        self.agregar(30, self.usuario)
+        assert reportes.balance(self.session, self.usuario.id, datetime(2024, 12, 31)) == (1000, 230, 770)
+        assert reportes.balance(self.session, self.otro.id, datetime(2024, 12, 31)) == (0, 50, -50)
+        assert self.cache.aciertos == 1
+
+        transaccion = self.session.query(Transaccion).filter_by(usuario_id=self.usuario.id, cantidad=200).one()
+        transaccion.modificar_cantidad(100)
+        self.session.commit()
+        assert reportes.balance(self.session, self.usuario.id, datetime(2024, 12, 31)) == (1000, 130, 870)
+        self.session.delete(transaccion)
+        self.session.commit()
+        assert reportes.balance(self.session, self.usuario.id, datetime(2024, 12, 31)) == (1000, 30, 970)
+
+    def test_cambio_en_categoria_invalida_todo(self):
+        """Prueba normal: renombrar una categoría invalida los reportes de todos los usuarios"""
+        reportes.top_categorias(self.session, self.usuario.id)
+        reportes.top_categorias(self.session, self.otro.id)
+        self.comida.nombre = "Comida"
+        self.session.commit()
+        assert len(self.cache) == 0
+        assert reportes.top_categorias(self.session, self.otro.id) == [("Comida", 50)]
+
+    def test_importacion_invalida(self):
+        """Prueba normal: las inserciones por lotes con Core también invalidan"""
+        reportes.totales_por_tipo(self.session, self.usuario.id)
+        texto = "cantidad,fecha,tipo,categoria,usuario\n5,2024-01-02,Egreso,Alimentación,juan@example.com\n"
+        importar_transacciones(self.session, leer_filas(io.StringIO(texto), "csv"))
+        assert reportes.totales_por_tipo(self.session, self.usuario.id) == [("Egreso", 205, 2), ("Ingreso", 1000, 1)]
+
+    # ---- PRUEBAS EXTREMAS ----
+
+    def test_expulsion_lru(self):
+        """Prueba extrema: con la cache llena se expulsa la entrada usada hace más tiempo"""
+        self.cache.tamano_maximo = 2
+        reportes.top_categorias(self.session, self.usuario.id, n=1)
+        reportes.top_categorias(self.session, self.usuario.id, n=2)
+        reportes.top_categorias(self.session, self.usuario.id, n=1)
+        reportes.top_categorias(self.session, self.usuario.id, n=3)
+        assert self.cache.expulsiones == 1
+        reportes.top_categorias(self.session, self.usuario.id, n=1)
+        reportes.top_categorias(self.session, self.usuario.id, n=2)
+        assert (self.cache.aciertos, self.cache.fallos) == (2, 4)
+
+    def test_caducidad(self, monkeypatch):
+        """Prueba extrema: una entrada con más antigüedad que el ttl se vuelve a calcular"""
+        ahora = [1000.0]
+        monkeypatch.setattr(cache_reportes.time, "monotonic", lambda: ahora[0])
+        self.cache.ttl = 10
+        reportes.totales_por_periodo(self.session, self.usuario.id)
+        ahora[0] += 5
+        reportes.totales_por_periodo(self.session, self.usuario.id)
+        ahora[0] += 10
+        reportes.totales_por_periodo(self.session, self.usuario.id)
+        assert (self.cache.aciertos, self.cache.caducadas, self.cache.fallos) == (1, 1, 2)
+
+    def test_sesion_con_cambios_sin_confirmar_no_usa_la_cache(self):
+        """Prueba extrema: lo leído dentro de una transacción que escribe no se comparte"""
+        antes = reportes.totales_por_tipo(self.session, self.usuario.id)
+        self.session.add(Transaccion(70, datetime(2024, 1, 3), "Egreso", self.comida, self.usuario, self.session))
+        self.session.flush()
+        assert reportes.totales_por_tipo(self.session, self.usuario.id) == [("Egreso", 270, 2), ("Ingreso", 1000, 1)]
+        self.session.rollback()
+        assert reportes.totales_por_tipo(self.session, self.usuario.id) == antes
+
+    def test_resultado_calculado_durante_una_escritura_no_se_guarda(self):
+        """Prueba extrema: si el usuario cambia mientras se calcula, el resultado no se guarda"""
+        generacion = self.cache.generacion(self.usuario.id)
+        self.agregar(30, self.usuario)
+        self.cache.guardar((self.usuario.id, "balance", (), ()), (0, 0, 0), generacion)
+        assert len(self.cache) == 0
+
+    def test_tamano_cero_desactiva(self):
+        """Prueba extrema: con tamaño máximo 0 no se guarda nada"""
+        self.cache.tamano_maximo = 0
+        reportes.totales_por_tipo(self.session, self.usuario.id)
+        reportes.totales_por_tipo(self.session, self.usuario.id)
+        assert len(self.cache) == 0
+
+    def test_configuracion(self):
+        """Prueba extrema: tamaño y ttl se leen de la configuración"""
+        config = leer_configuracion("test", archivo_config="", entorno={"GASTOS_DB_CACHE_REPORTES": "10",
+                                                                 "GASTOS_DB_CACHE_TTL": "2.5"})
+        assert (config["cache_reportes"], config["cache_ttl"]) == (10, 2.5)
+        engine = crear_engine("test", cache_reportes="3", cache_ttl="")
+        assert (CacheReportes.de(engine).tamano_maximo, CacheReportes.de(engine).ttl) == (3, None)
+
+    def test_configuracion_del_engine_async(self):
+        """Prueba extrema: el engine asíncrono (servidor HTTP) aplica el tamaño y el ttl del perfil"""
+        engine = crear_engine_async("server", url="sqlite://", cache_reportes=7, cache_ttl=3)
+        cache = CacheReportes.de(engine.sync_engine)
+        assert (cache.tamano_maximo, cache.ttl) == (7, 3)
+        asyncio.run(engine.dispose())
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_parametros_invalidos(self):
+        """Prueba de error: tamaño negativo o ttl no positivo"""
+        with pytest.raises(ValueError):
+            CacheReportes(tamano_maximo=-1)
+        with pytest.raises(ValueError):
+            CacheReportes(ttl=0)
+
+    def test_error_en_el_reporte_no_se_guarda(self):
+        """Prueba de error: si el reporte falla no queda nada en la cache"""
+        with pytest.raises(ValueError):
+            reportes.top_categorias(self.session, self.usuario.id, n=0)
+        assert len(self.cache) == 0
+
+
+class TestArranque:
+    # Presupuesto de la importación de cada punto de entrada (ms, columna cumulative de -X importtime)
+    PRESUPUESTO_CONSOLA_MS = 100
+    PRESUPUESTO_KIVY_MS = 600
+    PESADOS = ("sqlalchemy", "bcrypt", "numpy", "src.model.servicios", "src.model.db")
+
+    def importar(self, codigo, entorno=None):
+        """Ejecuta `codigo` con -X importtime en un intérprete nuevo: (stdout, {módulo: acumulado_ms})."""
+        raiz = os.path.join(os.path.dirname(__file__), "..")
+        variables = dict(os.environ, KIVY_NO_ARGS="1", KIVY_NO_CONSOLELOG="1", **(entorno or {}))
+        proceso = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], cwd=raiz, env=variables,
+                                 capture_output=True, text=True)
+        assert proceso.returncode == 0, proceso.stderr
+        tiempos = {}
+        for linea in proceso.stderr.splitlines():
+            if linea.startswith("import time:") and "self [us]" not in linea:
+                _, acumulado, nombre = linea[len("import time:"):].split("|")
+                tiempos.setdefault(nombre.strip(), int(acumulado) / 1000)
+        return proceso.stdout, tiempos
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_consola_sin_dependencias_pesadas(self):
+        """Prueba normal: el menú de consola se importa sin SQLAlchemy, bcrypt ni NumPy y dentro del presupuesto"""
+        _, tiempos = self.importar("import src.model.console")
+        assert not [nombre for nombre in self.PESADOS if nombre in tiempos]
+        assert tiempos["src.model.console"] < self.PRESUPUESTO_CONSOLA_MS
+
+    def test_kivy_sin_capa_de_datos(self):
+        """Prueba normal: la interfaz Kivy se importa sin la capa de datos ni los widgets de los formularios"""
+        pytest.importorskip("kivy")
+        _, tiempos = self.importar("import src.view.menu")
+        assert not [nombre for nombre in self.PESADOS + ("kivy.uix.textinput",) if nombre in tiempos]
+        assert tiempos["src.view.menu"] < self.PRESUPUESTO_KIVY_MS
+
+    def test_engine_se_crea_al_usarlo(self):
+        """Prueba normal: importar db no crea el engine; se crea con la primera sesión"""
+        salida, _ = self.importar(
+            "import src.model.db as db\n"
+            "print(db._engine is None)\n"
+            "sesion = db.SessionLocal()\n"
+            "print(db._engine is not None and sesion.get_bind() is db.engine)",
+            entorno={"GASTOS_DB_URL": "sqlite://", "GASTOS_DB_LOCAL": ""}
+        )
+        assert salida.split() == ["True", "True"]
+
+    # ---- PRUEBAS EXTREMAS ----
+
+    def test_engine_unico_entre_hilos(self):
+        """Prueba extrema: varios hilos pidiendo el engine a la vez obtienen el mismo"""
+        salida, _ = self.importar(
+            "import threading\n"
+            "import src.model.db as db\n"
+            "engines = []\n"
+            "hilos = [threading.Thread(target=lambda: engines.append(db.obtener_engine())) for _ in range(8)]\n"
+            "[h.start() for h in hilos]; [h.join() for h in hilos]\n"
+            "print(len({id(e) for e in engines}))",
+            entorno={"GASTOS_DB_URL": "sqlite://", "GASTOS_DB_LOCAL": ""}
+        )
+        assert salida.strip() == "1"
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_atributo_inexistente(self):
+        """Prueba de error: un atributo desconocido de db sigue dando AttributeError"""
+        import src.model.db as db
+        with pytest.raises(AttributeError):
+            db.no_existe
+
+
+class TestSesion:
+    def setup_method(self):
+        self.almacen_original = Sesion.almacen
+        self.ahora = [1000.0]
+        Sesion.almacen = AlmacenSesiones(duracion=60, reloj=lambda: self.ahora[0])
+        self.juan = UsuarioSesion(1, "Juan", "juan@example.com")
+        self.ana = UsuarioSesion(2, "Ana", "ana@example.com")
+
+    def teardown_method(self):
+        Sesion.cerrar_sesion()
+        Sesion.almacen = self.almacen_original
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_iniciar_y_cerrar_sesion(self):
+        """Prueba normal: la sesión guarda una copia inmutable del usuario y se puede cerrar"""
+        usuario = Usuario(nombre="Juan", correo="juan@example.com", contraseña="segura123")
+        usuario.id = 7
+        token = Sesion.iniciar_sesion(usuario)
+        actual = Sesion.obtener_usuario_actual()
+        assert actual == UsuarioSesion(7, "Juan", "juan@example.com")
+        with pytest.raises(AttributeError):
+            actual.nombre = "Otro"
+        Sesion.cerrar_sesion()
+        assert Sesion.obtener_usuario_actual() is None
+        assert Sesion.almacen.obtener(token) is None
+
+    def test_hilos_con_sesiones_independientes(self):
+        """Prueba normal: cada hilo ve su propio usuario aunque inicien sesión a la vez"""
+        barrera = threading.Barrier(2)
+        vistos = {}
+
+        def hilo(usuario):
+            Sesion.iniciar_sesion(usuario)
+            barrera.wait()
+            vistos[usuario.id] = Sesion.obtener_usuario_actual()
+
+        hilos = [threading.Thread(target=hilo, args=(u,)) for u in (self.juan, self.ana)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        assert vistos == {1: self.juan, 2: self.ana}
+        assert Sesion.obtener_usuario_actual() is None
+
+    def test_tareas_asyncio_con_sesiones_independientes(self):
+        """Prueba normal: cada tarea de asyncio tiene su propia sesión"""
+        async def tarea(usuario):
+            Sesion.iniciar_sesion(usuario)
+            await asyncio.sleep(0)
+            return Sesion.obtener_usuario_actual()
+
+        async def principal():
+            return await asyncio.gather(tarea(self.juan), tarea(self.ana))
+
+        assert asyncio.run(principal()) == [self.juan, self.ana]
+
+    def test_usar_token(self):
+        """Prueba normal: usar(token) activa una sesión en un bloque y restaura la anterior"""
+        token_ana = Sesion.almacen.crear(self.ana)
+        Sesion.iniciar_sesion(self.juan)
+        with Sesion.usar(token_ana) as usuario:
+            assert usuario == self.ana
+            assert Sesion.obtener_usuario_actual() == self.ana
+        assert Sesion.obtener_usuario_actual() == self.juan
+
+    def test_servicios_aceptan_la_sesion(self):
+        """Prueba normal: los servicios aceptan el UsuarioSesion de la sesión iniciada"""
+        engine = create_engine('sqlite://', poolclass=StaticPool)
+        crear_esquema(engine)
+        with sessionmaker(bind=engine)() as db:
+            db.add(Categoria(nombre="Alimentación", tipo="Egreso"))
+            usuario = Usuario(nombre="Juan", correo="juan@example.com", contraseña="segura123")
+            db.add(usuario)
+            db.commit()
+            Sesion.iniciar_sesion(usuario)
+            transaccion = servicios.registrar_transaccion(Sesion.obtener_usuario_actual(), "12.50", "Egreso",
+                                                          "Alimentación", session=db)
+            assert transaccion.usuario_id == usuario.id
+
+    # ---- PRUEBAS EXTREMAS ----
+
+    def test_caducidad_deslizante(self):
+        """Prueba extrema: la sesión caduca sin uso y se renueva al usarla"""
+        Sesion.iniciar_sesion(self.juan)
+        self.ahora[0] += 50
+        assert Sesion.obtener_usuario_actual() == self.juan
+        self.ahora[0] += 50
+        assert Sesion.obtener_usuario_actual() == self.juan
+        self.ahora[0] += 61
+        assert Sesion.obtener_usuario_actual() is None
+        assert len(Sesion.almacen) == 0
+
+    def test_purgar_sesiones_caducadas(self):
+        """Prueba extrema: purgar elimina solo las sesiones caducadas"""
+        for i in range(5):
+            Sesion.almacen.crear(UsuarioSesion(i, f"U{i}", f"u{i}@example.com"))
+        self.ahora[0] += 30
+        vigente = Sesion.almacen.crear(self.juan)
+        self.ahora[0] += 31
+        assert Sesion.almacen.purgar() == 5
+        assert Sesion.almacen.obtener(vigente) == self.juan
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_token_desconocido(self):
+        """Prueba de error: un token inexistente no da acceso a ningún usuario"""
+        with Sesion.usar("no-existe") as usuario:
+            assert usuario is None
+            assert Sesion.obtener_usuario_actual() is None
+
+    def test_duracion_invalida(self):
+        """Prueba de error: la duración de la sesión debe ser positiva"""
+        with pytest.raises(ValueError):
+            AlmacenSesiones(duracion=0)
+
+
+class TestServidorHTTP:
+    def setup_method(self):
+        self.coste = Usuario.COSTE_BCRYPT
+        Usuario.COSTE_BCRYPT = 4
+
+    def teardown_method(self):
+        Usuario.COSTE_BCRYPT = self.coste
+
+    def ejecutar(self, prueba):
+        """Crea una base SQLite en memoria (aiosqlite) con categorías y ejecuta prueba(servidor)"""
+        async def principal():
+            engine = crear_engine_async("test")
+            try:
+                async with engine.begin() as conexion:
+                    await conexion.run_sync(lambda c: crear_esquema(c.engine))
+                Sesiones = crear_sesiones_async(engine)
+                async with Sesiones() as db:
+                    db.add_all([Categoria(nombre="Comida", tipo="Egreso"), Categoria(nombre="Salario", tipo="Ingreso")])
+                    await db.commit()
+                return await prueba(ServidorAPI(Sesiones))
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(principal())
+
+    @staticmethod
+    async def peticion(servidor, metodo, ruta, datos=None, token=None):
+        cabeceras = {"authorization": f"Bearer {token}"} if token else {}
+        cuerpo = json.dumps(datos).encode() if datos is not None else b""
+        estado, respuesta = await servidor.despachar(metodo, ruta, cabeceras, cuerpo)
+        return estado, json.loads(json.dumps(respuesta, default=servidor_http._json))
+
+    async def registrar_usuario(self, servidor, correo):
+        await self.peticion(servidor, "POST", "/usuarios", {"nombre": "Ana", "correo": correo, "contrasena": "segura123"})
+        _, datos = await self.peticion(servidor, "POST", "/sesiones", {"correo": correo, "contrasena": "segura123"})
+        return datos["token"]
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_flujo_completo(self):
+        """Prueba normal: crear usuario, iniciar sesión, registrar, listar, resumir y eliminar"""
+        async def prueba(servidor):
+            estado, usuario = await self.peticion(servidor, "POST", "/usuarios",
+                                                  {"nombre": "Ana", "correo": "ana@example.com", "contrasena": "segura123"})
+            assert estado == 201 and usuario["correo"] == "ana@example.com"
+            estado, sesion = await self.peticion(servidor, "POST", "/sesiones",
+                                                 {"correo": "ana@example.com", "contrasena": "segura123"})
+            token = sesion["token"]
+            estado, transaccion = await self.peticion(servidor, "POST", "/transacciones", {
+                "cantidad": "12.50", "tipo": "Egreso", "categoria": "Comida", "fecha": "2024-01-02"}, token)
+            assert estado == 201 and transaccion["cantidad"] == "12.50"
+            await self.peticion(servidor, "POST", "/transacciones", {
+                "cantidad": 100, "tipo": "Ingreso", "categoria": "Salario", "fecha": "2024-01-03"}, token)
+
+            estado, pagina = await self.peticion(servidor, "GET", "/transacciones", token=token)
+            assert estado == 200 and [t["cantidad"] for t in pagina["transacciones"]] == ["100.00", "12.50"]
+            estado, resumen = await self.peticion(servidor, "GET", "/resumen", token=token)
+            assert resumen["balance"] == {"ingresos": "100.00", "egresos": "12.50", "neto": "87.50"}
+
+            estado, _ = await self.peticion(servidor, "DELETE", f"/transacciones/{transaccion['id']}", token=token)
+            assert estado == 204
+            estado, _ = await self.peticion(servidor, "DELETE", "/sesiones", token=token)
+            assert estado == 204
+            estado, _ = await self.peticion(servidor, "GET", "/resumen", token=token)
+            assert estado == 401
+
+        self.ejecutar(prueba)
+
+    def test_usuarios_simultaneos_no_se_mezclan(self):
+        """Prueba normal: peticiones concurrentes de dos usuarios ven solo sus transacciones"""
+        async def prueba(servidor):
+            tokens = [await self.registrar_usuario(servidor, f"u{i}@example.com") for i in range(2)]
+
+            async def cliente(token, cantidad):
+                for _ in range(5):
+                    await self.peticion(servidor, "POST", "/transacciones",
+                                        {"cantidad": cantidad, "tipo": "Egreso", "categoria": "Comida"}, token)
+                _, pagina = await self.peticion(servidor, "GET", "/transacciones", token=token)
+                return {t["cantidad"] for t in pagina["transacciones"]}
+
+            assert await asyncio.gather(cliente(tokens[0], "1"), cliente(tokens[1], "2")) == [{"1.00"}, {"2.00"}]
+
+        self.ejecutar(prueba)
+
+    def test_conexion_persistente(self):
+        """Prueba normal: varias peticiones por la misma conexión TCP"""
+        async def prueba(servidor):
+            puerto = await servidor.iniciar("127.0.0.1", 0)
+            try:
+                lector, escritor = await asyncio.open_connection("127.0.0.1", puerto)
+                estados = []
+                for conexion in ("keep-alive", "close"):
+                    escritor.write(f"GET /resumen HTTP/1.1\r\nHost: x\r\nConnection: {conexion}\r\n\r\n".encode())
+                    cabecera = (await lector.readuntil(b"\r\n\r\n")).decode()
+                    longitud = int(cabecera.lower().split("content-length: ")[1].split("\r\n")[0])
+                    await lector.readexactly(longitud)
+                    estados.append(cabecera.split(" ")[1])
+                assert estados == ["401", "401"]
+                assert await lector.read() == b""
+                escritor.close()
+            finally:
+                await servidor.cerrar()
+
+        self.ejecutar(prueba)
+
+    # ---- PRUEBAS EXTREMAS ----
+
+    def test_paginacion_con_cursor(self):
+        """Prueba extrema: el cursor de la respuesta sirve para pedir la página siguiente"""
+        async def prueba(servidor):
+            token = await self.registrar_usuario(servidor, "ana@example.com")
+            for dia in range(1, 6):
+                await self.peticion(servidor, "POST", "/transacciones", {
+                    "cantidad": dia, "tipo": "Egreso", "categoria": "Comida", "fecha": f"2024-01-0{dia}"}, token)
+            vistas, siguiente = [], ""
+            while siguiente is not None:
+                _, pagina = await self.peticion(servidor, "GET", f"/transacciones?tamano=2&despues={siguiente}",
+                                                token=token)
+                vistas.extend(t["cantidad"] for t in pagina["transacciones"])
+                siguiente = pagina["siguiente"]
+            assert vistas == ["5.00", "4.00", "3.00", "2.00", "1.00"]
+
+        self.ejecutar(prueba)
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_errores(self):
+        """Prueba de error: rutas, métodos, cuerpos, credenciales y permisos inválidos"""
+        async def prueba(servidor):
+            token = await self.registrar_usuario(servidor, "ana@example.com")
+            otro = await self.registrar_usuario(servidor, "juan@example.com")
+            _, transaccion = await self.peticion(servidor, "POST", "/transacciones",
+                                                 {"cantidad": "5", "tipo": "Egreso", "categoria": "Comida"}, token)
+            casos = [
+                (("GET", "/transacciones"), 401),
+                (("GET", "/no-existe"), 404),
+                (("PUT", "/resumen"), 405),
+                (("POST", "/usuarios", {"nombre": "Ana", "correo": "ana@example.com", "contrasena": "segura123"}), 409),
+                (("POST", "/sesiones", {"correo": "ana@example.com", "contrasena": "incorrecta"}), 401),
+                (("POST", "/transacciones", {"cantidad": "5", "tipo": "Egreso"}, token), 400),
+                (("POST", "/transacciones", {"cantidad": "-5", "tipo": "Egreso", "categoria": "Comida"}, token), 400),
+                (("GET", "/transacciones?tamano=x", None, token), 400),
+                (("GET", "/transacciones?tamano=0", None, token), 400),
+                (("GET", f"/transacciones?tamano={servidor_http.TAMANO_MAXIMO_PAGINA + 1}", None, token), 400),
+                (("GET", "/resumen?meses=0", None, token), 400),
+                (("GET", "/resumen?meses=-1", None, token), 400),
+                (("GET", f"/resumen?meses={servidor_http.MESES_MAXIMOS + 1}", None, token), 400),
+                (("GET", "/resumen?top=0", None, token), 400),
+                (("DELETE", f"/transacciones/{transaccion['id']}", None, otro), 404),
+            ]
+            for argumentos, esperado in casos:
+                estado, respuesta = await self.peticion(servidor, *argumentos)
+                assert (argumentos[:2], estado) == (argumentos[:2], esperado) and "error" in respuesta
+            estado, _ = await servidor.despachar("POST", "/sesiones", {}, b"{no es json")
+            assert estado == 400
+
+        self.ejecutar(prueba)
+
+    def test_content_length_negativo(self):
+        """Prueba de error: un Content-Length negativo se responde con 400 y se cierra la conexión"""
+        async def prueba(servidor):
+            puerto = await servidor.iniciar("127.0.0.1", 0)
+            try:
+                lector, escritor = await asyncio.open_connection("127.0.0.1", puerto)
+                escritor.write(b"POST /sesiones HTTP/1.1\r\nHost: x\r\nContent-Length: -5\r\n\r\n")
+                respuesta = await lector.read()
+                assert respuesta.split(b" ")[1] == b"400"
+                escritor.close()
+            finally:
+                await servidor.cerrar()
+
+        self.ejecutar(prueba)
+
+
+class TestEstadisticasSQL:
+    def setup_method(self):
+        self.estadisticas = EstadisticasSQL()
+        self.engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(bind=self.engine)
+        instrumentar(self.engine, estadisticas=self.estadisticas)
+        self.Session = sessionmaker(bind=self.engine)
+        with self.Session() as db:
+            db.add_all([Categoria(nombre=nombre, tipo="Egreso") for nombre in ("Comida", "Ocio", "Transporte")])
+            db.commit()
+        self.estadisticas.reiniciar()
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_sentencias_y_filas_por_accion(self):
+        """Prueba normal: cada acción acumula sus ejecuciones, sentencias y filas leídas"""
+        for _ in range(2):
+            with self.estadisticas.medir("listar_categorias"), self.Session() as db:
+                assert len(db.query(Categoria).all()) == 3
+                db.scalar(select(func.count()).select_from(Usuario))
+        total = self.estadisticas.estadisticas()["listar_categorias"]
+        assert (total["veces"], total["sentencias"], total["filas"], total["lentas"]) == (2, 4, 8, 0)
+        assert 0 < total["maximo_bd"] <= total["segundos_bd"] <= total["segundos"]
+
+    def test_sentencias_fuera_de_una_accion(self):
+        """Prueba normal: lo que se ejecuta sin medir(accion) se acumula en SIN_ACCION"""
+        with self.Session() as db:
+            db.query(Categoria).all()
+        assert list(self.estadisticas.estadisticas()) == [SIN_ACCION]
+        assert self.estadisticas.estadisticas()[SIN_ACCION]["filas"] == 3
+
+    def test_volcar_json(self, tmp_path):
+        """Prueba normal: las estadísticas se vuelcan en JSON a un archivo o a un flujo abierto"""
+        with self.estadisticas.medir("crear_usuario"), self.Session() as db:
+            db.add(Usuario(nombre="Ana", correo="ana@example.com", contraseña="segura123"))
+            db.commit()
+        ruta = tmp_path / "estadisticas.json"
+        self.estadisticas.volcar(str(ruta))
+        flujo = io.StringIO()
+        self.estadisticas.volcar(flujo)
+        datos = json.loads(ruta.read_text(encoding="utf-8"))
+        assert datos == json.loads(flujo.getvalue())
+        assert datos["acciones"]["crear_usuario"]["sentencias"] >= 1
+
+    def test_acciones_del_ejecutor_de_kivy(self):
+        """Prueba normal: las tareas de EjecutorBD con `accion` cuentan para esa acción, commit incluido"""
+        os.environ.setdefault("KIVY_NO_ARGS", "1")
+        os.environ.setdefault("KIVY_NO_CONSOLELOG", "1")
+        from src.view.segundo_plano import EjecutorBD
+        from src.model.estadisticas_sql import ESTADISTICAS_SQL
+
+        ESTADISTICAS_SQL.reiniciar()
+        engine = crear_engine("test")
+        Base.metadata.create_all(bind=engine)
+        ejecutor = EjecutorBD(fabrica_sesiones=sessionmaker(bind=engine), max_workers=1)
+        try:
+            tarea = ejecutor.enviar(lambda db: db.add(Categoria(nombre="Salario", tipo="Ingreso")), lambda r: None,
+                                    accion="nueva_categoria")
+            tarea.futuro.result(5)
+        finally:
+            ejecutor.cerrar()
+            engine.dispose()
+        total = ESTADISTICAS_SQL.estadisticas()["nueva_categoria"]
+        assert total["veces"] == 1 and total["sentencias"] >= 1
+        ESTADISTICAS_SQL.reiniciar()
+
+    def test_opcion_de_estadisticas_en_consola(self, monkeypatch, capsys, tmp_path):
+        """Prueba normal: la opción de la consola muestra la tabla y guarda el JSON pedido"""
+        from src.model import console
+
+        ruta = tmp_path / "consola.json"
+        monkeypatch.setattr(console, "ESTADISTICAS_SQL", self.estadisticas)
+        monkeypatch.setattr("builtins.input", lambda _: str(ruta))
+        with self.estadisticas.medir("ver_resumen"), self.Session() as db:
+            db.query(Categoria).all()
+        console.ver_estadisticas()
+        salida = capsys.readouterr().out
+        assert "ver_resumen" in salida and "Estadísticas guardadas" in salida
+        assert "ver_resumen" in json.loads(ruta.read_text(encoding="utf-8"))["acciones"]
+
+    def test_configuracion(self):
+        """Prueba normal: las opciones de estadísticas se leen del entorno con su tipo"""
+        config = leer_configuracion("test", archivo_config="no-existe.ini", entorno={
+            "GASTOS_DB_ESTADISTICAS_SQL": "0", "GASTOS_DB_CONSULTA_LENTA_MS": "250",
+            "GASTOS_DB_ESTADISTICAS_JSON": " "})
+        assert (config["estadisticas_sql"], config["consulta_lenta_ms"], config["estadisticas_json"]) == \
+            (False, 250.0, None)
+
+    # ---- PRUEBAS EXTREMAS ----
+
+    def test_consultas_lentas(self, caplog):
+        """Prueba extrema: con umbral 0 todas las sentencias son lentas y se registran; sin umbral, ninguna"""
+        instrumentar(self.engine, 0, estadisticas=self.estadisticas)
+        with caplog.at_level("WARNING", logger="src.model.estadisticas_sql"):
+            with self.estadisticas.medir("lenta"), self.Session() as db:
+                db.query(Categoria).all()
+            instrumentar(self.engine, None, estadisticas=self.estadisticas)
+            with self.estadisticas.medir("rapida"), self.Session() as db:
+                db.query(Categoria).all()
+        assert self.estadisticas.estadisticas()["lenta"]["lentas"] == 1
+        assert self.estadisticas.estadisticas()["rapida"]["lentas"] == 0
+        assert len(caplog.records) == 1 and "'lenta'" in caplog.records[0].getMessage()
+
+    def test_hilos_simultaneos_no_se_mezclan(self):
+        """Prueba extrema: cada hilo mide solo sus propias sentencias"""
+        barrera = threading.Barrier(8)
+
+        def trabajo(i):
+            barrera.wait(5)
+            with self.estadisticas.medir(f"hilo{i}"):
+                with self.engine.connect() as conexion:
+                    for _ in range(i + 1):
+                        conexion.execute(text("SELECT 1")).all()
+
+        hilos = [threading.Thread(target=trabajo, args=(i,)) for i in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        estadisticas = self.estadisticas.estadisticas()
+        assert [(estadisticas[f"hilo{i}"]["sentencias"], estadisticas[f"hilo{i}"]["filas"]) for i in range(8)] == \
+            [(i + 1, i + 1) for i in range(8)]
+
+    def test_engine_asincrono(self):
+        """Prueba extrema: las sentencias de un AsyncEngine cuentan para la acción de su tarea"""
+        async def principal():
+            engine = crear_engine_async("test", estadisticas_sql=False)
+            instrumentar(engine, estadisticas=self.estadisticas)
+            try:
+                async def consultar(accion, veces):
+                    with self.estadisticas.medir(accion):
+                        async with engine.connect() as conexion:
+                            for _ in range(veces):
+                                await conexion.execute(text("SELECT 1"))
+                await asyncio.gather(consultar("una", 1), consultar("tres", 3))
+            finally:
+                await engine.dispose()
+
+        asyncio.run(principal())
+        estadisticas = self.estadisticas.estadisticas()
+        assert (estadisticas["una"]["sentencias"], estadisticas["tres"]["sentencias"]) == (1, 3)
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_accion_con_error(self):
+        """Prueba de error: una acción que falla cuenta igualmente y la excepción se propaga"""
+        with pytest.raises(Exception):
+            with self.estadisticas.medir("fallida"), self.engine.connect() as conexion:
+                conexion.execute(text("SELECT * FROM tabla_inexistente"))
+        assert self.estadisticas.estadisticas()["fallida"]["veces"] == 1
+
+    def test_umbral_negativo(self):
+        """Prueba de error: el umbral de consulta lenta no puede ser negativo"""
+        with pytest.raises(ValueError):
+            instrumentar(self.engine, -1, estadisticas=self.estadisticas)
+
+
+class TestEliminacionEnBloque:
+    def setup_method(self):
+        self.coste = Usuario.COSTE_BCRYPT
+        Usuario.COSTE_BCRYPT = 4
+        self.engine = crear_engine("test")
+        crear_esquema(self.engine)
+        self.fabrica = sessionmaker(bind=self.engine, expire_on_commit=False)
+        with self.fabrica() as db:
+            db.add_all([Categoria(nombre="Comida", tipo="Egreso"), Categoria(nombre="Ocio", tipo="Egreso"),
+                        Categoria(nombre="Salario", tipo="Ingreso")])
+            db.commit()
+            self.ana = servicios.crear_usuario("Ana", "ana@example.com", "segura123", session=db)
+            self.luis = servicios.crear_usuario("Luis", "luis@example.com", "segura123", session=db)
+            self.ids = {}
+            for dia, categoria, tipo in ((1, "Comida", "Egreso"), (10, "Ocio", "Egreso"), (15, "Salario", "Ingreso"),
+                                         (20, "Comida", "Egreso"), (28, "Ocio", "Egreso")):
+                transaccion = servicios.registrar_transaccion(self.ana, 10 + dia, tipo, categoria,
+                                                              fecha=datetime(2024, 3, dia, 12), session=db)
+                self.ids[dia] = transaccion.id
+            self.ajena = servicios.registrar_transaccion(self.luis, 99, "Egreso", "Comida",
+                                                         fecha=datetime(2024, 3, 10, 12), session=db).id
+            db.commit()
+
+    def teardown_method(self):
+        Usuario.COSTE_BCRYPT = self.coste
+        self.engine.dispose()
+
+    def eliminar(self, usuario_id=None, **filtros):
+        with self.fabrica() as db:
+            eliminadas = servicios.eliminar_transacciones(usuario_id or self.ana.id, session=db, **filtros)
+            db.commit()
+            return eliminadas
+
+    def dias_restantes(self):
+        with self.fabrica() as db:
+            ids = set(db.scalars(select(Transaccion.id).where(Transaccion.usuario_id == self.ana.id)))
+        return sorted(dia for dia, id_ in self.ids.items() if id_ in ids)
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_por_ids(self):
+        """Prueba normal: elimina los ids indicados del usuario y devuelve cuántos"""
+        assert self.eliminar(ids=[self.ids[1], self.ids[20], self.ajena]) == 2
+        assert self.dias_restantes() == [10, 15, 28]
+        with self.fabrica() as db:
+            assert db.get(Transaccion, self.ajena) is not None
+
+    def test_por_rango_y_categoria(self):
+        """Prueba normal: el rango incluye sus extremos y se combina con la categoría"""
+        desde, hasta = fecha_de_texto("2024-03-10"), fecha_de_texto("2024-03-20", fin_del_dia=True)
+        assert self.eliminar(desde=desde, hasta=hasta) == 3
+        assert self.dias_restantes() == [1, 28]
+        assert self.eliminar(desde=datetime(2024, 3, 1), categoria="Ocio") == 1
+        assert self.dias_restantes() == [1]
+
+    def test_una_sola_sentencia(self):
+        """Prueba normal: la eliminación es un único DELETE sobre transacciones, sin cargar las filas antes"""
+        sentencias = []
+        escuchar = lambda conexion, cursor, sentencia, *args: sentencias.append(sentencia)
+        event.listen(self.engine, "before_cursor_execute", escuchar)
+        try:
+            assert self.eliminar(categoria="Comida") == 2
+        finally:
+            event.remove(self.engine, "before_cursor_execute", escuchar)
+        sobre_transacciones = [s for s in sentencias if "FROM transacciones" in s and "eliminadas" not in s]
+        assert len(sobre_transacciones) == 1 and sobre_transacciones[0].startswith("DELETE")
+
+    def test_resumen_bajas_y_cache(self):
+        """Prueba normal: se ajustan el resumen mensual, el registro de bajas y los reportes guardados"""
+        with self.fabrica() as db:
+            assert reportes.balance(db, self.ana.id)[1] == Decimal("99.00")
+            uids = set(db.scalars(select(Transaccion.uid).where(Transaccion.categoria_id == 1,
+                                                                Transaccion.usuario_id == self.ana.id)))
+        self.eliminar(categoria="Comida")
+        with self.fabrica() as db:
+            assert reportes.balance(db, self.ana.id)[1] == Decimal("58.00")
+            mantenido = db.execute(select(ResumenMensual.categoria_id, ResumenMensual.total)
+                                   .order_by(ResumenMensual.usuario_id, ResumenMensual.categoria_id)).all()
+            reconstruir_resumen(db.connection())
+            reconstruido = db.execute(select(ResumenMensual.categoria_id, ResumenMensual.total)
+                                      .order_by(ResumenMensual.usuario_id, ResumenMensual.categoria_id)).all()
+            assert mantenido == reconstruido
+            assert set(db.scalars(select(TransaccionEliminada.uid))) == uids
+
+    def test_objetos_cargados_se_descartan(self):
+        """Prueba normal: las transacciones eliminadas que la sesión tenía cargadas dejan de estar en ella"""
+        with self.fabrica() as db:
+            transaccion = db.get(Transaccion, self.ids[1])
+            assert servicios.eliminar_transaccion(self.ana.id, self.ids[1], session=db)
+            assert transaccion not in db
+            db.commit()
+        assert self.dias_restantes() == [10, 15, 20, 28]
+
+    # ---- PRUEBAS EXTREMAS ----
+
+    def test_muchos_ids(self):
+        """Prueba extrema: miles de transacciones en un bloque, más que las bajas por sentencia"""
+        with self.fabrica() as db:
+            texto = "cantidad,fecha,tipo,categoria,usuario\n" + "1,2023-01-01,Egreso,Ocio,luis@example.com\n" * 1200
+            importar_transacciones(db, leer_filas(io.StringIO(texto), "csv"))
+            db.commit()
+            ids = list(db.scalars(select(Transaccion.id).where(Transaccion.usuario_id == self.luis.id)))
+        assert self.eliminar(self.luis.id, ids=ids) == 1201
+        with self.fabrica() as db:
+            assert db.scalar(select(func.count()).select_from(TransaccionEliminada)) == 1201
+            assert db.scalar(select(func.count()).select_from(ResumenMensual)
+                             .where(ResumenMensual.usuario_id == self.luis.id)) == 0
+
+    def test_lista_vacia_o_sin_coincidencias(self):
+        """Prueba extrema: una lista de ids vacía o un filtro sin coincidencias no elimina nada"""
+        assert self.eliminar(ids=[]) == 0
+        assert self.eliminar(desde=datetime(2030, 1, 1)) == 0
+        assert self.eliminar(self.luis.id, categoria="Salario") == 0
+        assert self.dias_restantes() == [1, 10, 15, 20, 28]
+
+    def test_textos_de_la_interfaz(self):
+        """Prueba extrema: ids con comas y espacios y 'hasta' al final del día"""
+        assert ids_de_texto(" 3, 7 12,") == [3, 7, 12]
+        assert fecha_de_texto("2024-03-20", fin_del_dia=True) == datetime(2024, 3, 20, 23, 59, 59, 999999)
+
+    def test_elimina_tambien_lo_archivado(self, tmp_path):
+        """Prueba extrema: las transacciones archivadas que muestra el listado se eliminan con los mismos filtros"""
+        archivo = ArchivoFrio.registrar(self.engine, str(tmp_path))
+        try:
+            with self.fabrica() as db:
+                archivo.archivar(db, datetime(2024, 3, 12))
+                db.commit()
+                uid_archivada = archivo.columnas(self.ana.id)["uid"][0].decode()
+
+            assert self.eliminar(ids=[self.ids[1]]) == 1
+            assert self.eliminar(categoria="Ocio") == 2
+            with self.fabrica() as db:
+                listado = [fila.id for fila in pagina_transacciones(db, self.ana.id).filas]
+                assert listado == [self.ids[20], self.ids[15]]
+                assert reportes.balance(db, self.ana.id)[1] == Decimal("30.00")
+                assert db.scalar(select(TransaccionEliminada.uid).where(TransaccionEliminada.uid == uid_archivada))
+            assert archivo.anios(self.ana.id) == []
+            assert len(archivo.columnas(self.luis.id)["id"]) == 1
+        finally:
+            ArchivoFrio.olvidar(self.engine)
+
+    def test_eliminacion_archivada_se_deshace_con_la_sesion(self, tmp_path):
+        """Prueba extrema: si la transacción se deshace, el año archivado vuelve a estar completo"""
+        archivo = ArchivoFrio.registrar(self.engine, str(tmp_path))
+        try:
+            with self.fabrica() as db:
+                archivo.archivar(db, datetime(2024, 3, 12))
+                db.commit()
+            with self.fabrica() as db:
+                assert servicios.eliminar_transacciones(self.ana.id, ids=[self.ids[1], self.ids[10]], session=db) == 2
+                db.rollback()
+            assert archivo.columnas(self.ana.id)["id"].tolist() == [self.ids[1], self.ids[10]]
+        finally:
+            ArchivoFrio.olvidar(self.engine)
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_sin_filtros(self):
+        """Prueba de error: sin ids, fechas ni categoría no se elimina nada"""
+        with pytest.raises(ValueError):
+            self.eliminar()
+        assert self.dias_restantes() == [1, 10, 15, 20, 28]
+
+    def test_filtros_invalidos(self):
+        """Prueba de error: rango invertido, categoría inexistente y textos mal escritos"""
+        with pytest.raises(RangoFechasInvalidoError):
+            self.eliminar(desde=datetime(2024, 3, 20), hasta=datetime(2024, 3, 1))
+        with pytest.raises(CategoriaInvalidaError):
+            self.eliminar(categoria="Viajes")
+        with pytest.raises(ValueError):
+            ids_de_texto("3, siete")
+        with pytest.raises(ValueError):
+            ids_de_texto("  ")
+        with pytest.raises(FechaInvalidaError):
+            fecha_de_texto("20/03/2024")
+
+
+class TestInicializacion:
+    def setup_method(self):
+        self.engine = create_engine("sqlite:///:memory:", poolclass=StaticPool,
+                                    connect_args={"check_same_thread": False})
+        self.sentencias = []
+        event.listen(self.engine, "before_cursor_execute", self._anotar)
+
+    def teardown_method(self):
+        CatalogoCategorias.invalidar()
+        self.engine.dispose()
+
+    def _anotar(self, conexion, cursor, sentencia, parametros, contexto, executemany):
+        self.sentencias.append(sentencia)
+
+    def categorias(self):
+        with self.engine.connect() as conexion:
+            return dict(conexion.execute(select(Categoria.nombre, Categoria.tipo)).all())
+
+    # ---- PRUEBAS NORMALES ----
+
+    def test_crea_esquema_categorias_y_version(self):
+        """Prueba normal: la primera inicialización crea todas las tablas, las categorías por defecto y la versión"""
+        assert inicializar_base(self.engine) is True
+
+        tablas = set(inspect(self.engine).get_table_names())
+        assert {"usuarios", "categorias", "transacciones", "registros", "version_esquema"} <= tablas
+        categorias = self.categorias()
+        assert categorias["Salario"] == TipoCategoria.INGRESO
+        assert categorias["Alimentación"] == TipoCategoria.EGRESO
+        assert categorias["Otros"] == TipoCategoria.INGRESO
+        assert len(categorias) == 9
+        with self.engine.connect() as conexion:
+            assert version_esquema(conexion) == VERSION_ESQUEMA
+
+    def test_segundo_arranque_solo_lee_la_version(self):
+        """Prueba normal: si la versión guardada es la actual no se ejecuta DDL ni se insertan categorías"""
+        inicializar_base(self.engine)
+        self.sentencias.clear()
+
+        assert inicializar_base(self.engine) is False
+
+        assert len(self.sentencias) <= 2
+        assert not any(s.lstrip().upper().startswith(("CREATE", "INSERT", "ALTER")) for s in self.sentencias)
+        assert len(self.categorias()) == 9
+
+    def test_registro_usa_la_base_comun(self):
+        """Prueba normal: Registro está en el mismo metadata que el resto de modelos"""
+        assert Registro.__table__.metadata is Base.metadata
+        inicializar_base(self.engine)
+        with sessionmaker(bind=self.engine)() as db:
+            db.add(Registro(nombre="Ana", correo="ana@example.com", contrasena="segura123"))
+            db.commit()
+            assert db.query(Registro).count() == 1
+
+    # ---- PRUEBAS EXTREMAS ----
+
+    def test_categorias_existentes_no_se_duplican(self):
+        """Prueba extrema: sobre una base con categorías propias solo se insertan las que faltan"""
+        crear_esquema(self.engine)
+        with sessionmaker(bind=self.engine)() as db:
+            db.add_all([Categoria(nombre="Salario", tipo="Ingreso", descripcion="Nómina"),
+                        Categoria(nombre="Comida", tipo="Egreso")])
+            db.commit()
+
+        assert inicializar_base(self.engine) is True
+        assert inicializar_base(self.engine, forzar=True) is True
+
+        categorias = self.categorias()
+        assert len(categorias) == 10
+        with self.engine.connect() as conexion:
+            descripcion = conexion.scalar(select(Categoria.descripcion).where(Categoria.nombre == "Salario"))
+        assert descripcion == "Nómina"
+
+    def test_version_antigua_vuelve_a_inicializar(self):
+        """Prueba extrema: con una versión guardada anterior se revisa el esquema y se actualiza la versión"""
+        inicializar_base(self.engine)
+        with self.engine.begin() as conexion:
+            conexion.execute(tabla_version.update().values(version=VERSION_ESQUEMA - 1))
+            conexion.execute(text("DROP INDEX ix_transacciones_usuario_categoria_fecha"))
+
+        assert inicializar_base(self.engine) is True
+
+        indices = {i["name"] for i in inspect(self.engine).get_indexes("transacciones")}
+        assert "ix_transacciones_usuario_categoria_fecha" in indices
+        with self.engine.connect() as conexion:
+            assert version_esquema(conexion) == VERSION_ESQUEMA
+
+    def test_catalogo_ve_las_categorias_sembradas(self):
+        """Prueba extrema: el catálogo en memoria se invalida al sembrar y ve las categorías nuevas"""
+        crear_esquema(self.engine)
+        with sessionmaker(bind=self.engine)() as db:
+            assert CatalogoCategorias.nombres(db, "Egreso") == []
+            inicializar_base(self.engine)
+            assert "Transporte" in CatalogoCategorias.nombres(db, "Egreso")
+
+    # ---- PRUEBAS DE ERROR ----
+
+    def test_version_posterior_es_error(self):
+        """Prueba de error: una base con una versión de esquema más nueva que la aplicación no se toca"""
+        inicializar_base(self.engine)
+        with self.engine.begin() as conexion:
+            conexion.execute(tabla_version.update().values(version=VERSION_ESQUEMA + 1))
+
+        with pytest.raises(ValueError):
+            inicializar_base(self.engine)